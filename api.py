@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+"""Serves the stored objects as a read-only HTTP/JSON API.
+
+Endpoints:
+    GET /api/v1/                  the number of objects of each class
+    GET /api/v1/<class>           the objects of a class, as a list of
+                                  to_dict() records; ?limit=N&offset=N
+                                  return one page of it
+    GET /api/v1/<class>/<id>      one object
+
+<class> is a class name (Place) or its plural in lower case (places).
+
+The responses are kept in a LRU cache and tagged with an ETag made of the
+version of the storage they were built from, so a response is built once
+per change of its class; a client sending the ETag back in If-None-Match
+gets a 304 without a body as long as nothing changed.
+
+Usage: ./api.py [--host HOST] [--port PORT] [--cache SIZE]
+"""
+import argparse
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from itertools import islice
+from urllib.parse import parse_qs, urlsplit
+from models import storage
+
+PREFIX = "/api/v1/"
+
+
+def plural(name):
+    """Return the lower case plural of a class name: City -> cities."""
+    name = name.lower()
+    if name.endswith("y"):
+        return name[:-1] + "ies"
+    return name + "s"
+
+
+class ResponseCache:
+    """LRU cache of the response bodies by request path.
+
+    Each body is stored with the version of the storage it was built
+    from, and is only returned while that version is current, so the
+    changes of the storage invalidate it without being tracked here.
+    """
+
+    def __init__(self, size=256):
+        """Create a cache of at most size responses."""
+        self.size = size
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, version):
+        """Return the body cached for path at version, or None."""
+        with self.__lock:
+            entry = self.__entries.get(path)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, path, version, body):
+        """Cache body as the response to path at version."""
+        if self.size <= 0:
+            return
+        with self.__lock:
+            self.__entries[path] = (version, body)
+            self.__entries.move_to_end(path)
+            while len(self.__entries) > self.size:
+                self.__entries.popitem(last=False)
+
+
+class APIServer(ThreadingHTTPServer):
+    """HTTP server of the API, one thread per connection.
+
+    Attributes:
+        cache (ResponseCache): the cached responses.
+        tag (str): random prefix of the ETags, so the tags of a previous
+            run, whose versions started over, never match.
+        lock: held while the storage is read, unless it is thread-safe.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, cache_size=256):
+        """Listen on address, a (host, port) pair."""
+        super().__init__(address, APIHandler)
+        self.cache = ResponseCache(cache_size)
+        self.tag = uuid.uuid4().hex[:8]
+        self.classes = {}
+        for name in storage.classes():
+            self.classes[name] = name
+            self.classes[plural(name)] = name
+        if hasattr(storage, "use_threads"):
+            storage.use_threads()
+            self.lock = nullcontext()
+        else:
+            self.lock = threading.Lock()
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    """Answers the GET requests of the API."""
+    protocol_version = "HTTP/1.1"
+    # the headers and the body are written separately: with Nagle's
+    # algorithm the body of a kept-alive connection waits for the
+    # delayed ACK of the headers, about 40 ms per response
+    disable_nagle_algorithm = True
+    quiet = False
+
+    def do_GET(self):
+        """Send the cached response to the request, or build it."""
+        url = urlsplit(self.path)
+        if not url.path.startswith(PREFIX):
+            return self.send_json(404, {"error": "Not found"})
+        parts = [part for part in url.path[len(PREFIX):].split("/")
+                 if part]
+        if parts and parts[0] not in self.server.classes:
+            return self.send_json(404, {"error": "Not found"})
+        name = self.server.classes[parts[0]] if parts else None
+        if len(parts) > 2:
+            return self.send_json(404, {"error": "Not found"})
+        with self.server.lock:
+            storage.refresh()
+            version = storage.version(name)
+        etag = '"{}-{}"'.format(self.server.tag, version)
+        tags = [tag.strip() for tag in
+                self.headers.get("If-None-Match", "").split(",")]
+        if etag in tags or "*" in tags:
+            return self.send_body(304, b"", etag)
+        body = self.server.cache.get(self.path, version)
+        if body is None:
+            with self.server.lock:
+                status, data = self.build(name, parts[1:], url.query)
+            body = json.dumps(data).encode("utf-8")
+            if status != 200:
+                return self.send_body(status, body)
+            # a change made while building only makes the next request
+            # miss, since the body is cached under the version before it
+            self.server.cache.put(self.path, version, body)
+        self.send_body(200, body, etag)
+
+    def build(self, name, ids, query):
+        """Return the status and the data of the response to a request of
+        the objects of class name, or of the object ids[0]."""
+        if name is None:
+            return 200, {cls: storage.count(cls)
+                         for cls in storage.classes()}
+        if ids:
+            obj = storage.get(name, ids[0])
+            if obj is None:
+                return 404, {"error": "Not found"}
+            return 200, obj.to_dict()
+        params = parse_qs(query)
+        try:
+            limit = int(params["limit"][0]) if "limit" in params else None
+            offset = int(params.get("offset", ["0"])[0])
+        except ValueError:
+            return 400, {"error": "limit and offset must be numbers"}
+        if (limit is not None and limit < 0) or offset < 0:
+            return 400, {"error": "limit and offset must be numbers"}
+        end = None if limit is None else offset + limit
+        return 200, [obj.to_dict() for obj in
+                     islice(storage.query(name), offset, end)]
+
+    def send_json(self, status, data):
+        """Send data as the JSON body of a response."""
+        self.send_body(status, json.dumps(data).encode("utf-8"))
+
+    def send_body(self, status, body, etag=None):
+        """Send a response with body and, if given, its ETag."""
+        self.send_response(status)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Log the requests unless the handler is quiet."""
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HBnB read-only API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--cache", type=int, default=256,
+                        help="number of responses kept in the cache")
+    args = parser.parse_args()
+    server = APIServer((args.host, args.port), args.cache)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+"""
+Load test of the read-only HTTP API.
+
+The API is started in this process on a free port with some Places in
+memory, then client threads poll the list of the Places over keep-alive
+connections, first with the cache disabled, then with the cache, then
+sending back the ETag they got (If-None-Match).
+
+Usage: python3 -m benchmarks.api [number of places] [requests per client]
+       [number of clients]
+"""
+import http.client
+import sys
+import threading
+import time
+from api import APIHandler, APIServer
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+PATH = "/api/v1/places"
+
+
+def poll(address, requests, revalidate, statuses):
+    """Send requests GETs of PATH on one connection and record the
+    status of each response in statuses."""
+    connection = http.client.HTTPConnection(*address)
+    etag = None
+    for _ in range(requests):
+        headers = {"If-None-Match": etag} if revalidate and etag else {}
+        connection.request("GET", PATH, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        etag = response.getheader("ETag")
+        statuses.append(response.status)
+    connection.close()
+
+
+def run(label, cache_size, requests, clients, revalidate=False):
+    """Serve clients threads polling requests times and print the
+    throughput."""
+    server = APIServer(("127.0.0.1", 0), cache_size)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    statuses = []
+    threads = [threading.Thread(target=poll, args=(
+        server.server_address, requests, revalidate, statuses))
+        for _ in range(clients)]
+    start = time.perf_counter()
+    for client in threads:
+        client.start()
+    for client in threads:
+        client.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    thread.join()
+    print("{:<24} {:8.0f} requests/s  ({} x 200, {} x 304)".format(
+        label, len(statuses) / elapsed, statuses.count(200),
+        statuses.count(304)))
+
+
+def main(count, requests, clients):
+    """Run the load test on count Places."""
+    APIHandler.quiet = True
+    FileStorage._FileStorage__objects = {}
+    for _ in range(count):
+        Place()
+    print("{} places, {} clients x {} requests of {}".format(
+        count, clients, requests, PATH))
+    run("no cache", 0, requests, clients)
+    run("cache", 256, requests, clients)
+    run("cache + If-None-Match", 256, requests, clients, True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 8)
@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+"""
+Benchmark of the command parsing of the console.
+
+A script mixing both syntaxes of show, update, count, create and the
+queries is generated, then its lines are run through HBNBCommand.onecmd
+with the former shlex-based parse() and with the current one. The lines
+run in a storage batch, so the time is spent in the console and not in
+saving the file after each change.
+
+Usage: python3 -m benchmarks.console [number of lines]
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from shlex import split
+from unittest import mock
+import console
+from console import HBNBCommand
+from models import storage
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def former_parse(arg):
+    """parse() as it was, with two regular expressions and shlex."""
+    curly_braces = re.search(r"\{(.*?)\}", arg)
+    brackets = re.search(r"\[(.*?)\]", arg)
+    if curly_braces is None:
+        if brackets is None:
+            return [i.strip(",") for i in split(arg)]
+        else:
+            lexer = split(arg[:brackets.span()[0]])
+            retl = [i.strip(",") for i in lexer]
+            retl.append(brackets.group())
+            return retl
+    else:
+        lexer = split(arg[:curly_braces.span()[0]])
+        retl = [i.strip(",") for i in lexer]
+        retl.append(curly_braces.group())
+        return retl
+
+
+def script(count, ids):
+    """Return count console lines about the Places of ids."""
+    lines = []
+    for i in range(count):
+        id = ids[i % len(ids)]
+        lines.append([
+            'show Place {}'.format(id),
+            'Place.show("{}")'.format(id),
+            'update Place {} name "Loft {}"'.format(id, i),
+            'Place.update("{}", "max_guest", {})'.format(id, i % 8),
+            'Place.update("{}", {{"name": "Flat", "number_rooms": 2}})'
+            .format(id),
+            'count Place',
+            'Place.count()',
+            'create City',
+            'Place.where(max_guest>6).limit(1).select(id)',
+            'show Place "{}"'.format(id),
+        ][i % 10])
+    return lines
+
+
+def run(label, lines):
+    """Run lines through the console and print the commands/s."""
+    command = HBNBCommand()
+    FileStorage._FileStorage__objects = {}
+    storage.reload()
+    storage.begin()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as null, redirect_stdout(null):
+        for line in lines:
+            command.onecmd(line)
+    elapsed = time.perf_counter() - start
+    storage.rollback()
+    print("{:<32} {:8.3f} s {:10.0f} commands/s".format(
+        label, elapsed, len(lines) / elapsed))
+
+
+def main(count):
+    """Run the benchmark on a script of count lines."""
+    with tempfile.TemporaryDirectory() as tmp:
+        FileStorage._FileStorage__file_path = os.path.join(tmp, "file.json")
+        FileStorage._FileStorage__objects = {}
+        ids = [Place().id for _ in range(100)]
+        storage.save()
+        lines = script(count, ids)
+        arguments = [line.partition(" ")[2] for line in lines
+                     if not line.startswith("Place.")]
+        print("{} lines, {} in the <command> <arguments> syntax".format(
+            len(lines), len(arguments)))
+        for label, parse in (("former parse", former_parse),
+                             ("parse", console.parse)):
+            start = time.perf_counter()
+            for arg in arguments:
+                parse(arg)
+            print("{:<32} {:8.3f} s".format(
+                label, time.perf_counter() - start))
+        with mock.patch("console.parse", former_parse):
+            run("commands (former parse)", lines)
+        run("commands", lines)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+"""
+Benchmark of the serialization formats of FileStorage.
+
+Users, Places and Reviews with realistic attributes are saved and
+reloaded in every format; the size of the file and the times of a full
+save and of a reload are printed.
+
+Usage: python3 -m benchmarks.formats [number of objects]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from models import storage
+from models.engine.file_storage import FileStorage
+from models.engine.formats import FORMATS
+from models.place import Place
+from models.review import Review
+from models.user import User
+
+WORDS = ("cozy bright quiet loft studio garden view near station beach "
+         "old town spacious modern kitchen terrace family friendly").split()
+
+
+def populate(count):
+    """Create count objects: one User for 10 Places for 30 Reviews."""
+    rng = random.Random(0)
+    users = []
+    for i in range(max(count // 41, 1)):
+        user = User()
+        user.email = "user{}@hbnb.io".format(i)
+        user.first_name = rng.choice(WORDS).title()
+        users.append(user)
+    cities = ["city-{:04d}".format(i) for i in range(50)]
+    places = []
+    for _ in range(max(count * 10 // 41, 1)):
+        place = Place()
+        place.city_id = rng.choice(cities)
+        place.user_id = rng.choice(users).id
+        place.name = " ".join(rng.choice(WORDS) for _ in range(3))
+        place.description = " ".join(rng.choice(WORDS) for _ in range(20))
+        place.number_rooms = rng.randint(1, 5)
+        place.max_guest = rng.randint(1, 8)
+        place.price_by_night = rng.randint(20, 300)
+        place.latitude = round(rng.uniform(-60, 60), 6)
+        place.longitude = round(rng.uniform(-180, 180), 6)
+        places.append(place)
+    for _ in range(count - len(users) - len(places)):
+        review = Review()
+        review.place_id = rng.choice(places).id
+        review.user_id = rng.choice(users).id
+        review.text = " ".join(rng.choice(WORDS) for _ in range(15))
+
+
+def main(count):
+    """Run the benchmark on count objects."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "file.json")
+        FileStorage._FileStorage__file_path = path
+        FileStorage._FileStorage__objects = {}
+        populate(count)
+        print("{} objects".format(storage.count()))
+        print("{:<10} {:>12} {:>10} {:>10}".format(
+            "format", "bytes", "save (s)", "reload (s)"))
+        for name in FORMATS:
+            storage.use_format(name)
+            objects = storage.all()
+            FileStorage._FileStorage__serialized = {}
+            start = time.perf_counter()
+            storage.save()
+            saved = time.perf_counter() - start
+            size = os.path.getsize(path)
+            FileStorage._FileStorage__objects = {}
+            start = time.perf_counter()
+            storage.reload()
+            reloaded = time.perf_counter() - start
+            assert storage.count() == len(objects)
+            print("{:<10} {:>12} {:>10.3f} {:>10.3f}".format(
+                name, size, saved, reloaded))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+"""
+Benchmark of the GridIndex of the Places against a brute-force scan.
+
+Places are spread at random over a few metropolitan areas, then radius
+and bounding box searches are timed with the index and with a scan
+computing the distance to every Place.
+
+Usage: python3 -m benchmarks.geo [number of places] [number of searches]
+"""
+import random
+import sys
+import time
+from models.engine.indexes import GridIndex, distance_km
+from models.engine.lazy import Record
+from models.place import Place
+
+CENTERS = [(48.8566, 2.3522), (40.7128, -74.006), (35.6762, 139.6503),
+           (-33.8688, 151.2093), (6.5244, 3.3792), (-23.5505, -46.6333)]
+
+
+def timed(label, func, *args):
+    """Run func(*args), print its duration and return its result."""
+    start = time.perf_counter()
+    result = func(*args)
+    print("{:<32} {:8.3f} s".format(label, time.perf_counter() - start))
+    return result
+
+
+def main(count, searches):
+    """Run the benchmark on count Places and searches searches."""
+    rng = random.Random(0)
+    places = {}
+    for i in range(count):
+        lat, lon = rng.choice(CENTERS)
+        places["Place.{}".format(i)] = Record(Place, {
+            "latitude": lat + rng.gauss(0, 0.5),
+            "longitude": lon + rng.gauss(0, 0.5)})
+    points = [(lat + rng.gauss(0, 0.3), lon + rng.gauss(0, 0.3), 5.0)
+              for lat, lon in (rng.choice(CENTERS) for _ in range(searches))]
+    print("{} places, {} searches of 5 km".format(count, searches))
+
+    index = GridIndex("Place")
+    timed("build index", lambda: [index.add(key, obj)
+                                  for key, obj in places.items()])
+
+    def scan(lat, lon, km):
+        """Return the keys near (lat, lon) by visiting every Place."""
+        found = []
+        for key, obj in places.items():
+            distance = distance_km(lat, lon, obj.latitude, obj.longitude)
+            if distance <= km:
+                found.append((distance, key))
+        found.sort()
+        return found
+    indexed = timed("near (index)",
+                    lambda: [index.near(*point) for point in points])
+    scanned = timed("near (scan)",
+                    lambda: [scan(*point) for point in points])
+    assert indexed == scanned
+    boxes = [(lat - 0.05, lon - 0.05, lat + 0.05, lon + 0.05)
+             for lat, lon, _ in points]
+    timed("within (index)",
+          lambda: [index.within(*box) for box in boxes])
+    timed("within (scan)", lambda: [[
+        key for key, obj in places.items()
+        if box[0] <= obj.latitude <= box[2] and
+        box[1] <= obj.longitude <= box[3]] for box in boxes])
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5)
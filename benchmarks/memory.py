@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+"""
+Memory benchmark of the plain and compact model representations.
+
+Builds the same Reviews and Places from to_dict() records with each
+representation and reports the memory allocated per object.
+
+Usage: python3 -m benchmarks.memory [number of objects]
+"""
+import json
+import sys
+import tracemalloc
+from models.base_model import BaseModel
+from models.place import Place
+from models.review import Review
+
+
+def records(cls, count):
+    """Return the JSON text of count to_dict() records of cls."""
+    records = []
+    for number in range(count):
+        data = {"id": "{:036d}".format(number),
+                "created_at": "2022-01-01T00:00:00.000001",
+                "updated_at": "2022-01-01T00:00:00.000001",
+                "__class__": cls.__name__}
+        owner = "{:036d}".format(number % 100)
+        if cls is Review:
+            data.update(place_id=owner, user_id=owner, text="Nice wifi")
+        else:
+            data.update(name="Loft", city_id=owner, user_id=owner,
+                        price_by_night=100, latitude=1.5, longitude=2.5)
+        records.append(data)
+    return json.dumps(records)
+
+
+def measure(cls, text):
+    """Return the bytes per object left after decoding text and building
+    one cls instance per record, like reload() does."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [cls(**d) for d in json.loads(text)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(objects)
+
+
+def main(count):
+    """Run the benchmark on count objects of each class."""
+    for cls in (Review, Place):
+        text = records(cls, count)
+        BaseModel.use_compact(False)
+        plain = measure(cls, text)
+        BaseModel.use_compact(True)
+        compact = measure(cls, text)
+        BaseModel.use_compact(False)
+        print("{:<8} plain {:7.1f} B/object, compact {:7.1f} B/object "
+              "({:.0%})".format(cls.__name__, plain, compact,
+                                compact / plain))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+"""
+Benchmark of the timestamp codec of BaseModel.
+
+Compares the former strptime path with parse_datetime, first on the
+timestamps alone, then on a full reload of FileStorage, where every
+object parses its created_at and updated_at. The save is timed once:
+to_dict() called isoformat() before and still does.
+
+Usage: python3 -m benchmarks.timestamps [number of objects]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from unittest import mock
+from models import storage
+from models.base_model import parse_datetime
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def strptime(value):
+    """Parse value as BaseModel.__init__ did before parse_datetime."""
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f')
+
+
+def timed(label, func, *args):
+    """Run func(*args), print its duration and return it."""
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    print("{:<32} {:8.3f} s".format(label, elapsed))
+    return elapsed
+
+
+def reload():
+    """Reload every object from the file."""
+    FileStorage._FileStorage__objects = {}
+    storage.reload()
+
+
+def main(count):
+    """Run the benchmark on count objects."""
+    stamps = [datetime.now().isoformat()] * count
+    print("{} timestamps".format(count))
+    old = timed("strptime", lambda: [strptime(s) for s in stamps])
+    new = timed("parse_datetime", lambda: [parse_datetime(s)
+                                           for s in stamps])
+    print("{:<32} {:8.1f} x".format("speedup", old / new))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        FileStorage._FileStorage__file_path = os.path.join(tmp, "file.json")
+        FileStorage._FileStorage__objects = {}
+        for _ in range(count):
+            Place()
+        print("{} objects".format(count))
+        timed("save", storage.save)
+        with mock.patch("models.base_model.parse_datetime", strptime):
+            old = timed("reload (strptime)", reload)
+        new = timed("reload (parse_datetime)", reload)
+        print("{:<32} {:8.1f} x".format("speedup", old / new))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -1,34 +1,181 @@
 #!/usr/bin/python3
 """Defines the HBnB console."""
+import argparse
+import ast
 import cmd
+import json
 import re
-from shlex import split
+import sys
+import time
+from itertools import islice
 from models import storage
-from models.base_model import BaseModel
-from models.user import User
-from models.state import State
-from models.city import City
-from models.place import Place
-from models.amenity import Amenity
-from models.review import Review
+
+WORD = re.compile(r"""(?:[^ \t\r\n"'\\]+|"(?:[^"\\]|\\.)*"|'[^']*'|\\.)+""",
+                  re.S)
+PIECE = re.compile(r"""([^"'\\]+)|"((?:[^"\\]|\\.)*)"|'([^']*)'|\\(.)""",
+                   re.S)
+ESCAPE = re.compile(r'\\([\\"])')
+PLAIN = re.compile(r"[^ \t\r\n]+")
+CALL = re.compile(r"([^.]*)\.([^(]*)\((.*?)\)")
+NAME = re.compile(r"\w+")
+CHAINED = re.compile(r"\.(\w+)\(")
+CONDITION = re.compile(
+    r"\s*(\w+)\s*(==|!=|<=|>=|=|<|>)(?![=<>])\s*(\S.*?)\s*")
+QUERIES = {"where", "order_by", "limit", "offset", "select"}
+METHODS = {"all", "show", "destroy", "count", "near", "within", "search",
+           "stats", "update"}
+
+
+def lex(text):
+    """Split text into words like shlex.split(text), with precompiled
+    regular expressions instead of a loop over its characters.
+
+    Raise ValueError on an unclosed quote or a trailing backslash.
+    """
+    if '"' not in text and "'" not in text and "\\" not in text:
+        return PLAIN.findall(text)
+    words = []
+    pos = 0
+    for match in WORD.finditer(text):
+        if text[pos:match.start()].strip(" \t\r\n"):
+            raise ValueError("No closing quotation")
+        pos = match.end()
+        word = match.group()
+        if '"' in word or "'" in word or "\\" in word:
+            word = "".join(
+                ESCAPE.sub(r"\1", piece.group(2)) if piece.lastindex == 2
+                else piece.group(piece.lastindex)
+                for piece in PIECE.finditer(word))
+        words.append(word)
+    if text[pos:].strip(" \t\r\n"):
+        raise ValueError("No closing quotation")
+    return words
 
 
 def parse(arg):
-    curly_braces = re.search(r"\{(.*?)\}", arg)
-    brackets = re.search(r"\[(.*?)\]", arg)
-    if curly_braces is None:
-        if brackets is None:
-            return [i.strip(",") for i in split(arg)]
+    """Split the arguments of a command into words, dropping the commas
+    around them; a {...} dictionary, or else a [...] list, ends the
+    arguments and is kept as one word."""
+    for opening, closing in ("{}", "[]"):
+        start = arg.find(opening)
+        if start >= 0:
+            end = arg.find(closing, start)
+            if end >= 0:
+                return ([word.strip(",") for word in lex(arg[:start])] +
+                        [arg[start:end + 1]])
+    return [word.strip(",") for word in lex(arg)]
+
+
+def parse_options(argl, flags=(), numbers=()):
+    """Split the --options out of the arguments of a command.
+
+    flags are options without value, numbers take a non-negative integer.
+    Return the remaining arguments and {option: value}.
+    """
+    args = []
+    options = {}
+    argl = iter(argl)
+    for arg in argl:
+        if not arg.startswith("--"):
+            args.append(arg)
+            continue
+        name, _, value = arg[2:].partition("=")
+        if name in flags and not value:
+            options[name] = True
+        elif name in numbers:
+            if not value:
+                value = next(argl, "")
+            if not value.isdigit():
+                raise ValueError("--{} needs a number".format(name))
+            options[name] = int(value)
         else:
-            lexer = split(arg[:brackets.span()[0]])
-            retl = [i.strip(",") for i in lexer]
-            retl.append(brackets.group())
-            return retl
-    else:
-        lexer = split(arg[:curly_braces.span()[0]])
-        retl = [i.strip(",") for i in lexer]
-        retl.append(curly_braces.group())
-        return retl
+            raise ValueError("unknown option --{}".format(name))
+    return args, options
+
+
+def split_outside_quotes(text, stop):
+    """Return the index of the first character of text in stop that is
+    not inside a quoted string, or len(text)."""
+    quote = None
+    pos = 0
+    while pos < len(text):
+        char = text[pos]
+        if quote is not None:
+            if char == "\\":
+                pos += 1
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in stop:
+            return pos
+        pos += 1
+    return len(text)
+
+
+def parse_calls(text):
+    """Split ".where(a=1).limit(2)" into [("where", "a=1"), ("limit", "2")].
+
+    Return None if text is not a chain of calls.
+    """
+    calls = []
+    pos = 0
+    while pos < len(text):
+        match = CHAINED.match(text, pos)
+        if match is None:
+            return None
+        end = match.end() + split_outside_quotes(text[match.end():], ")")
+        if end == len(text):
+            return None
+        calls.append((match.group(1), text[match.end():end]))
+        pos = end + 1
+    return calls
+
+
+def parse_args(text):
+    """Split the arguments of a call on the commas outside quotes."""
+    args = []
+    while text.strip():
+        end = split_outside_quotes(text, ",")
+        args.append(text[:end].strip())
+        text = text[end + 1:]
+    return args
+
+
+def parse_value(text):
+    """Return the Python literal written in text, or text itself."""
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def parse_condition(text):
+    """Parse "attribute<op>value" into (attribute, op, value); the value
+    may not be empty."""
+    match = CONDITION.fullmatch(text)
+    if match is None:
+        raise ValueError("invalid condition {}".format(text))
+    return match.group(1), match.group(2), parse_value(match.group(3))
+
+
+class ErrorCounter:
+    """Output stream counting the ** error ** messages written to it."""
+
+    def __init__(self, stream):
+        """Write to stream."""
+        self.stream = stream
+        self.count = 0
+
+    def write(self, text):
+        """Write text, counting it if it is an error message."""
+        if text.startswith("** ") or text.startswith("*** "):
+            self.count += 1
+        return self.stream.write(text)
+
+    def flush(self):
+        """Flush the stream."""
+        self.stream.flush()
 
 
 class HBNBCommand(cmd.Cmd):
@@ -36,9 +183,14 @@ class HBNBCommand(cmd.Cmd):
 
     Attributes:
         prompt (str): The command prompt.
+        save_every (int): number of changes saved at once; 0 leaves the
+            saving to the end of run_script().
+        unsaved (int): number of changes not saved yet.
     """
 
     prompt = "(hbnb) "
+    save_every = 1
+    unsaved = 0
     __classes = {
         "BaseModel",
         "User",
@@ -49,31 +201,118 @@ class HBNBCommand(cmd.Cmd):
         "Review"
     }
 
+    def precmd(self, line):
+        """Pick up the changes saved by other processes before running a
+        command."""
+        storage.refresh()
+        return line
+
+    def save(self):
+        """Save the storage after a change, or only every save_every
+        changes."""
+        self.unsaved += 1
+        if self.save_every and self.unsaved >= self.save_every:
+            storage.save()
+            self.unsaved = 0
+
+    def run_script(self, file, save_every=0, chunk=1000):
+        """Run the commands of file, one per line, without prompts, and
+        return the number of commands, of errors and the seconds taken.
+
+        Lines are read chunk at a time, and the changes of other
+        processes picked up once per chunk. Changes are saved every
+        save_every changes, or once at the end with 0. Empty lines and
+        lines starting with # are skipped; an error is a command that
+        printed a ** message ** or raised.
+        """
+        self.save_every = save_every
+        errors = ErrorCounter(sys.stdout)
+        stdout, sys.stdout = sys.stdout, errors
+        commands = 0
+        start = time.perf_counter()
+
+        def lines():
+            """Yield the lines of file, refreshing before each chunk."""
+            for block in iter(lambda: list(islice(file, chunk)), []):
+                storage.refresh()
+                yield from block
+        try:
+            for line in lines():
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                commands += 1
+                try:
+                    if self.onecmd(line):
+                        break
+                except Exception as error:
+                    print("** {} **".format(error))
+        finally:
+            sys.stdout = stdout
+            if self.unsaved:
+                storage.save()
+                self.unsaved = 0
+        return commands, errors.count, time.perf_counter() - start
+
     def emptyline(self):
         """Do nothing upon receiving an empty line."""
         pass
 
     def default(self, arg):
-        """Default behavior for cmd module when input is invalid"""
-        argdict = {
-            "all": self.do_all,
-            "show": self.do_show,
-            "destroy": self.do_destroy,
-            "count": self.do_count,
-            "update": self.do_update
-        }
-        match = re.search(r"\.", arg)
+        """Run the <class>.<method>(<args>) syntax: a query when the method
+        is where, order_by, limit, offset or select, else the command
+        <method> <class> <args>."""
+        match = CALL.match(arg)
         if match is not None:
-            argl = [arg[:match.span()[0]], arg[match.span()[1]:]]
-            match = re.search(r"\((.*?)\)", argl[1])
-            if match is not None:
-                command = [argl[1][:match.span()[0]], match.group()[1:-1]]
-                if command[0] in argdict.keys():
-                    call = "{} {}".format(argl[0], command[1])
-                    return argdict[command[0]](call)
+            name, method, args = match.groups()
+            if method in QUERIES and NAME.fullmatch(name):
+                return self.query(name, arg[len(name):])
+            if method in METHODS:
+                return getattr(self, "do_" + method)(name + " " + args)
         print("*** Unknown syntax: {}".format(arg))
         return False
 
+    def query(self, name, chain):
+        """Run a query such as
+        <class>.where(city_id="...", price_by_night<100)
+               .order_by(-price_by_night).offset(20).limit(10)
+               .select(name, price_by_night)
+        and print one result per line as soon as it is found."""
+        if name not in HBNBCommand.__classes:
+            print("** class doesn't exist **")
+            return False
+        calls = parse_calls(chain)
+        if calls is None:
+            print("*** Unknown syntax: {}{}".format(name, chain))
+            return False
+        query = storage.query(name)
+        try:
+            for method, args in calls:
+                args = parse_args(args)
+                if method == "where":
+                    query.where(*[parse_condition(a) for a in args])
+                elif method == "order_by" and len(args) == 1:
+                    query.order_by(args[0].lstrip("-"),
+                                   args[0].startswith("-"))
+                elif method in ("limit", "offset") and len(args) == 1:
+                    getattr(query, method)(args[0])
+                elif method == "select" and args:
+                    query.select(*args)
+                else:
+                    raise ValueError("invalid call {}({})".format(
+                        method, ", ".join(args)))
+        except ValueError as error:
+            print("** {} **".format(error))
+            return False
+        try:
+            for result in query:
+                print(result)
+        except Exception as error:
+            # an error of the storage engine ends the command, not the
+            # console
+            print("** {} **".format(error))
+        return False
+
     def do_quit(self, arg):
         """Quit command to exit the program."""
         return True
@@ -83,6 +322,30 @@ class HBNBCommand(cmd.Cmd):
         print("")
         return True
 
+    def do_begin(self, arg):
+        """Usage: begin
+        Open a batch: changes are only written to storage on commit."""
+        if storage.in_batch():
+            print("** batch already open **")
+        else:
+            storage.begin()
+
+    def do_commit(self, arg):
+        """Usage: commit
+        Write all the changes of the open batch at once."""
+        if not storage.in_batch():
+            print("** no batch open **")
+        else:
+            storage.commit()
+
+    def do_rollback(self, arg):
+        """Usage: rollback
+        Drop all the changes of the open batch."""
+        if not storage.in_batch():
+            print("** no batch open **")
+        else:
+            storage.rollback()
+
     def do_create(self, arg):
         """Usage: create <class>
         Create a new class instance and print its id.
@@ -93,68 +356,208 @@ class HBNBCommand(cmd.Cmd):
         elif argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
         else:
-            print(eval(argl[0])().id)
-            storage.save()
+            print(storage.classes()[argl[0]]().id)
+            self.save()
+
+    def do_import(self, arg):
+        """Usage: import <file>
+        Create the instances stored one per line in a NDJSON file of
+        to_dict() records, then save them at once."""
+        argl = parse(arg)
+        if len(argl) == 0:
+            print("** file name missing **")
+            return False
+        try:
+            with open(argl[0], "r", encoding="utf-8") as file:
+                print(storage.import_records(file))
+        except OSError:
+            print("** file doesn't exist **")
+        except ValueError as error:
+            print("** {} **".format(error))
+
+    def do_export(self, arg):
+        """Usage: export <class> <file>
+        Write every instance of a class to a NDJSON file, one per line."""
+        argl = parse(arg)
+        if len(argl) == 0:
+            print("** class name missing **")
+        elif argl[0] not in HBNBCommand.__classes:
+            print("** class doesn't exist **")
+        elif len(argl) == 1:
+            print("** file name missing **")
+        else:
+            try:
+                with open(argl[1], "w", encoding="utf-8") as file:
+                    print(storage.export_records(argl[0], file))
+            except OSError:
+                print("** file can't be written **")
 
     def do_show(self, arg):
         """Usage: show <class> <id> or <class>.show(<id>)
         Display the string representation of a class instance of a given id.
         """
         argl = parse(arg)
-        objdict = storage.all()
         if len(argl) == 0:
             print("** class name missing **")
         elif argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
         elif len(argl) == 1:
             print("** instance id missing **")
-        elif "{}.{}".format(argl[0], argl[1]) not in objdict:
+        elif storage.get(argl[0], argl[1]) is None:
             print("** no instance found **")
         else:
-            print(objdict["{}.{}".format(argl[0], argl[1])])
+            print(storage.get(argl[0], argl[1]))
 
     def do_destroy(self, arg):
         """Usage: destroy <class> <id> or <class>.destroy(<id>)
         Delete a class instance of a given id."""
         argl = parse(arg)
-        objdict = storage.all()
         if len(argl) == 0:
             print("** class name missing **")
         elif argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
         elif len(argl) == 1:
             print("** instance id missing **")
-        elif "{}.{}".format(argl[0], argl[1]) not in objdict.keys():
+        elif storage.get(argl[0], argl[1]) is None:
             print("** no instance found **")
         else:
-            del objdict["{}.{}".format(argl[0], argl[1])]
-            storage.save()
+            storage.delete(storage.get(argl[0], argl[1]))
+            self.save()
 
     def do_all(self, arg):
-        """Usage: all or all <class> or <class>.all()
+        """Usage: all [<class>] [--ndjson] [--limit N] [--offset N] [--page N]
+        or <class>.all([options])
         Display string representations of all instances of a given class.
-        If no class is specified, displays all instantiated objects."""
-        argl = parse(arg)
+        If no class is specified, displays all instantiated objects.
+        Without options the list is printed as a whole; with options the
+        objects are written one per line as they are read, in the
+        [<class>] (<id>) {...} form or as NDJSON with --ndjson.
+        --page N shows the N-th page of --limit objects (20 by default)."""
+        try:
+            argl, options = parse_options(parse(arg), ("ndjson",),
+                                          ("limit", "offset", "page"))
+        except ValueError as error:
+            print("** {} **".format(error))
+            return False
         if len(argl) > 0 and argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
+            return False
+        if len(argl) > 0:
+            objects = iter(storage.query(argl[0]))
         else:
-            objl = []
-            for obj in storage.all().values():
-                if len(argl) > 0 and argl[0] == obj.__class__.__name__:
-                    objl.append(obj.__str__())
-                elif len(argl) == 0:
-                    objl.append(obj.__str__())
-            print(objl)
+            objects = iter(storage.all().values())
+        if not options:
+            print("[", end="")
+            for obj in objects:
+                print(repr(obj.__str__()), end="")
+                break
+            for obj in objects:
+                print(", " + repr(obj.__str__()), end="")
+            print("]")
+            return
+        limit = options.get("limit")
+        offset = options.get("offset", 0)
+        if "page" in options:
+            if limit is None:
+                limit = 20
+            offset += max(options["page"] - 1, 0) * limit
+        end = None if limit is None else offset + limit
+        for obj in islice(objects, offset, end):
+            if options.get("ndjson"):
+                print(json.dumps(obj.to_dict()))
+            else:
+                print(obj)
+
+    def do_near(self, arg):
+        """Usage: near <class> <latitude> <longitude> <km> or
+       <class>.near(<latitude>, <longitude>, <km>)
+        Display the instances located at most <km> kilometers away from
+        a point, nearest first, one per line."""
+        objects = self.locate(arg, 3, storage.near)
+        for obj in objects or ():
+            print(obj)
+
+    def do_within(self, arg):
+        """Usage: within <class> <south> <west> <north> <east> or
+       <class>.within(<south>, <west>, <north>, <east>)
+        Display the instances located in a bounding box, one per line.
+        A box with <west> greater than <east> crosses the 180th meridian."""
+        objects = self.locate(arg, 4, storage.within)
+        for obj in objects or ():
+            print(obj)
+
+    def do_search(self, arg):
+        """Usage: search <class> <words> or <class>.search("<words>")
+        Display the instances whose text contains every word, best match
+        first, one per line."""
+        argl = parse(arg)
+        if len(argl) == 0:
+            print("** class name missing **")
+        elif argl[0] not in HBNBCommand.__classes:
+            print("** class doesn't exist **")
+        elif len(argl) == 1:
+            print("** search text missing **")
+        else:
+            for obj in storage.search(argl[0], " ".join(argl[1:])).values():
+                print(obj)
+
+    def do_stats(self, arg):
+        """Usage: stats <class> <attribute> [<id>] or
+       <class>.stats(<attribute>[, <id>])
+        Display the number of instances of a class per value of attribute,
+        and their average price for the Places, from the counters kept by
+        the storage: stats Review place_id, stats Place city_id,
+        stats Place state_id."""
+        argl = parse(arg)
+        if len(argl) == 0:
+            print("** class name missing **")
+            return False
+        if argl[0] not in HBNBCommand.__classes:
+            print("** class doesn't exist **")
+            return False
+        if len(argl) == 1:
+            print("** attribute name missing **")
+            return False
+        group = argl[2] if len(argl) > 2 else None
+        stats = storage.stats(argl[0], argl[1], group)
+        if stats is None:
+            print("** no statistics of {} by {} **".format(argl[0], argl[1]))
+        elif group is not None:
+            print(dict({argl[1]: group}, **stats))
+        else:
+            for value, row in stats.items():
+                print(dict({argl[1]: value}, **row))
+
+    def locate(self, arg, count, search):
+        """Check the class and the count numbers of arg and return the
+        values of search(class, *numbers), or None on error."""
+        argl = parse(arg)
+        if len(argl) == 0:
+            print("** class name missing **")
+            return None
+        if argl[0] not in HBNBCommand.__classes:
+            print("** class doesn't exist **")
+            return None
+        try:
+            numbers = [float(value) for value in argl[1:]]
+        except ValueError:
+            numbers = []
+        if len(numbers) != count:
+            print("** {} coordinates needed **".format(count))
+            return None
+        return search(argl[0], *numbers).values()
 
     def do_count(self, arg):
-        """Usage: count <class> or <class>.count()
-        Retrieve the number of instances of a given class."""
+        """Usage: count [<class>] or <class>.count()
+        Retrieve the number of instances of a given class, or of all
+        instances, from the counters kept by the storage."""
         argl = parse(arg)
-        count = 0
-        for obj in storage.all().values():
-            if argl[0] == obj.__class__.__name__:
-                count += 1
-        print(count)
+        if len(argl) > 0 and argl[0] not in HBNBCommand.__classes:
+            print("** class doesn't exist **")
+        elif len(argl) > 0:
+            print(storage.count(argl[0]))
+        else:
+            print(storage.count())
 
     def do_update(self, arg):
         """Usage: update <class> <id> <attribute_name> <attribute_value> or
@@ -163,7 +566,6 @@ class HBNBCommand(cmd.Cmd):
         Update a class instance of a given id by adding or updating
         a given attribute key/value pair or dictionary."""
         argl = parse(arg)
-        objdict = storage.all()
 
         if len(argl) == 0:
             print("** class name missing **")
@@ -174,37 +576,57 @@ class HBNBCommand(cmd.Cmd):
         if len(argl) == 1:
             print("** instance id missing **")
             return False
-        if "{}.{}".format(argl[0], argl[1]) not in objdict.keys():
+        obj = storage.get(argl[0], argl[1])
+        if obj is None:
             print("** no instance found **")
             return False
         if len(argl) == 2:
             print("** attribute name missing **")
             return False
-        if len(argl) == 3:
-            try:
-                type(eval(argl[2])) != dict
-            except NameError:
+        if len(argl) >= 4:
+            updates = {argl[2]: argl[3]}
+        else:
+            updates = parse_value(argl[2])
+            if not isinstance(updates, dict):
                 print("** value missing **")
                 return False
 
-        if len(argl) == 4:
-            obj = objdict["{}.{}".format(argl[0], argl[1])]
-            if argl[2] in obj.__class__.__dict__.keys():
-                valtype = type(obj.__class__.__dict__[argl[2]])
-                obj.__dict__[argl[2]] = valtype(argl[3])
+        attributes = storage.classes()[argl[0]].__dict__
+        values = {}
+        for k, v in updates.items():
+            if (k in attributes.keys() and
+                    type(attributes[k]) in {str, int, float}):
+                valtype = type(attributes[k])
+                try:
+                    values[k] = valtype(v)
+                except ValueError:
+                    print("** {} must be {} **".format(k, valtype.__name__))
+                    return False
             else:
-                obj.__dict__[argl[2]] = argl[3]
-        elif type(eval(argl[2])) == dict:
-            obj = objdict["{}.{}".format(argl[0], argl[1])]
-            for k, v in eval(argl[2]).items():
-                if (k in obj.__class__.__dict__.keys() and
-                        type(obj.__class__.__dict__[k]) in {str, int, float}):
-                    valtype = type(obj.__class__.__dict__[k])
-                    obj.__dict__[k] = valtype(v)
-                else:
-                    obj.__dict__[k] = v
-        storage.save()
+                values[k] = v
+        for k, v in values.items():
+            setattr(obj, k, v)
+        self.save()
 
 
 if __name__ == "__main__":
-    HBNBCommand().cmdloop()
+    parser = argparse.ArgumentParser(description="HBnB console")
+    parser.add_argument("-f", "--file",
+                        help="run the commands of a script and exit")
+    parser.add_argument("--every", type=int, default=0, metavar="N",
+                        help="in a script, save every N changes instead "
+                        "of once at the end")
+    args = parser.parse_args()
+    if args.file is None and sys.stdin.isatty():
+        HBNBCommand().cmdloop()
+    else:
+        if args.file is None:
+            commands, errors, seconds = HBNBCommand().run_script(
+                sys.stdin, args.every)
+        else:
+            with open(args.file, "r", encoding="utf-8") as file:
+                commands, errors, seconds = HBNBCommand().run_script(
+                    file, args.every)
+        print("{} commands in {:.3f} s ({:.0f} commands/s), {} errors"
+              .format(commands, seconds, commands / seconds if seconds
+                      else 0, errors), file=sys.stderr)
@@ -1,14 +1,28 @@
+#!/usr/bin/python3
+"""Creates the unique storage instance of the application."""
+import os
 from models.base_model import BaseModel
 
-
-class Storage:
-    def new(self, obj):
-        # Your implementation to store the object goes here
-        pass
-
-    def save(self):
-        # Your implementation to save objects goes here
-        pass
-
-
-storage = Storage()
+if os.getenv("HBNB_COMPACT_MODELS"):
+    BaseModel.use_compact()
+if os.getenv("HBNB_TYPE_STORAGE") == "db":
+    from models.engine.db_storage import DBStorage
+    storage = DBStorage(os.getenv("HBNB_DB_PATH", "hbnb.db"))
+else:
+    from models.engine.file_storage import FileStorage
+    storage = FileStorage()
+    if os.getenv("HBNB_FILE_SHARDS"):
+        storage.use_shards()
+    if os.getenv("HBNB_FILE_JOURNAL"):
+        storage.use_journal()
+    if os.getenv("HBNB_FILE_FORMAT"):
+        storage.use_format(os.getenv("HBNB_FILE_FORMAT"))
+    if os.getenv("HBNB_FILE_LAZY"):
+        storage.use_lazy()
+    if os.getenv("HBNB_FILE_SHARED"):
+        storage.use_shared()
+    if os.getenv("HBNB_FILE_THREADS"):
+        storage.use_threads()
+    if os.getenv("HBNB_FLUSH_INTERVAL"):
+        storage.start_flusher(float(os.getenv("HBNB_FLUSH_INTERVAL")))
+storage.reload()
@@ -1,33 +1,90 @@
 #!/usr/bin/python3
 """Model Base """
+import sys
 import uuid
 from datetime import datetime
 import models
 
 
+def parse_datetime(value):
+    """Return the datetime encoded by value.
+
+    value is an ISO 8601 string as written by to_dict(), with or without
+    microseconds. datetime.fromisoformat is several times faster than
+    strptime.
+    """
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def format_datetime(value):
+    """Return the ISO 8601 string of value."""
+    return value.isoformat()
+
+
 class BaseModel:
-    """class Base"""
+    """class Base
+
+    Assigning an attribute marks the instance dirty in the storage, so
+    the next save only serializes the objects that changed. Changes made
+    in place (e.g. amenity_ids.append()) are not seen: call save().
+
+    After BaseModel.use_compact(), new instances are built from the
+    compact() variant of their class, which keeps the attributes in
+    __slots__ instead of a per-instance __dict__.
+    """
+    __compact = False
+
+    def __new__(cls, *args, **kwargs):
+        """ creates the instance, from the compact class if enabled """
+        if BaseModel.__compact:
+            cls = cls.compact()
+        return super().__new__(cls)
+
+    @staticmethod
+    def use_compact(enabled=True):
+        """ switches the compact representation on or off """
+        BaseModel.__compact = enabled
+
+    @classmethod
+    def compact(cls):
+        """ returns the variant of cls storing its attributes in slots """
+        if "_order" in cls.__dict__:
+            return cls
+        if cls not in _compact_classes:
+            _compact_classes[cls] = _make_compact(cls)
+        return _compact_classes[cls]
+
     def __init__(self, *args, **kwargs):
         """ Constructor """
         if kwargs:
             for key, value in kwargs.items():
-                if key == "created_at":
-                    value = datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f')
-                if key == "updated_at":
-                    value = datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f')
+                if key == "created_at" or key == "updated_at":
+                    value = parse_datetime(value)
                 if key != "__class__":
-                    setattr(self, key, value)
+                    object.__setattr__(self, key, value)
         else:
-            self.id = str(uuid.uuid4())  # unique id
-            self.created_at = datetime.now()  # datetime when is created
-            self.updated_at = datetime.now()  # date when is updated
+            # set directly: the object is not in the storage yet
+            object.__setattr__(self, "id", str(uuid.uuid4()))
+            object.__setattr__(self, "created_at", datetime.now())
+            object.__setattr__(self, "updated_at", datetime.now())
             models.storage.new(self)
 
+    def __setattr__(self, name, value):
+        """ sets the attribute and marks the instance dirty """
+        object.__setattr__(self, name, value)
+        models.storage.touch(self)
+
     def __str__(self):
         """ print() __str__ method """
         """" For pep8 validation"""
         className = self.__class__.__name__
-        return "[{}] ({}) {}".format(className, self.id, self.__dict__)
+        return "[{}] ({}) {}".format(className, self.id, self._attributes())
+
+    def _attributes(self):
+        """ returns the instance attributes in assignment order """
+        return self.__dict__
 
     def save(self):
         """ updates with the current datetime """
@@ -36,10 +93,104 @@ class BaseModel:
 
     def to_dict(self):
         '''returns a dictionary with all keys/value of the instance'''
-        dict_copy = self.__dict__.copy()
-        dict_copy["created_at"] = self.created_at.isoformat()
-        dict_copy["updated_at"] = self.updated_at.isoformat()
+        dict_copy = self._attributes().copy()
+        dict_copy["created_at"] = format_datetime(self.created_at)
+        dict_copy["updated_at"] = format_datetime(self.updated_at)
         dict_copy['__class__'] = self.__class__.__name__
         return dict_copy
 
-    # @property
+
+_compact_classes = {}
+_orders = {}
+EXTRA = 255
+
+
+def _make_compact(cls):
+    """Build the compact variant of the model class cls.
+
+    The id, the timestamps and the attributes declared on the class get a
+    slot; other attributes still go to __dict__, which CPython only
+    allocates when the first one is set. _order records the assignment
+    order (slot numbers, EXTRA for a __dict__ attribute) so that __str__
+    and to_dict() print the attributes exactly like the plain class.
+    The values of the foreign keys (*_id) are interned: thousands of
+    Reviews of one Place then share a single place_id string.
+    """
+    names = ["id", "created_at", "updated_at"]
+    for klass in reversed(cls.__mro__):
+        for name, value in vars(klass).items():
+            if (not name.startswith("_") and not callable(value) and
+                    not isinstance(value, (classmethod, staticmethod)) and
+                    name not in names):
+                names.append(name)
+    slots = {name: number for number, name in enumerate(names)}
+    keys = [name for name in names if name.endswith("_id")]
+    created = bytes((0, 1, 2))
+
+    def __init__(self, *args, **kwargs):
+        object.__setattr__(self, "_order", b"")
+        cls.__init__(self, *args, **kwargs)
+        if kwargs:
+            order = bytes(slots.get(key, EXTRA) for key in kwargs
+                          if key != "__class__") + self._order
+        else:
+            order = created + self._order
+        object.__setattr__(self, "_order", _orders.setdefault(order, order))
+        for name in keys:
+            value = object.__getattribute__(self, name) if (
+                slots[name] in order) else None
+            if type(value) is str:
+                object.__setattr__(self, name, sys.intern(value))
+
+    def __getattr__(self, name):
+        # an unset slot falls back to the default of the plain class
+        return getattr(cls, name)
+
+    def __setattr__(self, name, value):
+        number = slots.get(name, EXTRA)
+        if name in keys and type(value) is str:
+            value = sys.intern(value)
+        if number == EXTRA:
+            new = name not in self.__dict__
+        else:
+            new = number not in self._order
+        object.__setattr__(self, name, value)
+        if new:
+            object.__setattr__(self, "_order", self._order + bytes((number,)))
+        models.storage.touch(self)
+
+    def __delattr__(self, name):
+        order = bytearray(self._order)
+        if name in slots:
+            order.remove(slots[name])
+        else:
+            position = list(self.__dict__).index(name)
+            extras = [i for i, n in enumerate(order) if n == EXTRA]
+            del order[extras[position]]
+        object.__delattr__(self, name)
+        object.__setattr__(self, "_order", bytes(order))
+        models.storage.touch(self)
+
+    def _attributes(self):
+        attributes = {}
+        extras = iter(self.__dict__.items())
+        for number in self._order:
+            if number == EXTRA:
+                name, value = next(extras)
+                attributes[name] = value
+            else:
+                name = names[number]
+                attributes[name] = object.__getattribute__(self, name)
+        return attributes
+
+    return type(cls.__name__, (cls,), {
+        "__slots__": tuple(names) + ("_order",),
+        "__module__": cls.__module__,
+        "__qualname__": cls.__qualname__,
+        "__doc__": cls.__doc__,
+        "__init__": __init__,
+        "__getattr__": __getattr__,
+        "__setattr__": __setattr__,
+        "__delattr__": __delattr__,
+        "_attributes": _attributes,
+    })
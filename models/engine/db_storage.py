@@ -0,0 +1,582 @@
+#!/usr/bin/python3
+"""
+sqlite3 storage engine
+"""
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from models.engine.indexes import (TextIndex, bounding_box, coordinates,
+                                   distance_km, tokenize)
+from models.engine.ndjson import read_objects
+from models.engine.query import Query, check_value
+from models.engine.file_storage import FileStorage
+
+
+class DBStorage:
+    """Stores instances in a SQLite database, one table per class.
+
+    Each table has the columns id, created_at, updated_at and data, the
+    JSON to_dict() form of the object. Changes are written row by row
+    and committed by save(); class filtering, counts and foreign key
+    lookups are done in SQL.
+
+    Attributes:
+        __path (str): path of the database file.
+        __connection (sqlite3.Connection): the open database.
+        __objects (dict): identity map of the objects loaded or created
+            in this session, by <class name>.<id>.
+        __pending (dict): keys changed since they were last written,
+            mapped to the object or None when it was deleted.
+        __batch (bool): True while a batch is open; save() then writes
+            the rows without committing them.
+        __searchable (set): names of the classes whose words are kept in
+            an FTS5 table <class>_text.
+        __data_version (int): SQLite data_version at the last refresh().
+    """
+    __foreign_keys = {
+        "City": ("state_id",),
+        "Place": ("city_id", "user_id"),
+        "Review": ("place_id", "user_id"),
+    }
+    __sorted = {
+        "Place": ("price_by_night", "max_guest", "number_rooms",
+                  "number_bathrooms"),
+    }
+    __text = {
+        "Place": ("name", "description"),
+        "Review": ("text",),
+    }
+    __aggregates = {
+        ("Review", "place_id"): None,
+        ("Place", "city_id"): "price_by_night",
+    }
+    __rollups = {
+        ("Place", "state_id"): ("City", "city_id"),
+    }
+    __positions = {"Place"}
+    __latitude = "COALESCE(json_extract(data, '$.latitude'), 0.0)"
+    __longitude = "COALESCE(json_extract(data, '$.longitude'), 0.0)"
+
+    classes = FileStorage.classes
+    attributes = FileStorage.attributes
+
+    def __init__(self, path="hbnb.db"):
+        """Open the database stored at path."""
+        self.__path = path
+        self.__connection = None
+        self.__objects = {}
+        self.__pending = {}
+        self.__batch = False
+        self.__searchable = set()
+        self.__data_version = None
+        self.__version = 0
+        self.__versions = {}
+        self.__rebuilt = 0
+
+    def reload(self):
+        """Create the tables if needed and start a new session."""
+        if self.__connection is not None:
+            self.__connection.close()
+        self.__connection = sqlite3.connect(self.__path,
+                                            check_same_thread=False)
+        self.__searchable = set()
+        self.__data_version = None
+        for name in self.classes():
+            self.__connection.execute(
+                'CREATE TABLE IF NOT EXISTS "{}" (id TEXT PRIMARY KEY, '
+                'created_at TEXT, updated_at TEXT, data TEXT)'.format(name))
+            for attribute in (self.__foreign_keys.get(name, ()) +
+                              self.__sorted.get(name, ())):
+                self.__connection.execute(
+                    'CREATE INDEX IF NOT EXISTS "{0}_{1}" ON "{0}" '
+                    '(json_extract(data, \'$.{1}\'))'.format(name, attribute))
+            if name in self.__positions:
+                self.__connection.execute(
+                    'CREATE INDEX IF NOT EXISTS "{0}_position" ON "{0}" '
+                    '({1}, {2})'.format(name, self.__latitude,
+                                        self.__longitude))
+            if name in self.__text and self.__create_text_table(name):
+                self.__searchable.add(name)
+        self.__connection.commit()
+        self.__objects = {}
+        self.__pending = {}
+        self.__replaced()
+        self.__batch = False
+
+    def __create_text_table(self, name):
+        """Create the FTS5 table of the words of the objects of class name
+        and fill it if it is new. Return False if SQLite lacks FTS5; the
+        text is then searched by a scan."""
+        table = name + "_text"
+        if self.__connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?",
+                (table,)).fetchone() is not None:
+            return True
+        try:
+            self.__connection.execute(
+                'CREATE VIRTUAL TABLE "{}" USING fts5(id UNINDEXED, body)'
+                .format(table))
+        except sqlite3.OperationalError:
+            return False
+        for id, data in self.__connection.execute(
+                'SELECT id, data FROM "{}"'.format(name)).fetchall():
+            self.__connection.execute(
+                'INSERT INTO "{}" VALUES (?, ?)'.format(table),
+                (id, self.__body(name, json.loads(data))))
+        return True
+
+    def __body(self, name, data):
+        """Return the text indexed for the to_dict() form data."""
+        return " ".join(data[attribute] for attribute in self.__text[name]
+                        if isinstance(data.get(attribute), str))
+
+    def refresh(self):
+        """Forget the objects of the session that were saved, if another
+        connection committed changes since the last refresh, so they are
+        read again; return how many were forgotten.
+
+        SQLite already locks the database for concurrent processes; the
+        data_version pragma tells cheaply whether another one wrote.
+        """
+        if self.__connection is None or self.__batch:
+            return 0
+        version = self.__connection.execute(
+            "PRAGMA data_version").fetchone()[0]
+        if version == self.__data_version:
+            return 0
+        self.__data_version = version
+        self.__replaced()
+        objects = {key: obj for key, obj in self.__objects.items()
+                   if key in self.__pending}
+        dropped = len(self.__objects) - len(objects)
+        self.__objects = objects
+        return dropped
+
+    def close(self):
+        """Commit the pending changes and close the database."""
+        if self.__connection is not None:
+            self.save()
+            self.__connection.close()
+            self.__connection = None
+
+    def all(self, cls=None):
+        """Return {key: object} for every object, or those of cls only."""
+        if cls is None:
+            names = self.classes()
+        else:
+            names = [cls if isinstance(cls, str) else cls.__name__]
+        objects = {}
+        for name in names:
+            objects.update(self.__select(name, ""))
+        return objects
+
+    def count(self, cls=None):
+        """Return the number of objects, optionally of one class only."""
+        if cls is None:
+            names = self.classes()
+        else:
+            names = [cls if isinstance(cls, str) else cls.__name__]
+        self.__flush()
+        total = 0
+        for name in names:
+            if name in self.classes():
+                total += self.__connection.execute(
+                    'SELECT COUNT(*) FROM "{}"'.format(name)).fetchone()[0]
+        return total
+
+    def get(self, cls, id):
+        """Return the object of class cls with the given id, or None."""
+        name = cls if isinstance(cls, str) else cls.__name__
+        key = "{}.{}".format(name, id)
+        if key in self.__objects:
+            return self.__objects[key]
+        return self.__select(name, "WHERE id = ?", (id,)).get(key)
+
+    def find(self, cls, attribute, value):
+        """Return {key: object} for the objects of cls whose attribute
+        equals value."""
+        name = cls if isinstance(cls, str) else cls.__name__
+        if not attribute.isidentifier():
+            return {}
+        check_value(value)
+        test, params = self.__condition(name, attribute, "=", value)
+        return self.__select(name, "WHERE " + test, params)
+
+    def __default(self, name, attribute):
+        """Return the default of attribute in the class name, or None if
+        SQL cannot hold it."""
+        default = getattr(self.classes().get(name), attribute, None)
+        if not isinstance(default, (str, int, float)):
+            default = None
+        return default
+
+    def __column(self, name, attribute, prefix=""):
+        """Return the SQL expression of attribute in the rows of class
+        name, whose table is aliased by prefix, and its parameters. A
+        missing attribute takes the default of the class, as it does on
+        the objects of FileStorage."""
+        return ("COALESCE(json_extract({}data, '$.{}'), ?)".format(
+            prefix, attribute), [self.__default(name, attribute)])
+
+    def __condition(self, name, attribute, op, value):
+        """Return the SQL test of the condition (attribute, op, value) on
+        the rows of class name, and its parameters.
+
+        The test gives the result of the Python comparison FileStorage
+        makes: a number and a string are neither equal nor ordered, !=
+        is the negation of =, and an attribute missing without a class
+        default is None, equal only to None and never ordered.
+        """
+        column, params = self.__column(name, attribute)
+        op = "=" if op == "==" else op
+        if value is None:
+            if op not in ("=", "!="):
+                return "0", []
+            negation = "NOT " if op == "!=" else ""
+            return "{} IS {}NULL".format(column, negation), params
+        default = self.__default(name, attribute)
+        if isinstance(default, bool):
+            kind = "true" if default else "false"
+        else:
+            kind = {str: "text", int: "integer",
+                    float: "real"}.get(type(default), "null")
+        kinds = ("'text'" if isinstance(value, str) else
+                 "'integer', 'real', 'true', 'false'")
+        test = "COALESCE(json_type(data, '$.{}'), ?) IN ({}) AND {} {} ?"
+        test = test.format(attribute, kinds, column,
+                           "=" if op == "!=" else op)
+        if op == "!=":
+            test = "NOT ({})".format(test)
+        return test, [kind] + params + [value]
+
+    def query(self, cls):
+        """Return a Query of the objects of cls."""
+        return Query(self, cls)
+
+    def execute(self, query):
+        """Return an iterator of the results of query, filtered, sorted
+        and paginated in SQL."""
+        clauses = []
+        params = []
+        name = query.class_name
+        for attribute, op, value in query.conditions:
+            if not attribute.isidentifier():
+                return iter(())
+            check_value(value)
+            test, test_params = self.__condition(name, attribute, op, value)
+            clauses.append(test)
+            params += test_params
+        sql = "WHERE " + " AND ".join(clauses) if clauses else ""
+        if query.order is not None:
+            attribute, descending = query.order
+            if not attribute.isidentifier():
+                return iter(())
+            column, column_params = self.__column(name, attribute)
+            sql += " ORDER BY {}{}".format(
+                column, " DESC" if descending else "")
+            params += column_params
+        if query.count is not None or query.skip:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if query.count is None else query.count,
+                       query.skip]
+        objects = self.__select(name, sql, params).values()
+        if query.fields is None:
+            return iter(objects)
+        return ({field: getattr(obj, field, None) for field in query.fields}
+                for obj in objects)
+
+    def within(self, cls, south, west, north, east):
+        """Return {key: object} for the objects of cls located in the
+        bounding box, selected in SQL through the position index.
+
+        A box with west > east crosses the 180th meridian.
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        where = "WHERE {} BETWEEN ? AND ? AND ".format(self.__latitude)
+        if west <= east:
+            where += "{} BETWEEN ? AND ?".format(self.__longitude)
+        else:
+            where += "({0} >= ? OR {0} <= ?)".format(self.__longitude)
+        return self.__select(name, where, (south, north, west, east))
+
+    def near(self, cls, latitude, longitude, km):
+        """Return {key: object} for the objects of cls at most km away
+        from (latitude, longitude), nearest first."""
+        found = []
+        for key, obj in self.within(
+                cls, *bounding_box(latitude, longitude, km)).items():
+            position = coordinates(obj, "latitude", "longitude")
+            if position is None:
+                continue
+            distance = distance_km(latitude, longitude, *position)
+            if distance <= km:
+                found.append((distance, key, obj))
+        found.sort(key=lambda item: item[:2])
+        return {key: obj for _, key, obj in found}
+
+    def search(self, cls, text):
+        """Return {key: object} for the objects of cls whose text contains
+        every word of text, best match first (FTS5 bm25 ranking)."""
+        name = cls if isinstance(cls, str) else cls.__name__
+        if name not in self.__text:
+            return {}
+        words = tokenize(text)
+        if not words:
+            return {}
+        self.__flush()
+        table = name + "_text"
+        if name not in self.__searchable:
+            index = TextIndex(name, self.__text[name])
+            objects = self.all(name)
+            for key, obj in objects.items():
+                index.add(key, obj)
+            return {key: objects[key] for _, key in index.search(text)}
+        ids = [id for id, in self.__connection.execute(
+            'SELECT id FROM "{}" WHERE "{}" MATCH ? ORDER BY rank'.format(
+                table, table), (" ".join('"{}"'.format(word)
+                                         for word in words),))]
+        found = {}
+        for id in ids:
+            obj = self.get(name, id)
+            if obj is not None:
+                found["{}.{}".format(name, id)] = obj
+        return found
+
+    def stats(self, cls, attribute, group=None):
+        """Return the statistics of the objects of cls grouped by attribute,
+        computed in SQL, in the form returned by FileStorage.stats()."""
+        name = cls if isinstance(cls, str) else cls.__name__
+        if (name, attribute) in self.__aggregates:
+            value = self.__aggregates[(name, attribute)]
+            key, key_params = self.__column(name, attribute)
+            tables = '"{}"'.format(name)
+            prefix = ""
+        elif (name, attribute) in self.__rollups:
+            parent, link = self.__rollups[(name, attribute)]
+            value = self.__aggregates[(name, link)]
+            key, key_params = self.__column(parent, attribute, "c.")
+            tables = ('"{0}" AS p JOIN "{1}" AS c ON c.id = '
+                      'json_extract(p.data, \'$.{2}\')'.format(
+                          name, parent, link))
+            prefix = "p."
+        else:
+            return None
+        columns = "{}, COUNT(*)".format(key)
+        params = list(key_params)
+        if value is not None:
+            columns += (", SUM(CASE WHEN json_type({0}data, '$.{1}') IN "
+                        "('integer', 'real') THEN json_extract({0}data, "
+                        "'$.{1}') WHEN json_type({0}data, '$.{1}') IS NULL "
+                        "THEN ? END), COUNT(CASE WHEN json_type({0}data, "
+                        "'$.{1}') IN ('integer', 'real') OR json_type("
+                        "{0}data, '$.{1}') IS NULL AND ? IS NOT NULL "
+                        "THEN 1 END)".format(prefix, value))
+            default = getattr(self.classes()[name], value, None)
+            if (isinstance(default, bool) or
+                    not isinstance(default, (int, float))):
+                default = None
+            params += [default, default]
+        sql = "SELECT {} FROM {}".format(columns, tables)
+        if group is not None:
+            sql += " WHERE {} = ?".format(key)
+            params += key_params + [group]
+        sql += " GROUP BY 1"
+        self.__flush()
+
+        def row(stats):
+            """Return the row of (count, sum, number of summed values)."""
+            result = {"count": stats[0]}
+            if value is not None:
+                result["average_" + value] = (stats[1] / stats[2]
+                                              if stats[2] else None)
+            return result
+        rows = {found: row(stats) for found, *stats in
+                self.__connection.execute(sql, params)}
+        if group is not None:
+            return rows.get(group, row((0, 0, 0)))
+        return rows
+
+    def version(self, cls=None):
+        """Return a number that changes whenever an object, or an object
+        of cls, is added, changed or deleted in this session, or when
+        refresh() sees a write of another connection; it only grows."""
+        if cls is None:
+            return self.__version
+        name = cls if isinstance(cls, str) else cls.__name__
+        return max(self.__versions.get(name, 0), self.__rebuilt)
+
+    def __changed(self, name):
+        """Record a change of the objects of the class name."""
+        self.__version += 1
+        self.__versions[name] = self.__version
+
+    def __replaced(self):
+        """Record that any object may have changed."""
+        self.__version += 1
+        self.__rebuilt = self.__version
+
+    def new(self, obj):
+        """Add obj to the current session."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        self.__objects[key] = obj
+        self.__pending[key] = obj
+        self.__changed(obj.__class__.__name__)
+
+    def touch(self, obj):
+        """Mark obj as changed so the next save() writes it."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        if key in self.__objects:
+            self.__pending[key] = obj
+            self.__changed(obj.__class__.__name__)
+
+    def delete(self, obj=None):
+        """Delete obj from the database on the next save()."""
+        if obj is None:
+            return
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        self.__objects.pop(key, None)
+        self.__pending[key] = None
+        self.__changed(obj.__class__.__name__)
+
+    def in_batch(self):
+        """Return True while a batch is open."""
+        return self.__batch
+
+    def begin(self):
+        """Open a batch: save() does not commit until commit()."""
+        if self.__batch:
+            raise RuntimeError("a batch is already open")
+        self.save()
+        self.__batch = True
+
+    def commit(self):
+        """Close the batch and commit all its changes at once."""
+        if not self.__batch:
+            raise RuntimeError("no batch is open")
+        self.__batch = False
+        self.save()
+
+    def rollback(self):
+        """Close the batch and roll its changes back."""
+        if not self.__batch:
+            raise RuntimeError("no batch is open")
+        self.__batch = False
+        self.__pending.clear()
+        self.__connection.rollback()
+        self.__objects = {}
+        self.__replaced()
+
+    @contextmanager
+    def batch(self):
+        """Context manager running its block in a batch, committed on
+        exit or rolled back if an exception is raised."""
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def import_records(self, file):
+        """Store every record of the NDJSON file and return their count.
+
+        The rows are committed once at the end; if a line is invalid the
+        whole import is rolled back and ValueError is raised. Inside an
+        open batch only the rows of the import are rolled back, to a
+        savepoint, and the batch goes on.
+        """
+        if self.__batch:
+            return self.__import(file)
+        with self.batch():
+            return self.__import(file)
+
+    def __import(self, file):
+        """Write a row for every record of the NDJSON file and return
+        their count, without keeping the objects in the session."""
+        self.__flush()
+        if not self.__connection.in_transaction:
+            # else releasing the savepoint would commit the batch
+            self.__connection.execute("BEGIN")
+        self.__connection.execute("SAVEPOINT import_records")
+        count = 0
+        try:
+            for obj in read_objects(file, self.classes()):
+                key = "{}.{}".format(obj.__class__.__name__, obj.id)
+                self.__objects.pop(key, None)
+                self.__write(key, obj)
+                count += 1
+        except BaseException:
+            self.__connection.execute("ROLLBACK TO import_records")
+            raise
+        finally:
+            self.__connection.execute("RELEASE import_records")
+        return count
+
+    def export_records(self, cls, file):
+        """Write the rows of cls to file as NDJSON, straight from the
+        database, and return their count."""
+        name = cls if isinstance(cls, str) else cls.__name__
+        if name not in self.classes():
+            return 0
+        self.__flush()
+        count = 0
+        for data, in self.__connection.execute(
+                'SELECT data FROM "{}"'.format(name)):
+            file.write(data)
+            file.write("\n")
+            count += 1
+        return count
+
+    def save(self):
+        """Write the pending changes and commit them, unless a batch is
+        open."""
+        self.__flush()
+        if not self.__batch:
+            self.__connection.commit()
+
+    def __flush(self):
+        """Write the pending changes in the current transaction."""
+        if self.__connection is None:
+            self.reload()
+        for key, obj in self.__pending.items():
+            self.__write(key, obj)
+        self.__pending.clear()
+
+    def __write(self, key, obj):
+        """Write the row of obj, or delete the row of key if obj is None."""
+        name, id = key.split(".", 1)
+        text = name in self.__searchable
+        if text:
+            self.__connection.execute(
+                'DELETE FROM "{}_text" WHERE id = ?'.format(name), (id,))
+        if obj is None:
+            self.__connection.execute(
+                'DELETE FROM "{}" WHERE id = ?'.format(name), (id,))
+        else:
+            data = obj.to_dict()
+            self.__connection.execute(
+                'INSERT OR REPLACE INTO "{}" VALUES (?, ?, ?, ?)'
+                .format(name), (id, data["created_at"],
+                                data["updated_at"], json.dumps(data)))
+            if text:
+                self.__connection.execute(
+                    'INSERT INTO "{}_text" VALUES (?, ?)'.format(name),
+                    (id, self.__body(name, data)))
+
+    def __select(self, name, where, params=()):
+        """Return {key: object} for the rows of table name matching where,
+        reusing the objects already in the session."""
+        cls = self.classes().get(name)
+        if cls is None:
+            return {}
+        self.__flush()
+        objects = {}
+        for id, data in self.__connection.execute(
+                'SELECT id, data FROM "{}" {}'.format(name, where), params):
+            key = "{}.{}".format(name, id)
+            if key not in self.__objects:
+                self.__objects[key] = cls(**json.loads(data))
+            objects[key] = self.__objects[key]
+        return objects
@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+"""
+crash-safe file writes and background flushing
+"""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def atomic_write(path, text):
+    """Replace the file at path by text, a str or bytes, atomically.
+
+    The text goes to a temporary file of the same directory, is fsync'ed
+    and renamed over path, so after a crash path holds either the old or
+    the new content, never a truncated one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, temp = tempfile.mkstemp(dir=directory, suffix=".tmp",
+                                prefix="." + os.path.basename(path) + ".")
+    try:
+        if isinstance(text, bytes):
+            file = os.fdopen(fd, 'wb')
+        else:
+            file = os.fdopen(fd, 'w', encoding='utf-8')
+        with file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp, mode)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    fsync_directory(directory)
+
+
+def fsync_directory(directory):
+    """Make a rename in directory durable, where the OS supports it."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def signature(path):
+    """Return (size, mtime in ns, inode) of the file at path, or None if it
+    does not exist; an atomic replace always changes the inode, so a
+    different signature means the file was rewritten."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Hold an advisory lock on the file at path, created if needed, for
+    the duration of the block: exclusive by default, shared if shared.
+
+    Only processes taking the same lock are excluded; on systems without
+    fcntl the block runs unlocked.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as file:
+        fcntl.flock(file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+class Flusher(threading.Thread):
+    """Background thread running flush() for the requested saves.
+
+    A request() is served after interval seconds, so all the saves
+    requested in the meantime are coalesced into one flush().
+
+    Attributes:
+        interval (float): seconds to wait for more requests.
+        error (Exception): the last error raised by flush(), if any.
+    """
+
+    def __init__(self, flush, interval=1.0):
+        """Create the thread; call start() to run it."""
+        super().__init__(name="hbnb-flusher", daemon=True)
+        self.interval = interval
+        self.error = None
+        self.__flush = flush
+        self.__requested = threading.Event()
+        self.__stopped = threading.Event()
+
+    def request(self):
+        """Ask for a flush within interval seconds."""
+        self.__requested.set()
+
+    def run(self):
+        """Serve the requests until stop() is called."""
+        while True:
+            self.__requested.wait()
+            if self.__stopped.wait(self.interval):
+                return
+            self.__requested.clear()
+            try:
+                self.__flush()
+            except Exception as error:
+                self.error = error
+
+    def stop(self):
+        """Stop the thread and return True if a request was not served."""
+        requested = self.__requested.is_set()
+        self.__stopped.set()
+        self.__requested.set()
+        self.join()
+        return requested
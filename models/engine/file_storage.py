@@ -3,46 +3,1226 @@
 json serioulize/deserialize
 """
 
+import atexit
 import json
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
 from models.base_model import BaseModel
 from models.user import User
+from models.state import State
+from models.city import City
+from models.place import Place
+from models.amenity import Amenity
+from models.review import Review
+from models.engine.journal import Journal
+from models.engine.indexes import (AggregateIndex, AttributeIndex, GridIndex,
+                                   RangeIndex, RollupIndex, TextIndex,
+                                   bounding_box, coordinates, distance_km)
+from models.engine.lazy import LazyObjects
+from models.engine.ndjson import read_objects, write_records
+from models.engine.durability import (Flusher, atomic_write, file_lock,
+                                      signature)
+from models.engine.formats import get_format, read_items
+from models.engine.locks import ReadWriteLock
+from models.engine.query import Query
+
+# size of the first line of <file>.fts, the signature of the snapshot
+FTS_HEADER = 64
+
 
 class FileStorage:
+    """Serializes instances to a JSON file and deserializes them back.
+
+    By default every save() rewrites the whole snapshot. With use_journal()
+    a save() only appends the objects changed since the last save to
+    <file>.log, and the log is folded back into the snapshot by compact().
+    With use_shards() each class is stored in its own file of the
+    directory <file>.d, written only when one of its objects changed and
+    read only when the class is first accessed. With use_shared() several
+    processes can work on the same files, and with use_threads() several
+    threads can use the storage at once. use_format() selects how the
+    snapshot and the shards are encoded.
+
+    Attributes:
+        __file_path (str): path of the JSON snapshot.
+        __objects (dict): objects stored by <class name>.<id>.
+        __pending (dict): the dirty keys, changed since the last save,
+            mapped to the object to write or None when it was deleted.
+        __serialized (dict): cached JSON text of the clean objects, so a
+            snapshot only serializes the dirty ones again.
+        __format: the format the snapshot and the shards are written in;
+            reload() detects the format of each file it reads.
+        __journal (Journal): the append-only log, None in snapshot mode.
+        __compact_min (int): smallest log size that triggers a compaction.
+        __shard_dir (str): directory of the per-class files, None for the
+            single-file layout.
+        __unloaded (set): names of the classes whose shard is not read.
+        __flusher (Flusher): background thread serving the saves, None
+            when save() writes synchronously.
+        __lock (ReadWriteLock): every change of the objects, of the
+            indexes and of __pending is made under its write side; in
+            thread-safe mode the readers hold its read side.
+        __io_lock (RLock): serializes the writes to the files.
+        __batch (bool): True while a batch is open; save() then waits for
+            commit().
+        __lazy (bool): if True, reload() keeps the raw dictionaries and
+            objects are only built when they are first accessed.
+        __threads (bool): if True, the reads are made under the read lock
+            and all() returns a copy, so other threads may write meanwhile.
+        __shared (bool): if True, the files are locked while they are read
+            or written and the changes of other processes are merged in.
+        __seen (dict): signature of each file when this process last read
+            or wrote it, to detect the writes of other processes.
+        __log_offset (int): size of the journal already applied.
+        __version (int): number of changes made to the objects.
+        __versions (dict): value of __version after the last change of
+            the objects of each class, by class name.
+        __rebuilt (int): value of __version after the last time all the
+            objects were replaced, e.g. by reload().
+        __by_class (dict): per-class index, class name -> {key: None}.
+        __indexed (dict): the __objects dictionary __by_class was built
+            for, so an __objects swapped from outside is detected.
+        __indexes (dict): secondary indexes by class name; the foreign keys
+            of the models, the position of the Places, their numeric
+            attributes and the words of the Places and Reviews are indexed
+            by default, and the Reviews per Place and the Places (with
+            their average price) per City and per State are counted. In the
+            single-file layout the text indexes are saved next to the
+            snapshot, in <file>.fts.
+        __fts_saved (tuple): the changes counts of the text indexes as
+            saved in <file>.fts, and the signature of that file, or None
+            when it may not hold them.
+        __places_by_city (AggregateIndex): the Places per City, rolled up
+            per State by the RollupIndex of the Cities.
+    """
     __file_path = "file.json"
     __objects = {}
+    __pending = {}
+    __serialized = {}
+    __format = get_format("json")
+    __journal = None
+    __compact_min = 1000
+    __shard_dir = None
+    __unloaded = set()
+    __flusher = None
+    __lock = ReadWriteLock()
+    __io_lock = threading.RLock()
+    __batch = False
+    __lazy = False
+    __threads = False
+    __shared = False
+    __seen = {}
+    __log_offset = 0
+    __version = 0
+    __versions = {}
+    __rebuilt = 0
+    __by_class = {}
+    __indexed = None
+    __fts_saved = None
+    __places_by_city = AggregateIndex("Place", "city_id", "price_by_night")
+    __indexes = {
+        "City": [AttributeIndex("City", "state_id"),
+                 RollupIndex("City", "state_id", __places_by_city)],
+        "Place": [AttributeIndex("Place", "city_id"),
+                  AttributeIndex("Place", "user_id"),
+                  GridIndex("Place"),
+                  RangeIndex("Place", "price_by_night"),
+                  RangeIndex("Place", "max_guest"),
+                  RangeIndex("Place", "number_rooms"),
+                  RangeIndex("Place", "number_bathrooms"),
+                  TextIndex("Place", ("name", "description")),
+                  __places_by_city],
+        "Review": [AttributeIndex("Review", "place_id"),
+                   AttributeIndex("Review", "user_id"),
+                   TextIndex("Review", ("text",)),
+                   AggregateIndex("Review", "place_id")],
+    }
+
+    def classes(self):
+        """Return a dictionary of the valid classes by name."""
+        return {"BaseModel": BaseModel,
+                "User": User,
+                "State": State,
+                "City": City,
+                "Place": Place,
+                "Amenity": Amenity,
+                "Review": Review}
+
+    def attributes(self):
+        """Return the valid attributes and their types for each class."""
+        attributes = {}
+        for name, cls in self.classes().items():
+            attributes[name] = {"id": str,
+                                "created_at": datetime,
+                                "updated_at": datetime}
+            for attr, value in vars(cls).items():
+                if not attr.startswith("_") and not callable(value):
+                    attributes[name][attr] = type(value)
+        return attributes
+
+    def use_journal(self, enabled=True, compact_min=1000):
+        """Switch between journal mode and whole-snapshot mode.
+
+        compact_min is the smallest number of log records that makes a
+        save() fold the log back into the snapshot.
+        """
+        if enabled:
+            FileStorage.__journal = Journal(self.__file_path + ".log")
+            FileStorage.__compact_min = compact_min
+        else:
+            if self.__journal is not None:
+                self.compact()
+            FileStorage.__journal = None
+
+    def use_shards(self, enabled=True):
+        """Switch between the sharded layout and the single file.
+
+        Called before reload(), it only selects the layout and reload()
+        migrates the files. Called once objects are loaded, it writes all
+        of them in the new layout. The journal only applies to the
+        single-file layout.
+        """
+        if enabled == (self.__shard_dir is not None):
+            return
+        self.__load_shards()
+        loaded = len(self.__objects) > 0
+        if enabled:
+            FileStorage.__shard_dir = self.__file_path + ".d"
+            if loaded:
+                for name in self.classes():
+                    self.__write_shard(name)
+                if os.path.isfile(self.__file_path):
+                    os.replace(self.__file_path,
+                               self.__file_path + ".migrated")
+                self.__drop_log()
+        else:
+            FileStorage.__shard_dir = None
+            if loaded:
+                self.__write_snapshot()
+
+    def use_format(self, name="json"):
+        """Write the snapshot and the shards in the format name: "json",
+        "gzip" or "zlib" (the compressed JSON text) or "columns" (binary,
+        by class and attribute, see formats.ColumnarFormat).
+
+        The files are rewritten in the new format by the next save that
+        writes them; files in any format are read. Raise ValueError for
+        an unknown name.
+        """
+        FileStorage.__format = get_format(name)
+
+    def use_lazy(self, enabled=True):
+        """Switch on or off the lazy hydration of reloaded objects."""
+        FileStorage.__lazy = enabled
+
+    def use_threads(self, enabled=True):
+        """Switch on or off the thread-safe mode.
+
+        Any number of threads may then read at the same time, while the
+        changes and the saves wait for the readers to finish and run one
+        at a time. all() returns a copy of the objects instead of the
+        dictionary itself, and the results of a query are gathered
+        before they are returned, so they can be iterated while other
+        threads write.
+        """
+        FileStorage.__threads = enabled
+
+    @contextmanager
+    def __reading(self, *names):
+        """Hold the read lock while the objects of the classes names, or
+        of every class, are read; in thread-safe mode only.
+
+        Their shards are loaded and the indexes rebuilt first, under the
+        write lock, since a reader cannot start writing.
+        """
+        if not self.__threads:
+            yield
+            return
+        self.__load_shards(*names)
+        while True:
+            with self.__lock.reading():
+                if not self.__stale():
+                    yield
+                    return
+            with self.__lock.writing():
+                self.__sync()
+
+    def use_shared(self, enabled=True):
+        """Switch on or off the sharing of the files with other processes.
+
+        Shared files are read under a shared advisory lock on <file>.lock
+        and written under an exclusive one. Before writing, the changes
+        made by other processes since this one last read the files are
+        merged in object by object; an object changed on both sides keeps
+        the local version.
+        """
+        FileStorage.__shared = enabled
+
+    def refresh(self):
+        """Apply the changes written by other processes since this one last
+        read or wrote the files, and return how many objects changed.
+
+        Unchanged files are detected by their size, mtime and inode, so a
+        refresh without external writes costs a stat(); otherwise only the
+        objects whose record differs are rebuilt, and in journal mode only
+        the end of the log is read. Does nothing unless use_shared().
+        """
+        if not self.__shared:
+            return 0
+        with self.__locked(shared=True):
+            return self.__merge()
+
+    def __locked(self, shared=False):
+        """Return a context manager holding the lock of the shared files,
+        or doing nothing if the files are not shared."""
+        if not self.__shared:
+            return nullcontext()
+        return file_lock(self.__file_path + ".lock", shared)
+
+    def __merge(self):
+        """Apply the records of the files written by other processes to
+        the objects without local changes; return how many changed."""
+        with self.__lock.writing():
+            self.__sync()
+            changed = 0
+            if self.__shard_dir is not None:
+                for name in self.classes():
+                    path = self.__shard_path(name)
+                    if (name not in self.__unloaded and
+                            signature(path) != self.__seen.get(path)):
+                        changed += self.__merge_file(path, [name])
+                return changed
+            path = self.__file_path
+            if signature(path) != self.__seen.get(path):
+                changed += self.__merge_file(path, list(self.classes()))
+                FileStorage.__log_offset = 0
+                if self.__journal is not None:
+                    self.__journal.entries = 0
+            log = self.__log()
+            if log is not None:
+                records, offset = log.tail(self.__log_offset)
+                FileStorage.__log_offset = offset
+                log.entries += len(records)
+                for op, key, value in records:
+                    changed += self.__apply(key, value)
+            return changed
+
+    def __merge_file(self, path, names):
+        """Apply the records of the JSON file at path, and remove the
+        objects of the classes names missing from it; return how many
+        objects changed."""
+        classes = self.classes()
+        self.__seen[path] = signature(path)
+        found = set()
+        changed = 0
+        try:
+            for key, value in read_items(path):
+                if key.split(".")[0] in classes:
+                    found.add(key)
+                    changed += self.__apply(key, value)
+        except FileNotFoundError:
+            pass
+        for name in names:
+            for key in list(self.__by_class.get(name, {})):
+                if key not in found:
+                    changed += self.__apply(key, None)
+        return changed
+
+    def __apply(self, key, value):
+        """Store the record value read from a file under key, or remove
+        key if value is None, unless key has local changes not saved yet.
+        Return 1 if the object changed, else 0."""
+        name = key.split(".")[0]
+        if key in self.__pending or name not in self.classes():
+            return 0
+        objects = self.__objects
+        if value is None:
+            if key not in objects:
+                return 0
+            objects.pop(key)
+            self.__by_class.get(name, {}).pop(key, None)
+            for index in self.__indexes.get(name, []):
+                index.remove(key)
+            self.__serialized.pop(key, None)
+            self.__changed(name)
+            return 1
+        text = json.dumps(value)
+        if key in objects:
+            if self.__serialized.get(key) is None:
+                self.__serialized[key] = json.dumps(self.__record(key))
+            if self.__serialized[key] == text:
+                return 0
+            self.__serialized.pop(key)
+        if isinstance(objects, LazyObjects):
+            objects.set_raw(key, value)
+        else:
+            objects[key] = self.classes()[name](**value)
+        self.__by_class.setdefault(name, {})[key] = None
+        for index in self.__indexes.get(name, []):
+            index.update(key, self.__peek(key))
+        self.__changed(name)
+        return 1
+
+    def start_flusher(self, interval=1.0):
+        """Serve save() from a background thread that writes at most once
+        every interval seconds, so save() returns right away."""
+        self.stop_flusher()
+        FileStorage.__flusher = Flusher(self.__flush, interval)
+        FileStorage.__flusher.start()
+        atexit.register(self.stop_flusher)
+
+    def stop_flusher(self):
+        """Stop the background thread and write what it had not written."""
+        flusher = self.__flusher
+        if flusher is None:
+            return
+        FileStorage.__flusher = None
+        if flusher.stop():
+            self.__flush()
+
+    def all(self, cls=None):
+        """Return the dictionary __objects, or a copy of it in thread-safe
+        mode.
+
+        When cls (a class or a class name) is given, only the objects of
+        that class are returned, read from the per-class index.
+        """
+        if cls is None:
+            self.__load_shards()
+            with self.__reading():
+                if self.__threads:
+                    return dict(self.__objects)
+                return self.__objects
+        with self.__reading(self.__name(cls)):
+            objects = self.__objects
+            return {key: objects[key] for key in self.__class_index(cls)}
+
+    def count(self, cls=None):
+        """Return the number of objects, optionally of one class only.
+
+        The counts are the sizes of the per-class index, kept up to date
+        by new() and delete(), so no object is visited.
+        """
+        if cls is None:
+            self.__load_shards()
+            return len(self.__objects)
+        with self.__reading(self.__name(cls)):
+            return len(self.__class_index(cls))
+
+    def version(self, cls=None):
+        """Return a number that changes whenever an object, or an object
+        of cls, is added, changed or deleted, and only grows; callers
+        use it to tell whether what they read from the storage is still
+        current."""
+        names = () if cls is None else (self.__name(cls),)
+        if not self.__threads:
+            self.__load_shards(*names)
+            self.__sync()
+        with self.__reading(*names):
+            if cls is None:
+                return self.__version
+            return max(self.__versions.get(names[0], 0), self.__rebuilt)
+
+    def __changed(self, name):
+        """Record a change of the objects of the class name."""
+        FileStorage.__version += 1
+        self.__versions[name] = self.__version
+
+    def get(self, cls, id):
+        """Return the object of class cls with the given id, or None."""
+        name = self.__name(cls)
+        self.__load_shards(name)
+        with self.__reading(name):
+            return self.__objects.get("{}.{}".format(name, id))
+
+    def find(self, cls, attribute, value):
+        """Return {key: object} for the objects of cls whose attribute
+        equals value, through an AttributeIndex when one is declared.
+        """
+        name = self.__name(cls)
+        with self.__reading(name):
+            keys = self.__class_index(name)
+            objects = self.__objects
+            index = self.__attribute_index(name, attribute)
+            if index is not None:
+                return {key: objects[key] for key in index.find(value)}
+            return {key: objects[key] for key in keys
+                    if getattr(self.__peek(key), attribute, None) == value}
+
+    def query(self, cls):
+        """Return a Query of the objects of cls."""
+        return Query(self, cls)
+
+    def execute(self, query):
+        """Return an iterator of the results of query.
+
+        The candidates come from an AttributeIndex when an equality
+        condition of the query is indexed, else from a RangeIndex when
+        a comparison or the order is on a sorted attribute, else from
+        the class index. Walking a RangeIndex of the order attribute
+        gives the candidates already sorted, so the top k are found
+        without sorting every object. In thread-safe mode the results
+        are gathered under the read lock.
+        """
+        with self.__reading(query.class_name):
+            results = self.__execute(query)
+            if self.__threads:
+                results = iter(list(results))
+            return results
+
+    def __execute(self, query):
+        """Return an iterator of the results of query, see execute()."""
+        name = query.class_name
+        keys = self.__class_index(name)
+        objects = self.__objects
+        for attribute, op, value in query.conditions:
+            index = self.__attribute_index(name, attribute)
+            if op in ("=", "==") and index is not None:
+                keys = index.find(value)
+                return query.apply(objects[key] for key in keys)
+        order = query.order
+        ranged = [attribute for attribute, op, _ in query.conditions
+                  if op != "!=" and
+                  self.__range_index(name, attribute) is not None]
+        if order is not None and order[0] in ranged:
+            ranged.insert(0, order[0])
+        if ranged:
+            attribute = ranged[0]
+            low, include_low, high, include_high = query.bounds(attribute)
+            keys = self.__range_index(name, attribute).range(
+                low, high, include_low, include_high)
+            if order is None or order[0] != attribute:
+                return query.apply(objects[key] for key in keys)
+            if order[1]:
+                keys.reverse()
+            return query.apply((objects[key] for key in keys), ordered=True)
+        if order is not None:
+            index = self.__range_index(name, order[0])
+            if index is not None:
+                return query.apply((objects[key] for key in
+                                    index.ordered(order[1])), ordered=True)
+        return query.apply(objects[key] for key in list(keys))
+
+    def within(self, cls, south, west, north, east):
+        """Return {key: object} for the objects of cls located in the
+        bounding box, through a GridIndex when one is declared.
+
+        A box with west > east crosses the 180th meridian.
+        """
+        name = self.__name(cls)
+        with self.__reading(name):
+            keys = self.__class_index(name)
+            objects = self.__objects
+            index = self.__grid_index(name)
+            if index is not None:
+                return {key: objects[key]
+                        for key in index.within(south, west, north, east)}
+            found = {}
+            for key in keys:
+                position = coordinates(self.__peek(key), "latitude",
+                                       "longitude")
+                if position is None:
+                    continue
+                lat, lon = position
+                if south <= lat <= north and (
+                        west <= lon <= east if west <= east else
+                        lon >= west or lon <= east):
+                    found[key] = objects[key]
+            return found
+
+    def near(self, cls, latitude, longitude, km):
+        """Return {key: object} for the objects of cls at most km away
+        from (latitude, longitude), nearest first."""
+        name = self.__name(cls)
+        with self.__reading(name):
+            self.__class_index(name)
+            objects = self.__objects
+            index = self.__grid_index(name)
+            if index is not None:
+                return {key: objects[key]
+                        for _, key in index.near(latitude, longitude, km)}
+            found = []
+            box = bounding_box(latitude, longitude, km)
+            for key in self.within(name, *box):
+                position = coordinates(self.__peek(key), "latitude",
+                                       "longitude")
+                distance = distance_km(latitude, longitude, *position)
+                if distance <= km:
+                    found.append((distance, key))
+            found.sort()
+            return {key: objects[key] for _, key in found}
+
+    def search(self, cls, text):
+        """Return {key: object} for the objects of cls whose indexed text
+        contains every word of text, best match first, through the
+        TextIndex of cls; classes without one have nothing to search."""
+        name = self.__name(cls)
+        with self.__reading(name):
+            self.__class_index(name)
+            objects = self.__objects
+            for index in self.__indexes.get(name, []):
+                if isinstance(index, TextIndex):
+                    return {key: objects[key]
+                            for _, key in index.search(text)}
+            return {}
+
+    def stats(self, cls, attribute, group=None):
+        """Return the statistics of the objects of cls grouped by attribute,
+        read from the maintained aggregates.
+
+        A row is {"count": n} plus {"average_<value>": average} when the
+        aggregate sums a value. With group, return the row of that group,
+        else {group: row} for every group. Return None when no aggregate
+        of cls by attribute is maintained.
+        """
+        name = self.__name(cls)
+        names = [name]
+        source = None
+        for indexes in self.__indexes.values():
+            for index in indexes:
+                if (isinstance(index, AggregateIndex) and
+                        index.class_name == name and
+                        index.attribute == attribute):
+                    source, value = index, index.value
+                elif (isinstance(index, RollupIndex) and
+                        index.child.class_name == name and
+                        index.attribute == attribute):
+                    names.append(index.class_name)
+                    source, value = index, index.child.value
+        if source is None:
+            return None
+
+        def row(stats):
+            """Return the row of [count, sum, number of summed values]."""
+            result = {"count": stats[0]}
+            if value is not None:
+                result["average_" + value] = (stats[1] / stats[2]
+                                              if stats[2] else None)
+            return result
+        with self.__reading(*names):
+            for name in names:
+                self.__class_index(name)
+            if group is not None:
+                return row(source.stats(group))
+            return {group: row(stats)
+                    for group, stats in source.groups().items()}
+
+    def __range_index(self, name, attribute):
+        """Return the RangeIndex of attribute of class name, or None."""
+        for index in self.__indexes.get(name, []):
+            if isinstance(index, RangeIndex) and index.attribute == attribute:
+                return index
+        return None
+
+    def __grid_index(self, name):
+        """Return the GridIndex of class name, or None."""
+        for index in self.__indexes.get(name, []):
+            if isinstance(index, GridIndex):
+                return index
+        return None
+
+    def __attribute_index(self, name, attribute):
+        """Return the AttributeIndex of attribute of class name, or None."""
+        for index in self.__indexes.get(name, []):
+            if (isinstance(index, AttributeIndex) and
+                    index.attribute == attribute):
+                return index
+        return None
 
-    def all(self):
-        """Return the dictionary __objects."""
-        return self.__objects
+    def add_index(self, index):
+        """Register a secondary index and fill it with the stored objects."""
+        self.__load_shards(index.class_name)
+        self.__sync()
+        self.__indexes.setdefault(index.class_name, []).append(index)
+        for key in self.__by_class.get(index.class_name, {}):
+            index.add(key, self.__peek(key))
+        return index
+
+    def __peek(self, key):
+        """Return the object under key without hydrating it."""
+        if isinstance(self.__objects, LazyObjects):
+            return self.__objects.peek(key)
+        return self.__objects[key]
+
+    def __name(self, cls):
+        """Return the name of cls, a class or a class name."""
+        return cls if isinstance(cls, str) else cls.__name__
+
+    def __class_index(self, cls):
+        """Return the keys of the objects of the class cls."""
+        name = self.__name(cls)
+        self.__load_shards(name)
+        self.__sync()
+        return self.__by_class.get(name, {})
+
+    def __shard_path(self, name):
+        """Return the path of the file of the class name."""
+        return os.path.join(self.__shard_dir, name + ".json")
+
+    def __load_shards(self, *names):
+        """Read the shards of the classes names, or of every class, that
+        were not read yet, and index their objects."""
+        if not self.__unloaded:
+            return
+        for name in names or list(self.__unloaded):
+            if name not in self.__unloaded:
+                continue
+            with self.__lock.writing():
+                if name not in self.__unloaded:
+                    continue
+                self.__unloaded.discard(name)
+                self.__sync()
+                keys = self.__read(self.__shard_path(name))
+                by_class = self.__by_class.setdefault(name, {})
+                for key in keys:
+                    by_class[key] = None
+                    for index in self.__indexes.get(name, []):
+                        index.update(key, self.__peek(key))
+
+    def __stale(self):
+        """Return True if __objects was changed from outside the indexes."""
+        return (self.__indexed is not self.__objects or
+                sum(map(len, self.__by_class.values())) !=
+                len(self.__objects))
+
+    def __sync(self):
+        """Rebuild the indexes if __objects was changed from outside."""
+        if self.__stale():
+            self.__rebuild_index()
+
+    def __rebuild_index(self, restored=None, changed=()):
+        """Rebuild the per-class index and the secondary indexes.
+
+        restored maps the ids of text indexes to the documents read from
+        <file>.fts; those indexes are loaded instead of rebuilt and only
+        the keys in changed are indexed again.
+        """
+        by_class = {}
+        for key in self.__objects:
+            by_class.setdefault(key.split(".")[0], {})[key] = None
+        FileStorage.__by_class = by_class
+        FileStorage.__indexed = self.__objects
+        FileStorage.__version += 1
+        FileStorage.__rebuilt = self.__version
+        FileStorage.__serialized = {}
+        saved = {}
+        for name, indexes in self.__indexes.items():
+            keys = by_class.get(name, {})
+            for index in indexes:
+                documents = None
+                if restored and isinstance(index, TextIndex):
+                    documents = restored.get(self.__text_index_id(index))
+                if documents is None:
+                    index.clear()
+                    for key in keys:
+                        index.add(key, self.__peek(key))
+                    continue
+                index.load(documents)
+                saved[self.__text_index_id(index)] = index.changes
+                for key in changed:
+                    if key in keys:
+                        index.update(key, self.__peek(key))
+                    else:
+                        index.remove(key)
+        FileStorage.__fts_saved = None
+        if restored and len(saved) == len(self.__text_indexes()):
+            FileStorage.__fts_saved = (saved, signature(
+                self.__file_path + ".fts"))
+
+    def __text_index_id(self, index):
+        """Return the name of index in <file>.fts."""
+        return "{}:{}".format(index.class_name, ",".join(index.attributes))
+
+    def __text_indexes(self):
+        """Return the TextIndex of every class."""
+        return [index for indexes in self.__indexes.values()
+                for index in indexes if isinstance(index, TextIndex)]
+
+    def __signature(self):
+        """Return the size and modification time of the snapshot, or None
+        if it does not exist."""
+        try:
+            stat = os.stat(self.__file_path)
+        except FileNotFoundError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def __dump_text_indexes(self):
+        """Return the changes counts of the text indexes and their JSON
+        text, or None for the text if <file>.fts already holds them; called
+        with the lock held, so they match the snapshot being written."""
+        indexes = self.__text_indexes()
+        changes = {self.__text_index_id(index): index.changes
+                   for index in indexes}
+        saved = self.__fts_saved
+        if not indexes or saved == (changes, signature(
+                self.__file_path + ".fts")):
+            return changes, None
+        return changes, "{" + ", ".join(
+            json.dumps(self.__text_index_id(index)) + ": " + index.dump()
+            for index in indexes) + "}"
+
+    def __write_text_indexes(self, changes, text):
+        """Save the text indexes to <file>.fts after the signature of the
+        snapshot they match.
+
+        The signature is the first line, of FTS_HEADER bytes, so when the
+        text indexes did not change since the file was written (text is
+        None) only that line is rewritten in place. A line torn by a crash
+        does not match any snapshot and the indexes are then rebuilt.
+        """
+        if not changes:
+            return
+        path = self.__file_path + ".fts"
+        header = json.dumps({"signature": self.__signature()})
+        header = header.ljust(FTS_HEADER - 1) + "\n"
+        if text is None:
+            with open(path, 'r+b') as file:
+                file.write(header.encode("utf-8"))
+                file.flush()
+                os.fsync(file.fileno())
+        else:
+            atomic_write(path, header + text)
+        FileStorage.__fts_saved = (changes, signature(path))
+
+    def __read_text_indexes(self):
+        """Return the text indexes saved in <file>.fts by their ids, or
+        None if the file is missing or does not match the snapshot."""
+        signature = self.__signature()
+        if signature is None:
+            return None
+        try:
+            with open(self.__file_path + ".fts", 'r',
+                      encoding='utf-8') as file:
+                header = json.loads(file.readline())
+                if (not isinstance(header, dict) or
+                        header.get("signature") != signature):
+                    return None
+                indexes = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return indexes if isinstance(indexes, dict) else None
 
     def new(self, obj):
         """Set in __objects the obj with key <obj class name>.id."""
-        key = "{}.{}".format(obj.__class__.__name__, obj.id)
-        self.__objects[key] = obj
+        name = obj.__class__.__name__
+        key = "{}.{}".format(name, obj.id)
+        with self.__lock.writing():
+            self.__objects[key] = obj
+            self.__by_class.setdefault(name, {})[key] = None
+            for index in self.__indexes.get(name, []):
+                index.update(key, obj)
+            self.__pending[key] = obj
+            self.__serialized.pop(key, None)
+            self.__changed(name)
+
+    def touch(self, obj):
+        """Mark obj as changed so the next save() persists it, and bring
+        the secondary indexes up to date with its attributes.
+
+        Only the stored instance counts: a stale one, left by rollback()
+        or replaced by reload() or a merge, is ignored so it cannot
+        overwrite the current object.
+        """
+        name = obj.__class__.__name__
+        key = "{}.{}".format(name, obj.id)
+        with self.__lock.writing():
+            if key not in self.__objects or self.__peek(key) is not obj:
+                return
+            for index in self.__indexes.get(name, []):
+                index.update(key, obj)
+            self.__pending[key] = obj
+            self.__serialized.pop(key, None)
+            self.__changed(name)
+
+    def delete(self, obj=None):
+        """Delete obj from __objects if it is inside."""
+        if obj is None:
+            return
+        name = obj.__class__.__name__
+        key = "{}.{}".format(name, obj.id)
+        with self.__lock.writing():
+            if self.__objects.pop(key, None) is None:
+                return
+            self.__by_class.get(name, {}).pop(key, None)
+            for index in self.__indexes.get(name, []):
+                index.remove(key)
+            self.__pending[key] = None
+            self.__serialized.pop(key, None)
+            self.__changed(name)
+
+    def in_batch(self):
+        """Return True while a batch is open."""
+        return self.__batch
+
+    def begin(self):
+        """Open a batch: save() does nothing until commit() or rollback().
+
+        The changes made before are written first, even with a flusher,
+        so the file holds the state the batch started from.
+        """
+        with self.__io_lock:
+            if self.__batch:
+                raise RuntimeError("a batch is already open")
+            self.__flush()
+            FileStorage.__batch = True
+
+    def commit(self):
+        """Close the batch and save all its changes at once."""
+        if not self.__batch:
+            raise RuntimeError("no batch is open")
+        FileStorage.__batch = False
+        self.save()
+
+    def rollback(self):
+        """Close the batch and drop its changes.
+
+        Nothing was written since begin(), so the objects are reloaded
+        from the file; references to the old instances become stale.
+        The batch is closed and the objects reloaded under the write lock,
+        so readers never see them half reloaded.
+        """
+        with self.__io_lock:
+            if not self.__batch:
+                raise RuntimeError("no batch is open")
+            with self.__locked(shared=not self.__folding()), \
+                    self.__lock.writing():
+                FileStorage.__batch = False
+                self.__pending.clear()
+                FileStorage.__objects = {}
+                self.__reload()
+
+    @contextmanager
+    def batch(self):
+        """Context manager running its block in a batch, committed on
+        exit or rolled back if an exception is raised."""
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def import_records(self, file):
+        """Store every record of the NDJSON file and return their count.
+
+        The objects are saved once at the end. The whole file is read
+        before any object is stored, so if a line is invalid nothing is
+        imported, even inside an open batch, and ValueError is raised.
+        """
+        if self.__batch:
+            return self.__import(file)
+        with self.batch():
+            return self.__import(file)
+
+    def __import(self, file):
+        """Store every record of the NDJSON file and return their count."""
+        objects = list(read_objects(file, self.classes()))
+        for obj in objects:
+            self.new(obj)
+        return len(objects)
+
+    def export_records(self, cls, file):
+        """Write the objects of cls to file as NDJSON, one at a time,
+        and return their count."""
+        with self.__reading(self.__name(cls)):
+            return self.__export(cls, file)
+
+    def __export(self, cls, file):
+        """Write the objects of cls to file, see export_records()."""
+        objects = self.__objects
+        lazy = isinstance(objects, LazyObjects)
+
+        def records():
+            """Yield the to_dict() form of each object, without
+            hydrating the lazy ones."""
+            for key in self.__class_index(cls):
+                if lazy and not objects.is_hydrated(key):
+                    yield objects.peek(key).data
+                else:
+                    yield objects[key].to_dict()
+        return write_records(file, records())
 
     def save(self):
-        """Serialize __objects to the JSON file (path: __file_path)."""
-        data = {}
-        for key, obj in self.__objects.items():
-            data[key] = obj.to_dict()
-        with open(self.__file_path, 'w', encoding='utf-8') as file:
-            json.dump(data, file)
+        """Persist the changes made since the last save.
+
+        In snapshot mode __objects is serialized to the JSON file; in
+        journal mode only the pending changes are appended to the log.
+        Inside a batch nothing is written until commit(). With a flusher
+        the write is left to the background thread.
+        """
+        if self.__batch:
+            return
+        flusher = self.__flusher
+        if flusher is None:
+            self.__flush()
+            return
+        if flusher.error is not None:
+            error, flusher.error = flusher.error, None
+            raise error
+        flusher.request()
+
+    def __flush(self):
+        """Write the changes made since the last save, now. Shared files
+        are locked and the changes of other processes merged in first.
+        Nothing is written while a batch is open, so a flush requested
+        before begin() cannot write changes rollback() has to undo."""
+        with self.__io_lock:
+            if not self.__batch:
+                self.__write()
+
+    def __write(self):
+        """Write the changes made since the last save, with __io_lock
+        held."""
+        with self.__locked():
+            if self.__shared:
+                self.__merge()
+            if self.__shard_dir is not None:
+                with self.__lock.writing():
+                    names = {key.split(".")[0] for key in self.__pending}
+                    self.__pending.clear()
+                for name in names:
+                    self.__write_shard(name)
+                return
+            if self.__journal is None:
+                self.__compact()
+                return
+            with self.__lock.writing():
+                records = []
+                for key, obj in self.__pending.items():
+                    if obj is None:
+                        records.append(("del", key, None))
+                    else:
+                        records.append(("set", key, obj.to_dict()))
+                self.__pending.clear()
+            if self.__journal.append(records):
+                FileStorage.__log_offset = os.path.getsize(
+                    self.__journal.path)
+            if self.__journal.entries >= max(self.__compact_min,
+                                             len(self.__objects)):
+                self.__compact()
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and empty the log."""
+        with self.__io_lock, self.__locked():
+            self.__compact()
+
+    def __compact(self):
+        """Fold the journal into a fresh snapshot and empty the log, with
+        the files already locked."""
+        self.__write_snapshot()
+        self.__drop_log()
+
+    def __log(self):
+        """Return the journal or, in snapshot mode, the log left by a run
+        in journal mode; None if there is no log."""
+        if self.__journal is not None:
+            return self.__journal
+        if os.path.isfile(self.__file_path + ".log"):
+            return Journal(self.__file_path + ".log")
+        return None
+
+    def __drop_log(self):
+        """Empty the log once its records are in the snapshot or the
+        shards."""
+        log = self.__log()
+        if log is not None:
+            log.truncate()
+        FileStorage.__log_offset = 0
+
+    def __write_snapshot(self):
+        """Serialize __objects to the JSON file (path: __file_path).
+
+        Only the dirty objects are serialized, the JSON text of the
+        others is taken from __serialized. The file is replaced
+        atomically, after the text is built and the lock released.
+        """
+        with self.__lock.writing():
+            self.__sync()
+            self.__pending.clear()
+            format = self.__format
+            content = self.__serialize(self.__objects, format)
+            texts = self.__dump_text_indexes()
+        atomic_write(self.__file_path, self.__encode(content, format))
+        self.__seen[self.__file_path] = signature(self.__file_path)
+        self.__write_text_indexes(*texts)
+
+    def __write_shard(self, name):
+        """Write the file of the class name, reading it first if needed."""
+        self.__load_shards(name)
+        with self.__lock.writing():
+            self.__sync()
+            format = self.__format
+            content = self.__serialize(self.__by_class.get(name, {}),
+                                       format)
+        os.makedirs(self.__shard_dir, exist_ok=True)
+        path = self.__shard_path(name)
+        atomic_write(path, self.__encode(content, format))
+        self.__seen[path] = signature(path)
+
+    def __serialize(self, keys, format):
+        """Return what format encodes for the objects stored under keys:
+        their JSON text for a textual format, built from the cached text
+        of the clean objects, else their (key, record) pairs."""
+        if not format.textual:
+            return [(key, self.__record(key)) for key in keys]
+        serialized = self.__serialized
+        parts = []
+        for key in keys:
+            text = serialized.get(key)
+            if text is None:
+                text = json.dumps(self.__record(key))
+                serialized[key] = text
+            parts.append(json.dumps(key) + ": " + text)
+        return "{" + ", ".join(parts) + "}"
+
+    def __encode(self, content, format):
+        """Return the content of the file in format of what __serialize()
+        returned; called once the lock is released, as compressing takes
+        longer than serializing."""
+        if format.textual:
+            return format.encode(content)
+        return format.dump(content)
+
+    def __record(self, key):
+        """Return the to_dict() form of the object under key, without
+        hydrating it."""
+        objects = self.__objects
+        if isinstance(objects, LazyObjects) and not objects.is_hydrated(key):
+            return objects.peek(key).data
+        return objects[key].to_dict()
 
     def reload(self):
         """
         Deserialize the JSON file to __objects (only if the JSON file exists).
         If the file doesn’t exist, no exception should be raised.
+        The log is replayed on top of the snapshot. Out of journal mode,
+        a log left by a run in journal mode is then folded into the
+        snapshot, so its changes are neither lost nor replayed again over
+        a later snapshot.
+        The file is parsed one record at a time, in the format detected
+        from its first bytes; in lazy mode the records are kept as raw
+        dictionaries until they are accessed.
+        In the sharded layout the shards are only read on demand; a
+        single file newer than the shards, left by the former layout or
+        by a run in the single-file layout, is split into shards and
+        renamed <file>.migrated; so is a log, replayed on top of the
+        single file or of the shards.
+        The text indexes are read from <file>.fts when it was written with
+        the current snapshot, instead of being rebuilt.
+        Shared files are read under the shared lock, or the exclusive one
+        when they are rewritten, and the objects are replaced under the
+        write lock.
         """
+        with self.__io_lock, self.__locked(shared=not self.__folding()), \
+                self.__lock.writing():
+            self.__reload()
+
+    def __folding(self):
+        """Return True if reload() has to fold a log into the snapshot or
+        the shards, and so to write the files."""
+        return (os.path.isfile(self.__file_path + ".log") and
+                (self.__journal is None or self.__shard_dir is not None))
+
+    def __reload(self):
+        """Read the files as described by reload()."""
+        classes = self.classes()
+        if self.__lazy and not isinstance(self.__objects, LazyObjects):
+            FileStorage.__objects = LazyObjects(classes, self.__objects)
+        if self.__shard_dir is not None:
+            log = self.__log()
+            if self.__single_file_newer() or log is not None:
+                FileStorage.__unloaded = set()
+                if os.path.isfile(self.__file_path):
+                    self.__read(self.__file_path)
+                else:
+                    for name in classes:
+                        self.__read(self.__shard_path(name))
+                self.__rebuild_index(None, self.__replay(log))
+                for name in classes:
+                    self.__write_shard(name)
+                if os.path.isfile(self.__file_path):
+                    os.replace(self.__file_path,
+                               self.__file_path + ".migrated")
+                self.__drop_log()
+                return
+            FileStorage.__unloaded = {
+                name for name in classes
+                if os.path.isfile(self.__shard_path(name))}
+            self.__rebuild_index()
+            return
+        shard_dir = self.__file_path + ".d"
+        restored = None
+        if len(self.__objects) == 0:
+            restored = self.__read_text_indexes()
+        if not os.path.isfile(self.__file_path) and os.path.isdir(shard_dir):
+            for name in classes:
+                self.__read(os.path.join(shard_dir, name + ".json"))
+        self.__read(self.__file_path)
+        log = self.__log()
+        self.__rebuild_index(restored, self.__replay(log))
+        if self.__journal is None and log is not None:
+            self.__compact()
+
+    def __replay(self, log):
+        """Apply the records of log, if any, to the objects and return
+        their keys."""
+        replayed = set()
+        FileStorage.__log_offset = 0
+        if log is None:
+            return replayed
+        classes = self.classes()
+        objects = self.__objects
+        lazy = isinstance(objects, LazyObjects)
+        records, FileStorage.__log_offset = log.tail(0)
+        for op, key, value in records:
+            replayed.add(key)
+            cls = classes.get(key.split(".")[0])
+            if op == "del":
+                objects.pop(key, None)
+            elif cls is None:
+                continue
+            elif lazy:
+                objects.set_raw(key, value)
+            else:
+                objects[key] = cls(**value)
+        return replayed
+
+    def __single_file_newer(self):
+        """Return True if the single file exists and was written after
+        every shard: by the former layout, or by a run in the single-file
+        layout since the shards were written; its objects are then the
+        current ones."""
+        if not os.path.isfile(self.__file_path):
+            return False
+        written = os.path.getmtime(self.__file_path)
+        for name in self.classes():
+            path = self.__shard_path(name)
+            if os.path.isfile(path) and os.path.getmtime(path) > written:
+                return False
+        return True
+
+    def __read(self, path):
+        """Store the objects of the file at path, if it exists, in any
+        format, and return their keys."""
+        classes = self.classes()
+        objects = self.__objects
+        lazy = isinstance(objects, LazyObjects)
+        keys = []
+        self.__seen[path] = signature(path)
         try:
-            with open(self.__file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                for key, value in data.items():
-                    class_name, obj_id = key.split(".")
-                    if class_name == 'User':
-                        cls = User
-                    else:
-                        cls = eval(class_name)
-                    obj = cls(**value)
-                    self.__objects[key] = obj
+            for key, value in read_items(path):
+                cls = classes.get(key.split(".")[0])
+                if cls is None:
+                    continue
+                if lazy:
+                    objects.set_raw(key, value)
+                else:
+                    objects[key] = cls(**value)
+                keys.append(key)
         except FileNotFoundError:
             pass
+        return keys
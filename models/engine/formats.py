@@ -0,0 +1,305 @@
+#!/usr/bin/python3
+"""
+serialization formats of the storage files
+"""
+
+import gzip
+import io
+import json
+import sys
+import zlib
+from array import array
+from models.engine.lazy import iter_items
+
+
+class JSONFormat:
+    """A JSON object of the to_dict() records by key, the default.
+
+    A textual format is written from the JSON text built by FileStorage,
+    which reuses the cached text of the clean objects; the others are
+    written from the (key, record) pairs.
+    """
+    name = "json"
+    textual = True
+
+    def matches(self, head):
+        """Return True if a file starting with the bytes head is in this
+        format."""
+        return True
+
+    def encode(self, text):
+        """Return the content of the file holding the JSON text."""
+        return text
+
+    def items(self, file):
+        """Yield the (key, record) pairs of the binary file object."""
+        yield from iter_items(io.TextIOWrapper(file, encoding="utf-8"))
+
+
+class GzipFormat(JSONFormat):
+    """The JSON text compressed with gzip, read as a stream."""
+    name = "gzip"
+
+    def __init__(self, level=6):
+        """Compress at level, from 1 (fastest) to 9 (smallest)."""
+        self.level = level
+
+    def matches(self, head):
+        """Return True if head starts with the gzip magic number."""
+        return head[:2] == b"\x1f\x8b"
+
+    def encode(self, text):
+        """Return the compressed text."""
+        return gzip.compress(text.encode("utf-8"), self.level, mtime=0)
+
+    def items(self, file):
+        """Yield the (key, record) pairs of the compressed file."""
+        with gzip.open(file, "rt", encoding="utf-8") as text:
+            yield from iter_items(text)
+
+
+class ZlibFormat(GzipFormat):
+    """The JSON text compressed with zlib, without the gzip header."""
+    name = "zlib"
+
+    def matches(self, head):
+        """Return True if head is a zlib header (deflate, valid check)."""
+        return (len(head) >= 2 and head[0] == 0x78 and
+                (head[0] << 8 | head[1]) % 31 == 0)
+
+    def encode(self, text):
+        """Return the compressed text."""
+        return zlib.compress(text.encode("utf-8"), self.level)
+
+    def items(self, file):
+        """Yield the (key, record) pairs of the compressed file."""
+        reader = io.BufferedReader(Inflater(file))
+        yield from iter_items(io.TextIOWrapper(reader, encoding="utf-8"))
+
+
+class Inflater(io.RawIOBase):
+    """Readable stream of the decompressed content of a zlib file."""
+
+    def __init__(self, file, chunk_size=1 << 16):
+        """Decompress the binary file object chunk_size bytes at a time."""
+        self.file = file
+        self.chunk_size = chunk_size
+        self.inflater = zlib.decompressobj()
+        self.buffer = b""
+
+    def readable(self):
+        """Return True."""
+        return True
+
+    def readinto(self, buffer):
+        """Fill buffer with decompressed bytes; return how many, or 0 at
+        the end."""
+        while not self.buffer and self.inflater is not None:
+            chunk = self.file.read(self.chunk_size)
+            if chunk:
+                self.buffer = self.inflater.decompress(chunk)
+            else:
+                self.buffer = self.inflater.flush()
+                self.inflater = None
+        size = min(len(buffer), len(self.buffer))
+        buffer[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+
+class ColumnarFormat:
+    """Binary format storing the records of each class by column.
+
+    After the MAGIC bytes, each class is a block: a 4-byte length and a
+    JSON header, then the payloads the header describes. The header holds
+    the distinct attribute orders (layouts) of the records of the class,
+    so attribute names and the class name are written once per class
+    instead of once per record; the layout of each record, when there are
+    several, is an array of their numbers. Each attribute is then a
+    column: the JSON array of its values in record order, or, when at most
+    half of them are distinct, the JSON array of the distinct values and
+    an array of their numbers. The keys are rebuilt from the class and
+    the id.
+
+    Integer arrays are written little-endian, with the smallest item
+    size that holds their largest number. The payloads of a block are
+    compressed together with zlib: the values of a column look alike, so
+    they compress better than whole records.
+    """
+    name = "columns"
+    textual = False
+    MAGIC = b"HBNBCOL\x01"
+
+    def __init__(self, level=6):
+        """Compress at level, from 0 (not compressed) to 9 (smallest)."""
+        self.level = level
+
+    def matches(self, head):
+        """Return True if head starts with MAGIC."""
+        return head.startswith(self.MAGIC)
+
+    def dump(self, items):
+        """Return the content of the file holding the (key, record)
+        pairs."""
+        classes = {}
+        for key, record in items:
+            classes.setdefault(key.split(".")[0], []).append((key, record))
+        parts = [self.MAGIC]
+        for name, pairs in classes.items():
+            parts.extend(self.__block(name, pairs))
+        return b"".join(parts)
+
+    def __block(self, name, pairs):
+        """Return the parts of the block of the records of class name."""
+        layouts = {}
+        rows = []
+        columns = {}
+        keys = []
+        for key, record in pairs:
+            rows.append(layouts.setdefault(tuple(record), len(layouts)))
+            for attribute, value in record.items():
+                columns.setdefault(attribute, []).append(value)
+            keys.append(key[len(name) + 1:])
+        header = {"class": name, "count": len(pairs),
+                  "layouts": [list(layout) for layout in layouts],
+                  "columns": []}
+        payloads = []
+        if len(layouts) > 1:
+            header["rows"] = self.__array(rows, payloads)
+        if keys != [record.get("id") for _, record in pairs]:
+            header["keys"] = self.__column(keys, payloads)
+        for attribute, values in columns.items():
+            header["columns"].append(
+                [attribute] + self.__column(values, payloads))
+        body = zlib.compress(b"".join(payloads), self.level)
+        header["size"] = len(body)
+        header = json.dumps(header).encode("utf-8")
+        return [len(header).to_bytes(4, "little"), header, body]
+
+    def __column(self, values, payloads):
+        """Append the payloads of a column to payloads and return its
+        description: [size of the JSON array, item size of the numbers]
+        or [size, None] for a plain column."""
+        try:
+            distinct = dict.fromkeys(zip(map(type, values), values))
+        except TypeError:
+            distinct = None
+        if distinct is None or len(distinct) * 2 > len(values):
+            text = json.dumps(values).encode("utf-8")
+            payloads.append(text)
+            return [len(text), None]
+        numbers = {value: number for number, value in enumerate(distinct)}
+        text = json.dumps([value for _, value in distinct]).encode("utf-8")
+        payloads.append(text)
+        return [len(text), self.__array(
+            map(numbers.__getitem__, zip(map(type, values), values)),
+            payloads)]
+
+    def __array(self, numbers, payloads):
+        """Append the little-endian array of numbers to payloads and
+        return its item size."""
+        numbers = list(numbers)
+        largest = max(numbers, default=0)
+        for typecode in "BHIQ":
+            if largest < 1 << (8 * array(typecode).itemsize):
+                break
+        numbers = array(typecode, numbers)
+        if sys.byteorder == "big":
+            numbers.byteswap()
+        payloads.append(numbers.tobytes())
+        return numbers.itemsize
+
+    def items(self, file):
+        """Yield the (key, record) pairs of the binary file object."""
+        data = memoryview(file.read())
+        pos = len(self.MAGIC)
+        while pos < len(data):
+            size = int.from_bytes(data[pos:pos + 4], "little")
+            header = json.loads(bytes(data[pos + 4:pos + 4 + size]))
+            pos += 4 + size
+            yield from self.__records(header, memoryview(
+                zlib.decompress(data[pos:pos + header["size"]])))
+            pos += header["size"]
+
+    def __records(self, header, data):
+        """Yield the (key, record) pairs of the block of header, whose
+        payloads are data."""
+        pos = 0
+        name = header["class"]
+        count = header["count"]
+        layouts = [tuple(layout) for layout in header["layouts"]]
+        rows = [0] * count
+        if "rows" in header:
+            rows, pos = self.__read_array(data, pos, header["rows"], count)
+        keys = None
+        if "keys" in header:
+            keys, pos = self.__read_column(data, pos, header["keys"], count)
+        uses = [0] * len(layouts)
+        for row in rows:
+            uses[row] += 1
+        columns = {}
+        for attribute, size, itemsize in header["columns"]:
+            values, pos = self.__read_column(
+                data, pos, [size, itemsize],
+                sum(used for layout, used in zip(layouts, uses)
+                    if attribute in layout))
+            columns[attribute] = iter(values)
+        plans = [(layout, [columns[attribute] for attribute in layout])
+                 for layout in layouts]
+        for number, row in enumerate(rows):
+            layout, values = plans[row]
+            record = dict(zip(layout, map(next, values)))
+            id = keys[number] if keys is not None else record["id"]
+            yield "{}.{}".format(name, id), record
+
+    def __read_column(self, data, pos, description, count):
+        """Return the values of the column described at pos of data, and
+        the position after it."""
+        size, itemsize = description
+        values = json.loads(bytes(data[pos:pos + size]))
+        pos += size
+        if itemsize is None:
+            return values, pos
+        numbers, pos = self.__read_array(data, pos, itemsize, count)
+        return list(map(values.__getitem__, numbers)), pos
+
+    def __read_array(self, data, pos, itemsize, count):
+        """Return the array of count numbers of itemsize bytes at pos of
+        data, and the position after it."""
+        for typecode in "BHIQ":
+            if array(typecode).itemsize == itemsize:
+                break
+        numbers = array(typecode)
+        numbers.frombytes(data[pos:pos + count * itemsize])
+        if sys.byteorder == "big":
+            numbers.byteswap()
+        return numbers, pos + count * itemsize
+
+
+FORMATS = {format.name: format for format in (
+    GzipFormat(), ZlibFormat(), ColumnarFormat(), JSONFormat())}
+
+
+def get_format(name):
+    """Return the format called name; raise ValueError if unknown."""
+    try:
+        return FORMATS[name]
+    except KeyError:
+        raise ValueError("unknown format {}, expected one of {}".format(
+            name, ", ".join(sorted(FORMATS)))) from None
+
+
+def detect(head):
+    """Return the format of a file starting with the bytes head."""
+    for format in FORMATS.values():
+        if format.matches(head):
+            return format
+
+
+def read_items(path):
+    """Yield the (key, record) pairs of the file at path, whatever its
+    format; raise FileNotFoundError if it does not exist."""
+    with open(path, 'rb') as file:
+        head = file.read(len(ColumnarFormat.MAGIC))
+        file.seek(0)
+        yield from detect(head).items(file)
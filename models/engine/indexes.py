@@ -0,0 +1,645 @@
+#!/usr/bin/python3
+"""
+secondary indexes maintained by the storage engine
+"""
+
+import json
+import math
+import re
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from models.engine.query import sort_key
+
+EARTH_RADIUS_KM = 6371.0088
+
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Return the lowercase words of text."""
+    return WORD.findall(text.lower())
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Return the great-circle distance between two points, in km."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) *
+         math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, km):
+    """Return (south, west, north, east) enclosing the circle of radius km
+    around a point; west > east when the box crosses the 180th meridian."""
+    dlat = math.degrees(km / EARTH_RADIUS_KM)
+    south = max(latitude - dlat, -90.0)
+    north = min(latitude + dlat, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0
+    dlon = math.degrees(km / (EARTH_RADIUS_KM *
+                              math.cos(math.radians(abs(latitude) + dlat))))
+    if dlon >= 180.0:
+        return south, -180.0, north, 180.0
+    west = (longitude - dlon + 180.0) % 360.0 - 180.0
+    east = (longitude + dlon + 180.0) % 360.0 - 180.0
+    return south, west, north, east
+
+
+def coordinates(obj, lat_attribute, lon_attribute):
+    """Return the (latitude, longitude) of obj as floats, or None if they
+    are missing or not numbers."""
+    try:
+        lat = float(getattr(obj, lat_attribute, None))
+        lon = float(getattr(obj, lon_attribute, None))
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return lat, lon
+
+
+class Index(ABC):
+    """Base class of the secondary indexes of a storage engine.
+
+    An index covers the objects of one class. The engine calls add() when
+    an object is stored, update() when it changed and remove() when it is
+    deleted, so subclasses only have to keep their own structure in sync.
+
+    Attributes:
+        class_name (str): name of the indexed class.
+    """
+
+    def __init__(self, class_name):
+        """Create an empty index for the objects of class_name."""
+        self.class_name = class_name
+
+    @abstractmethod
+    def add(self, key, obj):
+        """Index obj, stored under key."""
+
+    @abstractmethod
+    def remove(self, key):
+        """Forget the object stored under key."""
+
+    def update(self, key, obj):
+        """Re-index obj after some of its attributes changed."""
+        self.remove(key)
+        self.add(key, obj)
+
+    @abstractmethod
+    def clear(self):
+        """Forget every object."""
+
+
+class AttributeIndex(Index):
+    """Hash index of the objects of a class by the value of one attribute.
+
+    Used for the foreign keys (city_id, state_id, ...) so that all the
+    objects pointing to a given id are found in O(result).
+
+    Attributes:
+        attribute (str): name of the indexed attribute.
+    """
+
+    def __init__(self, class_name, attribute):
+        """Create an empty index of class_name by attribute."""
+        super().__init__(class_name)
+        self.attribute = attribute
+        self.__buckets = {}
+        self.__values = {}
+
+    def add(self, key, obj):
+        """Index obj under the current value of the attribute."""
+        value = getattr(obj, self.attribute, None)
+        try:
+            self.__buckets.setdefault(value, {})[key] = None
+        except TypeError:
+            return
+        self.__values[key] = value
+
+    def remove(self, key):
+        """Forget the object stored under key."""
+        if key not in self.__values:
+            return
+        value = self.__values.pop(key)
+        bucket = self.__buckets[value]
+        del bucket[key]
+        if not bucket:
+            del self.__buckets[value]
+
+    def update(self, key, obj):
+        """Move obj to another bucket if the attribute changed."""
+        value = getattr(obj, self.attribute, None)
+        if key in self.__values and self.__values[key] == value:
+            return
+        self.remove(key)
+        self.add(key, obj)
+
+    def clear(self):
+        """Forget every object."""
+        self.__buckets = {}
+        self.__values = {}
+
+    def find(self, value):
+        """Return the keys of the objects whose attribute is value."""
+        try:
+            return list(self.__buckets.get(value, ()))
+        except TypeError:
+            return []
+
+
+class RangeIndex(Index):
+    """Sorted index of the objects of a class by the value of one attribute.
+
+    The keys are kept sorted by value (numbers first, then strings, see
+    sort_key()), so range queries cost O(log n + result) and the objects
+    can be walked in order to get the top k without sorting them all.
+    Added objects wait in a buffer that is merged on the next lookup, so
+    filling the index costs one sort instead of one insertion each.
+
+    Attributes:
+        attribute (str): name of the indexed attribute.
+    """
+
+    def __init__(self, class_name, attribute):
+        """Create an empty index of class_name by attribute."""
+        super().__init__(class_name)
+        self.attribute = attribute
+        self.__sort_keys = []
+        self.__keys = []
+        self.__added = []
+        self.__values = {}
+
+    def __merge(self):
+        """Move the buffered objects into the sorted lists."""
+        added = self.__added
+        if not added:
+            return
+        self.__added = []
+        if len(added) < 64:
+            for value, key in added:
+                lo = bisect_left(self.__sort_keys, value)
+                hi = bisect_right(self.__sort_keys, value, lo)
+                position = bisect_left(self.__keys, key, lo, hi)
+                self.__sort_keys.insert(position, value)
+                self.__keys.insert(position, key)
+            return
+        added.extend(zip(self.__sort_keys, self.__keys))
+        added.sort()
+        self.__sort_keys = [value for value, _ in added]
+        self.__keys = [key for _, key in added]
+
+    def add(self, key, obj):
+        """Index obj under the current value of the attribute."""
+        value = sort_key(getattr(obj, self.attribute, None))
+        self.__added.append((value, key))
+        self.__values[key] = value
+
+    def remove(self, key):
+        """Forget the object stored under key."""
+        if key not in self.__values:
+            return
+        self.__merge()
+        value = self.__values.pop(key)
+        lo = bisect_left(self.__sort_keys, value)
+        hi = bisect_right(self.__sort_keys, value, lo)
+        position = bisect_left(self.__keys, key, lo, hi)
+        del self.__sort_keys[position]
+        del self.__keys[position]
+
+    def update(self, key, obj):
+        """Move obj if the attribute changed."""
+        value = sort_key(getattr(obj, self.attribute, None))
+        if self.__values.get(key) == value:
+            return
+        self.remove(key)
+        self.add(key, obj)
+
+    def clear(self):
+        """Forget every object."""
+        self.__sort_keys = []
+        self.__keys = []
+        self.__added = []
+        self.__values = {}
+
+    def range(self, low=None, high=None, include_low=True,
+              include_high=True):
+        """Return the keys of the objects whose attribute is between low
+        and high, by increasing value; None means no bound."""
+        self.__merge()
+        start = 0
+        end = len(self.__keys)
+        if low is not None:
+            bisect = bisect_left if include_low else bisect_right
+            start = bisect(self.__sort_keys, sort_key(low))
+        if high is not None:
+            bisect = bisect_right if include_high else bisect_left
+            end = bisect(self.__sort_keys, sort_key(high))
+        return self.__keys[start:end]
+
+    def ordered(self, descending=False):
+        """Return the keys of every object, by increasing value or by
+        decreasing value if descending."""
+        self.__merge()
+        if descending:
+            return self.__keys[::-1]
+        return list(self.__keys)
+
+
+class AggregateIndex(Index):
+    """Count of the objects of a class by the value of one attribute, and
+    sum of another, numeric, attribute over each group.
+
+    The totals are adjusted by every add(), update() and remove(), so
+    the count and average of a group are read in O(1). RollupIndex
+    objects registered in rollups receive each change to sum the groups
+    one level up.
+
+    Attributes:
+        attribute (str): name of the attribute the objects are grouped by.
+        value (str): name of the summed attribute, or None.
+        rollups (list): the RollupIndex objects built on this index.
+    """
+
+    def __init__(self, class_name, attribute, value=None):
+        """Create an empty aggregate of class_name by attribute."""
+        super().__init__(class_name)
+        self.attribute = attribute
+        self.value = value
+        self.rollups = []
+        self.__groups = {}
+        self.__entries = {}
+
+    def __entry(self, obj):
+        """Return (group, number) for obj; number is None if the value
+        attribute is not a number."""
+        number = None
+        if self.value is not None:
+            number = getattr(obj, self.value, None)
+            if (isinstance(number, bool) or
+                    not isinstance(number, (int, float))):
+                number = None
+        return getattr(obj, self.attribute, None), number
+
+    def __apply(self, group, number, sign):
+        """Add (sign 1) or subtract (sign -1) an object to its group."""
+        stats = self.__groups.setdefault(group, [0, 0, 0])
+        stats[0] += sign
+        if number is not None:
+            stats[1] += sign * number
+            stats[2] += sign
+        if stats[0] == 0:
+            del self.__groups[group]
+        for rollup in self.rollups:
+            rollup.propagate(group, number, sign)
+
+    def add(self, key, obj):
+        """Count obj in the group of its attribute."""
+        entry = self.__entry(obj)
+        try:
+            self.__apply(entry[0], entry[1], 1)
+        except TypeError:
+            return
+        self.__entries[key] = entry
+
+    def remove(self, key):
+        """Forget the object stored under key."""
+        entry = self.__entries.pop(key, None)
+        if entry is not None:
+            self.__apply(entry[0], entry[1], -1)
+
+    def update(self, key, obj):
+        """Move obj if its group or value changed."""
+        if self.__entries.get(key) == self.__entry(obj):
+            return
+        self.remove(key)
+        self.add(key, obj)
+
+    def clear(self):
+        """Forget every object."""
+        self.__groups = {}
+        self.__entries = {}
+        for rollup in self.rollups:
+            rollup.reset()
+
+    def stats(self, group):
+        """Return [count, sum, number of summed values] of group."""
+        try:
+            return list(self.__groups.get(group, (0, 0, 0)))
+        except TypeError:
+            return [0, 0, 0]
+
+    def groups(self):
+        """Return {group: [count, sum, number of summed values]}."""
+        return {group: list(stats) for group, stats in self.__groups.items()}
+
+
+class RollupIndex(Index):
+    """Sum of the groups of an AggregateIndex by an attribute of the
+    objects they are grouped by.
+
+    For instance the Places are counted by city_id; a RollupIndex of the
+    Cities by state_id adds up the counts and prices of the Cities of
+    each State, and follows both the changes of the Places and the moves
+    of the Cities from a State to another.
+
+    Attributes:
+        attribute (str): name of the attribute the groups are rolled up by.
+        child (AggregateIndex): the aggregate whose groups are summed; its
+            groups are the ids of the objects of this index.
+    """
+
+    def __init__(self, class_name, attribute, child):
+        """Create an empty rollup of child by attribute of class_name."""
+        super().__init__(class_name)
+        self.attribute = attribute
+        self.child = child
+        child.rollups.append(self)
+        self.__parents = {}
+        self.__groups = {}
+
+    def __apply(self, group, stats, sign):
+        """Add (sign 1) or subtract (sign -1) the stats of a child group."""
+        totals = self.__groups.setdefault(group, [0, 0, 0])
+        for i in range(3):
+            totals[i] += sign * stats[i]
+        if not any(totals):
+            del self.__groups[group]
+
+    def add(self, key, obj):
+        """Add the child group of obj to the group of its attribute."""
+        group = getattr(obj, self.attribute, None)
+        id = key.split(".", 1)[1]
+        try:
+            self.__apply(group, self.child.stats(id), 1)
+        except TypeError:
+            return
+        self.__parents[id] = group
+
+    def remove(self, key):
+        """Forget the object stored under key."""
+        id = key.split(".", 1)[1]
+        if id in self.__parents:
+            self.__apply(self.__parents.pop(id), self.child.stats(id), -1)
+
+    def update(self, key, obj):
+        """Move the child group of obj if its attribute changed."""
+        id = key.split(".", 1)[1]
+        if (id in self.__parents and
+                self.__parents[id] == getattr(obj, self.attribute, None)):
+            return
+        self.remove(key)
+        self.add(key, obj)
+
+    def clear(self):
+        """Forget every object."""
+        self.__parents = {}
+        self.__groups = {}
+
+    def reset(self):
+        """Zero the totals when the child is cleared; they are added back
+        as the child is filled again."""
+        self.__groups = {}
+
+    def propagate(self, child_group, number, sign):
+        """Apply a change of the child group child_group to its parent."""
+        if child_group in self.__parents:
+            self.__apply(self.__parents[child_group],
+                         [1, number or 0, int(number is not None)], sign)
+
+    def stats(self, group):
+        """Return [count, sum, number of summed values] of group."""
+        try:
+            return list(self.__groups.get(group, (0, 0, 0)))
+        except TypeError:
+            return [0, 0, 0]
+
+    def groups(self):
+        """Return {group: [count, sum, number of summed values]}."""
+        return {group: list(stats) for group, stats in self.__groups.items()}
+
+
+class GridIndex(Index):
+    """Spatial index of the objects of a class by latitude and longitude.
+
+    The globe is cut into square cells of cell_size degrees and each
+    object is stored in the cell of its position, so a bounding box or a
+    radius search only visits the cells it overlaps instead of every
+    object.
+
+    Attributes:
+        lat_attribute (str): name of the latitude attribute.
+        lon_attribute (str): name of the longitude attribute.
+        cell_size (float): side of a cell, in degrees.
+    """
+
+    def __init__(self, class_name, lat_attribute="latitude",
+                 lon_attribute="longitude", cell_size=0.1):
+        """Create an empty index of class_name by position."""
+        super().__init__(class_name)
+        self.lat_attribute = lat_attribute
+        self.lon_attribute = lon_attribute
+        self.cell_size = cell_size
+        self.__cells = {}
+        self.__positions = {}
+
+    def __cell(self, lat, lon):
+        """Return the cell holding the point (lat, lon)."""
+        return (math.floor(lat / self.cell_size),
+                math.floor(lon / self.cell_size))
+
+    def add(self, key, obj):
+        """Index obj under its current position, if it has one."""
+        position = coordinates(obj, self.lat_attribute, self.lon_attribute)
+        if position is None:
+            return
+        self.__cells.setdefault(self.__cell(*position), {})[key] = None
+        self.__positions[key] = position
+
+    def remove(self, key):
+        """Forget the object stored under key."""
+        if key not in self.__positions:
+            return
+        cell = self.__cell(*self.__positions.pop(key))
+        bucket = self.__cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self.__cells[cell]
+
+    def update(self, key, obj):
+        """Move obj to another cell if its position changed."""
+        position = coordinates(obj, self.lat_attribute, self.lon_attribute)
+        if position is not None and self.__positions.get(key) == position:
+            return
+        self.remove(key)
+        self.add(key, obj)
+
+    def clear(self):
+        """Forget every object."""
+        self.__cells = {}
+        self.__positions = {}
+
+    def within(self, south, west, north, east):
+        """Return the keys of the objects inside the bounding box.
+
+        A box with west > east crosses the 180th meridian.
+        """
+        if west > east:
+            return (self.within(south, west, north, 180.0) +
+                    self.within(south, -180.0, north, east))
+        south_cell, west_cell = self.__cell(south, west)
+        north_cell, east_cell = self.__cell(north, east)
+        positions = self.__positions
+        keys = []
+        if ((north_cell - south_cell + 1) * (east_cell - west_cell + 1) >
+                len(self.__cells)):
+            cells = [bucket for (x, y), bucket in self.__cells.items()
+                     if south_cell <= x <= north_cell and
+                     west_cell <= y <= east_cell]
+        else:
+            cells = [self.__cells.get((x, y), ())
+                     for x in range(south_cell, north_cell + 1)
+                     for y in range(west_cell, east_cell + 1)]
+        for bucket in cells:
+            for key in bucket:
+                lat, lon = positions[key]
+                if south <= lat <= north and west <= lon <= east:
+                    keys.append(key)
+        return keys
+
+    def near(self, latitude, longitude, km):
+        """Return [(distance in km, key)] of the objects at most km away
+        from (latitude, longitude), nearest first."""
+        positions = self.__positions
+        found = []
+        for key in self.within(*bounding_box(latitude, longitude, km)):
+            distance = distance_km(latitude, longitude, *positions[key])
+            if distance <= km:
+                found.append((distance, key))
+        found.sort()
+        return found
+
+
+class TextIndex(Index):
+    """Inverted index of the words of some text attributes of a class.
+
+    Each object is a document made of the words of its attributes; the
+    index maps every word to the documents containing it with its count,
+    so a search only reads the documents of the words asked for. Results
+    are ranked with BM25.
+
+    Attributes:
+        attributes (tuple): names of the indexed attributes.
+        changes (int): number of changes made to the index, so a copy
+            saved at some count is known to be current while it holds.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, class_name, attributes):
+        """Create an empty index of class_name by the words of attributes."""
+        super().__init__(class_name)
+        self.attributes = tuple(attributes)
+        self.__postings = {}
+        self.__documents = {}
+        self.__length = 0
+        self.__dumped = {}
+        self.changes = 0
+
+    def __count(self, obj):
+        """Return {word: count} for the text attributes of obj."""
+        counts = {}
+        for attribute in self.attributes:
+            value = getattr(obj, attribute, None)
+            if isinstance(value, str):
+                for word in tokenize(value):
+                    counts[word] = counts.get(word, 0) + 1
+        return counts
+
+    def __insert(self, key, counts):
+        """Store the document of key with the word counts counts."""
+        if not counts:
+            return
+        self.changes += 1
+        self.__documents[key] = counts
+        self.__length += sum(counts.values())
+        for word, count in counts.items():
+            self.__postings.setdefault(word, {})[key] = count
+
+    def add(self, key, obj):
+        """Index the words of obj."""
+        self.__insert(key, self.__count(obj))
+
+    def remove(self, key):
+        """Forget the object stored under key."""
+        counts = self.__documents.pop(key, None)
+        if counts is None:
+            return
+        self.changes += 1
+        self.__dumped.pop(key, None)
+        self.__length -= sum(counts.values())
+        for word in counts:
+            postings = self.__postings[word]
+            del postings[key]
+            if not postings:
+                del self.__postings[word]
+
+    def update(self, key, obj):
+        """Re-index obj if its words changed."""
+        counts = self.__count(obj)
+        if self.__documents.get(key, {}) == counts:
+            return
+        self.remove(key)
+        self.__insert(key, counts)
+
+    def clear(self):
+        """Forget every object."""
+        self.changes += 1
+        self.__postings = {}
+        self.__documents = {}
+        self.__length = 0
+        self.__dumped = {}
+
+    def search(self, text):
+        """Return [(score, key)] of the objects containing every word of
+        text, best first."""
+        words = set(tokenize(text))
+        postings = [self.__postings.get(word, {}) for word in words]
+        if not postings:
+            return []
+        postings.sort(key=len)
+        keys = [key for key in postings[0]
+                if all(key in other for other in postings[1:])]
+        total = len(self.__documents)
+        average = self.__length / total if total else 0
+        idf = [math.log(1 + (total - len(p) + 0.5) / (len(p) + 0.5))
+               for p in postings]
+        found = []
+        for key in keys:
+            size = sum(self.__documents[key].values())
+            norm = self.k1 * (1 - self.b + self.b * size / average)
+            score = 0.0
+            for weight, posting in zip(idf, postings):
+                count = posting[key]
+                score += weight * count * (self.k1 + 1) / (count + norm)
+            found.append((-score, key))
+        found.sort()
+        return [(-score, key) for score, key in found]
+
+    def dump(self):
+        """Return the JSON text of the documents, {key: {word: count}}."""
+        dumped = self.__dumped
+        parts = []
+        for key, counts in self.__documents.items():
+            text = dumped.get(key)
+            if text is None:
+                text = json.dumps(counts)
+                dumped[key] = text
+            parts.append(json.dumps(key) + ": " + text)
+        return "{" + ", ".join(parts) + "}"
+
+    def load(self, documents):
+        """Replace the content of the index by the decoded dump()."""
+        self.clear()
+        for key, counts in documents.items():
+            self.__insert(key, counts)
@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+"""
+append-only journal of storage changes
+"""
+
+import json
+import os
+
+
+class Journal:
+    """Write-ahead log kept next to the JSON snapshot.
+
+    Every change is appended as one JSON line, either
+    {"op": "set", "key": <key>, "value": <to_dict()>} or
+    {"op": "del", "key": <key>}, so a save costs O(changed objects)
+    instead of rewriting the whole file.
+
+    Attributes:
+        path (str): path of the log file.
+        entries (int): number of records currently in the log.
+    """
+
+    def __init__(self, path):
+        """Open the journal stored at path."""
+        self.path = path
+        self.entries = 0
+        if os.path.isfile(path):
+            self.entries = sum(1 for _ in self.replay())
+
+    def append(self, records):
+        """Append (op, key, value) records and return how many were written.
+
+        value is the to_dict() form for "set" and None for "del". The
+        records are fsync'ed before returning.
+        """
+        lines = []
+        for op, key, value in records:
+            record = {"op": op, "key": key}
+            if op == "set":
+                record["value"] = value
+            lines.append(json.dumps(record) + "\n")
+        if lines:
+            with open(self.path, 'a+b') as file:
+                if file.seek(0, os.SEEK_END):
+                    file.seek(-1, os.SEEK_END)
+                    if file.read(1) != b"\n":
+                        self.repair(file)
+                file.write("".join(lines).encode("utf-8"))
+                file.flush()
+                os.fsync(file.fileno())
+            self.entries += len(lines)
+        return len(lines)
+
+    def repair(self, file):
+        """Cut the torn last line left by a crash in the middle of an
+        append off the log opened as the binary file, so the next record
+        starts on a line of its own.
+
+        This is done by append(), which the storage calls with the files
+        locked, rather than when the log is opened, where it could cut
+        the record another process is appending.
+        """
+        records, offset = self.tail(0)
+        file.truncate(offset)
+        self.entries = len(records)
+
+    def replay(self):
+        """Yield (op, key, value) for every complete record of the log.
+
+        A torn last line, left behind by a crash in the middle of an
+        append, is ignored.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    yield record["op"], record["key"], record.get("value")
+        except FileNotFoundError:
+            return
+
+    def tail(self, offset):
+        """Return the (op, key, value) records written after the byte
+        offset, and the offset of the end of the last complete one."""
+        records = []
+        try:
+            with open(self.path, 'rb') as file:
+                file.seek(offset)
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    records.append((record["op"], record["key"],
+                                    record.get("value")))
+                    offset += len(line)
+        except FileNotFoundError:
+            return [], 0
+        return records, offset
+
+    def truncate(self):
+        """Drop every record, once they are folded into a snapshot."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.entries = 0
@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+"""
+lazy loading helpers: streaming JSON parsing and on-demand hydration
+"""
+
+import json
+import threading
+from collections.abc import MutableMapping
+
+
+def iter_items(file, chunk_size=1 << 16):
+    """Yield the (key, value) pairs of the JSON object stored in file.
+
+    The file is read chunk_size characters at a time, so only the current
+    chunk and the record being decoded are held in memory, never the
+    whole text next to the decoded data.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    expect = "{"
+
+    def fill():
+        """Drop the consumed text and read one more chunk."""
+        nonlocal buf, pos, eof
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                if expect == "{":
+                    return
+                raise ValueError("unexpected end of JSON object")
+            fill()
+            continue
+        char = buf[pos]
+        if expect in ("{", ":"):
+            if char != expect:
+                raise ValueError("expected '{}' at offset {}"
+                                 .format(expect, pos))
+            pos += 1
+            expect = "key" if expect == "{" else "value"
+        elif expect == "next":
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError("expected ',' at offset {}".format(pos))
+            pos += 1
+            expect = "key"
+        elif char == "}" and expect == "key":
+            return
+        else:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if end == len(buf) and not eof:
+                fill()
+                continue
+            pos = end
+            if expect == "key":
+                key = item
+                expect = ":"
+            else:
+                yield key, item
+                expect = "next"
+
+
+class Record:
+    """Read-only attribute view of a stored object that is not hydrated.
+
+    Attributes missing from the raw dictionary fall back to the class
+    defaults, like they do on a real instance, so indexes can read a
+    Record the same way they read a model.
+    """
+    __slots__ = ("cls", "data")
+
+    def __init__(self, cls, data):
+        """Wrap the raw to_dict() form data of an instance of cls."""
+        self.cls = cls
+        self.data = data
+
+    def __getattr__(self, name):
+        """Return the raw value of name, or the class default."""
+        try:
+            return self.data[name]
+        except KeyError:
+            return getattr(self.cls, name)
+
+
+class LazyObjects(MutableMapping):
+    """Dictionary of stored objects that hydrates them on first access.
+
+    Values are kept as the raw dictionaries read from the file until they
+    are read through [], get(), values() or items(); only then is the
+    model instance built. Membership tests and len() never hydrate.
+    """
+
+    def __init__(self, classes, data=None):
+        """Create the mapping; classes maps class names to classes."""
+        self.__classes = classes
+        self.__data = {}
+        self.__lock = threading.Lock()
+        if data:
+            self.__data.update(data)
+
+    def __getitem__(self, key):
+        """Return the object stored under key, hydrating it if needed.
+
+        Two threads reading the same key get the same instance.
+        """
+        value = self.__data[key]
+        if type(value) is dict:
+            with self.__lock:
+                value = self.__data[key]
+                if type(value) is dict:
+                    value = self.__classes[key.split(".")[0]](**value)
+                    self.__data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        """Store an object under key."""
+        self.__data[key] = value
+
+    def __delitem__(self, key):
+        """Remove the object stored under key."""
+        del self.__data[key]
+
+    def __contains__(self, key):
+        """Return True if key is stored, without hydrating it."""
+        return key in self.__data
+
+    def __iter__(self):
+        """Iterate over the keys."""
+        return iter(self.__data)
+
+    def __len__(self):
+        """Return the number of stored objects."""
+        return len(self.__data)
+
+    def pop(self, key, *default):
+        """Remove key and return its object, without hydrating it."""
+        value = self.__data.pop(key, *default)
+        return value
+
+    def set_raw(self, key, data):
+        """Store the raw to_dict() form of an object under key."""
+        self.__data[key] = data
+
+    def is_hydrated(self, key):
+        """Return True if the object under key was already built."""
+        return type(self.__data[key]) is not dict
+
+    def peek(self, key):
+        """Return the object under key, or a Record if not hydrated."""
+        value = self.__data[key]
+        if type(value) is dict:
+            return Record(self.__classes[key.split(".")[0]], value)
+        return value
+
+    def records(self):
+        """Yield (key, to_dict() form) without hydrating anything."""
+        for key, value in self.__data.items():
+            if type(value) is dict:
+                yield key, value
+            else:
+                yield key, value.to_dict()
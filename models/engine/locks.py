@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+"""
+readers-writer lock of the storage engine
+"""
+
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """Lock letting in either any number of readers or a single writer.
+
+    Both sides are reentrant: a thread may read again while it reads,
+    and the writer may write or read again while it writes. A thread that
+    reads cannot start writing, since two such threads would wait for
+    each other forever; it gets a RuntimeError instead. Waiting writers
+    go first, so a stream of readers cannot starve them.
+    """
+
+    def __init__(self):
+        """Create an unlocked lock."""
+        self.__condition = threading.Condition(threading.Lock())
+        self.__readers = 0
+        self.__writer = None
+        self.__depth = 0
+        self.__waiting = 0
+        self.__local = threading.local()
+
+    @contextmanager
+    def reading(self):
+        """Hold the lock as a reader for the duration of the block."""
+        me = threading.get_ident()
+        local = self.__local
+        depth = getattr(local, "depth", 0)
+        if depth == 0 and self.__writer != me:
+            with self.__condition:
+                while self.__writer is not None or self.__waiting:
+                    self.__condition.wait()
+                self.__readers += 1
+        local.depth = depth + 1
+        try:
+            yield
+        finally:
+            local.depth = depth
+            if depth == 0 and self.__writer != me:
+                with self.__condition:
+                    self.__readers -= 1
+                    if self.__readers == 0:
+                        self.__condition.notify_all()
+
+    @contextmanager
+    def writing(self):
+        """Hold the lock as the writer for the duration of the block."""
+        me = threading.get_ident()
+        if self.__writer != me:
+            if getattr(self.__local, "depth", 0):
+                raise RuntimeError("a reader cannot start writing")
+            with self.__condition:
+                self.__waiting += 1
+                try:
+                    while self.__writer is not None or self.__readers:
+                        self.__condition.wait()
+                finally:
+                    self.__waiting -= 1
+                self.__writer = me
+        self.__depth += 1
+        try:
+            yield
+        finally:
+            self.__depth -= 1
+            if self.__depth == 0:
+                with self.__condition:
+                    self.__writer = None
+                    self.__condition.notify_all()
@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+"""
+newline-delimited JSON import/export of to_dict() records
+"""
+
+import json
+
+REQUIRED = ("__class__", "id", "created_at", "updated_at")
+
+
+def read_objects(file, classes):
+    """Yield one model instance per line of the NDJSON file.
+
+    Each line is a to_dict() record. Blank lines are skipped; a line that
+    is not a valid record raises ValueError with its line number.
+    """
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValueError("line {}: invalid JSON".format(number))
+        if not isinstance(record, dict) or any(k not in record
+                                               for k in REQUIRED):
+            raise ValueError("line {}: not a to_dict() record".format(number))
+        cls = classes.get(record["__class__"])
+        if cls is None:
+            raise ValueError("line {}: unknown class {}".format(
+                number, record["__class__"]))
+        yield cls(**record)
+
+
+def write_records(file, records):
+    """Write every to_dict() record as one line and return the count."""
+    count = 0
+    for record in records:
+        file.write(json.dumps(record))
+        file.write("\n")
+        count += 1
+    return count
@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+"""
+filtered, sorted and paginated queries over the storage engine
+"""
+
+import heapq
+import operator
+from itertools import islice
+
+OPERATORS = {
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def sort_key(value):
+    """Return a key ordering numbers, then strings, then anything else,
+    so that attributes of mixed types can still be sorted."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value, "")
+    if isinstance(value, str):
+        return (1, 0, value)
+    return (2, 0, str(value))
+
+
+def check_value(value):
+    """Raise ValueError unless value is a string, a number, a boolean or
+    None, the values a condition can compare in every storage engine."""
+    if value is not None and not isinstance(value, (str, int, float)):
+        raise ValueError("invalid value {!r}".format(value))
+
+
+def check_count(name, value):
+    """Return value as an int, or raise ValueError naming the option
+    name unless it is a non-negative integer."""
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("invalid {} {}".format(name, value)) from None
+    if count < 0:
+        raise ValueError("invalid {} {}".format(name, value))
+    return count
+
+
+class Query:
+    """Query of the objects of one class, built by chaining calls:
+
+        storage.query(Place).where(("city_id", "=", id),
+                                   ("price_by_night", "<", 100))
+                            .order_by("price_by_night").limit(20)
+
+    Iterating the query asks the storage engine to execute it, so the
+    engine can start from an index; apply() does the rest on the
+    candidate objects, stopping as soon as the limit is reached.
+
+    Attributes:
+        storage: the storage engine the query runs on.
+        class_name (str): name of the queried class.
+        conditions (list): (attribute, operator, value) tuples, all of
+            which must hold.
+        order (tuple): (attribute, descending) or None.
+        count (int): maximum number of results, or None.
+        skip (int): number of results to skip.
+        fields (tuple): attributes to project, or None for the objects.
+    """
+
+    def __init__(self, storage, cls):
+        """Create a query of all the objects of cls."""
+        self.storage = storage
+        self.class_name = cls if isinstance(cls, str) else cls.__name__
+        self.conditions = []
+        self.order = None
+        self.count = None
+        self.skip = 0
+        self.fields = None
+
+    def where(self, *conditions):
+        """Keep the objects matching every (attribute, op, value)."""
+        for attribute, op, value in conditions:
+            if op not in OPERATORS:
+                raise ValueError("unknown operator {}".format(op))
+            check_value(value)
+            self.conditions.append((attribute, op, value))
+        return self
+
+    def order_by(self, attribute, descending=False):
+        """Sort the results by attribute."""
+        self.order = (attribute, descending)
+        return self
+
+    def limit(self, count):
+        """Return at most count results; raise ValueError unless count is
+        a non-negative integer."""
+        self.count = check_count("limit", count)
+        return self
+
+    def offset(self, skip):
+        """Skip the first skip results; raise ValueError unless skip is a
+        non-negative integer."""
+        self.skip = check_count("offset", skip)
+        return self
+
+    def select(self, *fields):
+        """Return dictionaries of these attributes instead of objects."""
+        self.fields = fields
+        return self
+
+    def __iter__(self):
+        """Iterate over the results, as computed by the storage."""
+        return iter(self.storage.execute(self))
+
+    def matches(self, obj):
+        """Return True if obj satisfies every condition."""
+        for attribute, op, value in self.conditions:
+            try:
+                if not OPERATORS[op](getattr(obj, attribute, None), value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def bounds(self, attribute):
+        """Return (low, include_low, high, include_high), the narrowest
+        range of attribute allowed by the conditions; a bound is None
+        when no condition sets it."""
+        low = high = None
+        include_low = include_high = True
+        for name, op, value in self.conditions:
+            if name != attribute or value is None:
+                continue
+            key = sort_key(value)
+            if op in ("=", "==", ">", ">="):
+                if (low is None or key > sort_key(low) or
+                        key == sort_key(low) and op == ">"):
+                    low, include_low = value, op != ">"
+            if op in ("=", "==", "<", "<="):
+                if (high is None or key < sort_key(high) or
+                        key == sort_key(high) and op == "<"):
+                    high, include_high = value, op != "<"
+        return low, include_low, high, include_high
+
+    def apply(self, candidates, filtered=False, ordered=False):
+        """Return an iterator of the results among the candidate objects.
+
+        With filtered=True the candidates already satisfy the conditions,
+        with ordered=True they already come in the order of the query.
+        Without order to apply the candidates are consumed only until
+        the limit is reached; with an order and a limit, only the best
+        offset + limit objects are kept while scanning.
+        """
+        if not filtered:
+            candidates = (obj for obj in candidates if self.matches(obj))
+        end = None if self.count is None else self.skip + self.count
+        if self.order is not None and not ordered:
+            attribute, descending = self.order
+
+            def key(obj):
+                return sort_key(getattr(obj, attribute, None))
+            if end is None:
+                candidates = sorted(candidates, key=key, reverse=descending)
+            elif descending:
+                candidates = heapq.nlargest(end, candidates, key=key)
+            else:
+                candidates = heapq.nsmallest(end, candidates, key=key)
+        results = islice(candidates, self.skip, end)
+        if self.fields is None:
+            return results
+        return ({field: getattr(obj, field, None) for field in self.fields}
+                for obj in results)
@@ -0,0 +1,248 @@
+#!/usr/bin/python3
+"""Serves the HBnB console commands over TCP or a Unix socket.
+
+Every client sends console commands, one per line, and gets back the
+output of each command in the same order, as its lines followed by a
+line holding a single dot (a line of the output starting with a dot is
+sent with one more dot, as in SMTP). A client may send many commands
+without waiting for their answers.
+
+All clients share the storage of this process. The commands that change
+objects (create, update, destroy) are queued to a single writer
+task, which runs everything queued at once in a storage batch and saves
+it with one write before answering. The other commands run right away,
+after the earlier changes of the same client. begin, commit and rollback
+are not served, nor export and import, which would let any client read
+and write files of the server.
+
+The commands run in a pool of threads, so a slow one does not hold up
+the other connections: FileStorage is switched to its thread-safe mode,
+while the commands on DBStorage, whose connection cannot be shared, run
+one at a time.
+
+Usage: ./server.py [--host HOST] [--port PORT] [--unix PATH]
+"""
+import argparse
+import asyncio
+import re
+import sys
+import threading
+from contextlib import nullcontext
+from io import StringIO
+from console import HBNBCommand
+from models import storage
+
+WRITES = {"create", "update", "destroy"}
+UNSUPPORTED = {"begin", "commit", "rollback", "export", "import"}
+
+
+def command_name(line):
+    """Return the command of a console line: the first word, or the
+    method of the <class>.<method>(...) syntax."""
+    match = re.match(r"\s*\w+\.(\w+)\(", line)
+    if match is not None:
+        return match.group(1)
+    words = line.split(None, 1)
+    return words[0] if words else ""
+
+
+def frame(output):
+    """Return output as sent to the client, dot-stuffed and terminated."""
+    lines = output.splitlines()
+    return "".join(("." + line if line.startswith(".") else line) + "\n"
+                   for line in lines) + ".\n"
+
+
+class ThreadOutput:
+    """Standard output sending what each thread prints to the buffer it
+    set, if any, else to the real output; redirect_stdout() would mix the
+    output of the commands running at the same time."""
+
+    def __init__(self, stream):
+        """Write to stream by default."""
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        """Write text to the buffer of the thread, or to the stream."""
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        """Flush the stream."""
+        self.stream.flush()
+
+
+class HBNBServer:
+    """Runs the console commands of many clients on one storage.
+
+    Attributes:
+        console (HBNBCommand): the interpreter running every command.
+        writes (asyncio.Queue): (line, future) of the changes to run.
+        lock: held while a command, or a whole batch of them, runs; a null
+            context when the storage is thread-safe.
+    """
+
+    def __init__(self):
+        """Create the server; start() opens its sockets."""
+        self.console = HBNBCommand()
+        self.writes = None
+        self.output = None
+        self.__writer = None
+        self.__servers = []
+        if hasattr(storage, "use_threads"):
+            storage.use_threads()
+            self.lock = nullcontext()
+        else:
+            self.lock = threading.RLock()
+
+    def run(self, line):
+        """Run a console line and return what it printed."""
+        output = StringIO()
+        self.output.local.buffer = output
+        try:
+            with self.lock:
+                self.console.onecmd(self.console.precmd(line))
+        except Exception as error:
+            print("** {} **".format(error))
+        finally:
+            self.output.local.buffer = None
+        return output.getvalue()
+
+    def run_group(self, lines):
+        """Run the console lines in one storage batch saved at once and
+        return what each printed; if the batch fails, it is rolled back
+        and each line gets the error. The lock is held for the whole
+        batch, so no other command runs inside it."""
+        with self.lock:
+            try:
+                storage.begin()
+                results = [self.run(line) for line in lines]
+                storage.commit()
+            except Exception as error:
+                if storage.in_batch():
+                    storage.rollback()
+                results = ["** {} **\n".format(error)] * len(lines)
+        return results
+
+    async def start(self, host="127.0.0.1", port=5000, unix=None):
+        """Start the writer task and listen on host:port, or on the Unix
+        socket unix; return the listening sockets."""
+        self.writes = asyncio.Queue()
+        if not isinstance(sys.stdout, ThreadOutput):
+            self.output = sys.stdout = ThreadOutput(sys.stdout)
+        else:
+            self.output = sys.stdout
+        self.__writer = asyncio.ensure_future(self.write_loop())
+        if unix is not None:
+            server = await asyncio.start_unix_server(self.serve, unix)
+        else:
+            server = await asyncio.start_server(self.serve, host, port)
+        self.__servers.append(server)
+        return server.sockets
+
+    async def stop(self):
+        """Stop listening, let the writer finish the queued changes and
+        save them."""
+        for server in self.__servers:
+            server.close()
+            await server.wait_closed()
+        self.__servers = []
+        if self.__writer is not None:
+            await self.writes.join()
+            self.__writer.cancel()
+            self.__writer = None
+        storage.save()
+        if sys.stdout is self.output:
+            sys.stdout = self.output.stream
+
+    async def write_loop(self):
+        """Run the queued changes, each group in one batch saved at once,
+        then answer them."""
+        while True:
+            group = [await self.writes.get()]
+            while not self.writes.empty():
+                group.append(self.writes.get_nowait())
+            results = await asyncio.get_running_loop().run_in_executor(
+                None, self.run_group, [line for line, _ in group])
+            for (_, future), result in zip(group, results):
+                if not future.cancelled():
+                    future.set_result(result)
+                self.writes.task_done()
+
+    async def serve(self, reader, writer):
+        """Answer the commands of one client, in the order they came."""
+        answers = asyncio.Queue()
+        sender = asyncio.ensure_future(self.send(answers, writer))
+        last_write = None
+        reads = []
+        try:
+            while True:
+                data = await reader.readline()
+                if not data:
+                    break
+                line = data.decode("utf-8", "replace").rstrip("\r\n")
+                name = command_name(line)
+                if name in ("quit", "EOF"):
+                    break
+                loop = asyncio.get_running_loop()
+                if name in WRITES:
+                    # the earlier reads of the client must not see it
+                    if reads:
+                        await asyncio.wait(reads)
+                        reads = []
+                    future = loop.create_future()
+                    await self.writes.put((line, future))
+                    last_write = future
+                else:
+                    if last_write is not None:
+                        await asyncio.shield(last_write)
+                    if name in UNSUPPORTED:
+                        future = loop.create_future()
+                        future.set_result("** {} is not supported by the "
+                                          "server **\n".format(name))
+                    else:
+                        future = loop.run_in_executor(None, self.run, line)
+                        reads.append(future)
+                await answers.put(future)
+        finally:
+            await answers.put(None)
+            await sender
+
+    async def send(self, answers, writer):
+        """Write the answers to the client as they are ready."""
+        try:
+            while True:
+                future = await answers.get()
+                if future is None:
+                    break
+                writer.write(frame(await future).encode("utf-8"))
+                if answers.empty():
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def main(host, port, unix):
+    """Serve until interrupted."""
+    server = HBNBServer()
+    for sock in await server.start(host, port, unix):
+        print("listening on {}".format(sock.getsockname()))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HBnB command server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--unix", help="path of a Unix socket to listen on")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
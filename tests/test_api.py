@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+"""Unittest module for the read-only HTTP API."""
+
+import unittest
+import http.client
+import json
+import os
+import threading
+import time
+from models.engine.file_storage import FileStorage
+from models import storage
+from models.city import City
+from models.place import Place
+from api import APIHandler, APIServer, ResponseCache, plural
+
+
+class TestResponseCache(unittest.TestCase):
+
+    """Test Cases for the ResponseCache class."""
+
+    def test_version(self):
+        """Tests that a body is only returned at its version."""
+        cache = ResponseCache()
+        cache.put("/a", 1, b"one")
+        self.assertEqual(cache.get("/a", 1), b"one")
+        self.assertIsNone(cache.get("/a", 2))
+        self.assertIsNone(cache.get("/b", 1))
+
+    def test_least_recently_used(self):
+        """Tests that the least recently used body is evicted."""
+        cache = ResponseCache(2)
+        cache.put("/a", 1, b"a")
+        cache.put("/b", 1, b"b")
+        cache.get("/a", 1)
+        cache.put("/c", 1, b"c")
+        self.assertIsNone(cache.get("/b", 1))
+        self.assertEqual(cache.get("/a", 1), b"a")
+        self.assertEqual(cache.get("/c", 1), b"c")
+
+    def test_plural(self):
+        """Tests the plural names of the classes."""
+        self.assertEqual(plural("City"), "cities")
+        self.assertEqual(plural("Place"), "places")
+
+
+class TestAPI(unittest.TestCase):
+
+    """Test Cases for the endpoints of the API."""
+
+    path = FileStorage._FileStorage__file_path
+
+    @classmethod
+    def setUpClass(cls):
+        """Starts the server."""
+        APIHandler.quiet = True
+        cls.server = APIServer(("127.0.0.1", 0))
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stops the server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+        storage.use_threads(False)
+        APIHandler.quiet = False
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+        self.places = [Place() for _ in range(3)]
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def get(self, path, etag=None):
+        """Return the status, the ETag and the decoded body of a GET."""
+        connection = http.client.HTTPConnection(
+            *self.server.server_address)
+        headers = {} if etag is None else {"If-None-Match": etag}
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return (response.status, response.getheader("ETag"),
+                json.loads(body) if body else None)
+
+    def test_class(self):
+        """Tests the list of the objects of a class."""
+        status, _, data = self.get("/api/v1/places")
+        self.assertEqual(status, 200)
+        self.assertEqual(data, [place.to_dict() for place in self.places])
+        status, _, data = self.get("/api/v1/Place?limit=1&offset=2")
+        self.assertEqual(data, [self.places[2].to_dict()])
+        self.assertEqual(self.get("/api/v1/Place?limit=x")[0], 400)
+        self.assertEqual(self.get("/api/v1/cities")[2], [])
+
+    def test_object(self):
+        """Tests one object and the missing ones."""
+        place = self.places[1]
+        status, _, data = self.get("/api/v1/places/" + place.id)
+        self.assertEqual((status, data), (200, place.to_dict()))
+        self.assertEqual(self.get("/api/v1/places/nope")[0], 404)
+        self.assertEqual(self.get("/api/v1/nopes")[0], 404)
+        self.assertEqual(self.get("/other")[0], 404)
+
+    def test_counts(self):
+        """Tests the number of objects of each class."""
+        City()
+        data = self.get("/api/v1/")[2]
+        self.assertEqual((data["Place"], data["City"], data["User"]),
+                         (3, 1, 0))
+
+    def test_etag(self):
+        """Tests that an unchanged class answers 304 and a changed one
+        a new body."""
+        status, etag, _ = self.get("/api/v1/places")
+        self.assertEqual(self.get("/api/v1/places", etag)[:2], (304, etag))
+        City()
+        self.assertEqual(self.get("/api/v1/places", etag)[0], 304)
+        self.places[0].name = "Loft"
+        status, new_etag, data = self.get("/api/v1/places", etag)
+        self.assertEqual(status, 200)
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(data[0]["name"], "Loft")
+
+    def test_cache(self):
+        """Tests that a response is built once per version."""
+        cache = self.server.cache
+        self.get("/api/v1/places")
+        hits = cache.hits
+        self.get("/api/v1/places")
+        self.assertEqual(cache.hits, hits + 1)
+        storage.delete(self.places[0])
+        self.assertEqual(len(self.get("/api/v1/places")[2]), 2)
+        self.assertEqual(cache.hits, hits + 1)
+
+    def test_keep_alive_latency(self):
+        """Tests that responses on a kept-alive connection do not wait
+        for delayed ACKs (Nagle's algorithm)."""
+        connection = http.client.HTTPConnection(
+            *self.server.server_address)
+        path = "/api/v1/places/" + self.places[0].id
+        start = time.perf_counter()
+        for _ in range(10):
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            self.assertEqual(response.status, 200)
+        connection.close()
+        self.assertLess(time.perf_counter() - start, 0.3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+"""Unittest module for the parsing of the console commands."""
+
+import unittest
+import os
+from io import StringIO
+from shlex import split
+from unittest.mock import patch
+from models.city import City
+from models.engine.file_storage import FileStorage
+from models import storage
+from models.place import Place
+from console import HBNBCommand, lex, parse
+
+
+class TestParse(unittest.TestCase):
+
+    """Test Cases for lex and parse."""
+
+    def test_lex_like_shlex(self):
+        """Tests that lex splits words like shlex.split."""
+        for text in ['a b  c', 'City "a b" c', "x 'y z'", 'a"b c"d',
+                     r'a\ b', r'"a\"b"', r'"a\nb"', r"'a\b'", '""',
+                     'up, "x", "y",', '\ttab\r\n']:
+            self.assertEqual(lex(text), split(text), text)
+        for text in ['"open', "it's", "a\\"]:
+            with self.assertRaises(ValueError):
+                lex(text)
+
+    def test_parse(self):
+        """Tests the arguments, dictionaries and lists."""
+        self.assertEqual(parse('City "1", "name", "Lagos"'),
+                         ["City", "1", "name", "Lagos"])
+        self.assertEqual(parse('City 1, {"a": [1]} x'),
+                         ["City", "1", '{"a": [1]}'])
+        self.assertEqual(parse("City 1 [1, 2]"), ["City", "1", "[1, 2]"])
+
+
+class TestCommands(unittest.TestCase):
+
+    """Test Cases for the dispatch of the commands."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+        self.place = Place()
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(FileStorage._FileStorage__file_path):
+            os.remove(FileStorage._FileStorage__file_path)
+
+    def run_command(self, line):
+        """Return the output of the console command line."""
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd(line)
+        return f.getvalue()
+
+    def test_update(self):
+        """Tests both syntaxes of update and the typed attributes."""
+        id = self.place.id
+        self.assertEqual(self.run_command(
+            'Place.update("{}", "max_guest", "4")'.format(id)), "")
+        self.assertEqual(self.place.max_guest, 4)
+        self.run_command('Place.update("{}", {{"name": "Loft", '
+                         '"number_rooms": 2, "tags": [1]}})'.format(id))
+        self.assertEqual((self.place.name, self.place.number_rooms,
+                          self.place.tags), ("Loft", 2, [1]))
+        self.run_command('update Place {} name "Big Loft"'.format(id))
+        self.assertEqual(self.place.name, "Big Loft")
+
+    def test_update_never_evaluates(self):
+        """Tests that a value that is not a literal is not run."""
+        id = self.place.id
+        for value in ("name", "id", "__import__('os')"):
+            self.assertEqual(
+                self.run_command("update Place {} {}".format(id, value)),
+                "** value missing **\n")
+
+    def test_create_and_dot_syntax(self):
+        """Tests create and the <class>.<method>() syntax."""
+        id = self.run_command("create Place").strip()
+        self.assertIsNotNone(storage.get(Place, id))
+        self.assertEqual(self.run_command("Place.count()"), "2\n")
+        self.assertEqual(self.run_command("create Foo"),
+                         "** class doesn't exist **\n")
+        self.assertEqual(self.run_command("Place.fly()"),
+                         "*** Unknown syntax: Place.fly()\n")
+        self.assertEqual(self.run_command('Place.destroy("{}")'.format(id)),
+                         "")
+        self.assertIsNone(storage.get(Place, id))
+
+    def test_export_unwritable_file(self):
+        """Tests that export reports a file it cannot write."""
+        self.assertEqual(self.run_command("export Place no/such/dir.ndjson"),
+                         "** file can't be written **\n")
+
+
+class TestScript(unittest.TestCase):
+
+    """Test Cases for the scripts run by run_script."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(FileStorage._FileStorage__file_path):
+            os.remove(FileStorage._FileStorage__file_path)
+
+    def run_script(self, text, save_every=0):
+        """Return the output and the result of run_script on text."""
+        with patch('sys.stdout', new=StringIO()) as f:
+            result = HBNBCommand().run_script(StringIO(text), save_every,
+                                              chunk=2)
+        return f.getvalue(), result
+
+    def test_output_and_errors(self):
+        """Tests that the commands run without prompts and that the
+        errors are counted."""
+        output, (commands, errors, _) = self.run_script(
+            "create City\n# seed\n\ncreate Foo\ncount City\n"
+            'show City "x\nquit\ncount City\n')
+        lines = output.splitlines()
+        self.assertEqual(lines[1:], ["** class doesn't exist **", "1",
+                                     "** No closing quotation **"])
+        self.assertEqual((commands, errors), (5, 2))
+
+    def test_saves_are_deferred(self):
+        """Tests that the changes are saved once at the end, or every N
+        changes."""
+        with patch.object(storage, "save") as save:
+            self.run_script("create City\n" * 5)
+        self.assertEqual(save.call_count, 1)
+        with patch.object(storage, "save") as save:
+            self.run_script("create City\n" * 5, save_every=2)
+        self.assertEqual(save.call_count, 3)
+        self.assertEqual(storage.count(City), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
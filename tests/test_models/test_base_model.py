@@ -3,8 +3,10 @@
 This is the base model unnittest
 """
 
+import sys
 import unittest
-from models.base_model import BaseModel
+from datetime import datetime
+from models.base_model import BaseModel, parse_datetime, format_datetime
 
 class TestBaseModel(unittest.TestCase):
 
@@ -68,5 +70,48 @@ class TestBaseModel(unittest.TestCase):
         self.assertEqual(model_dict["my_number"], 42)
         self.assertEqual(model_dict["__class__"], "BaseModel")
 
+    def test_datetime_codec(self):
+        # Test the timestamp codec on the formats found in file.json
+        value = datetime(2022, 1, 1, 12, 30, 15, 123456)
+        self.assertEqual(parse_datetime(value.isoformat()), value)
+        self.assertEqual(parse_datetime("2022-01-01T12:30:15.123456"), value)
+        self.assertEqual(parse_datetime("2022-01-01T12:30:15"),
+                         value.replace(microsecond=0))
+        self.assertEqual(format_datetime(value), value.isoformat())
+
+    def test_compact_representation(self):
+        # Test that compact instances behave like plain ones
+        from models.place import Place
+        plain = Place()
+        plain.name = "Loft"
+        plain.extra = [1]
+        plain.city_id = "c" * 36
+        BaseModel.use_compact()
+        try:
+            compact = Place(**plain.to_dict())
+            created = Place()
+        finally:
+            BaseModel.use_compact(False)
+        self.assertIsInstance(compact, Place)
+        self.assertEqual(str(type(compact)), "<class 'models.place.Place'>")
+        self.assertEqual(str(compact), str(plain))
+        self.assertEqual(list(compact.to_dict().items()),
+                         list(plain.to_dict().items()))
+        self.assertEqual(compact.max_guest, 0)
+        self.assertEqual(compact.__dict__, {"extra": [1]})
+        self.assertIs(compact.city_id, sys.intern("c" * 36))
+        created.user_id = "u" * 36
+        created.note = "x"
+        created.name = "Flat"
+        self.assertEqual(list(created.to_dict()),
+                         ["id", "created_at", "updated_at", "user_id",
+                          "note", "name", "__class__"])
+        del created.note
+        del created.user_id
+        self.assertEqual(list(created.to_dict()),
+                         ["id", "created_at", "updated_at", "name",
+                          "__class__"])
+        self.assertEqual(created.user_id, "")
+
 if __name__ == '__main__':
     unittest.main()
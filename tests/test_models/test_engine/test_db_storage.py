@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+"""Unittest module for the DBStorage class."""
+
+import unittest
+import io
+import os
+from models.engine.db_storage import DBStorage
+from models.city import City
+from models.place import Place
+
+
+class TestDBStorage(unittest.TestCase):
+
+    """Test Cases for the sqlite3 storage engine."""
+
+    path = "test_hbnb.db"
+
+    def setUp(self):
+        """Sets up test methods."""
+        self.storage = DBStorage(self.path)
+        self.storage.reload()
+
+    def tearDown(self):
+        """Tears down test methods."""
+        self.storage.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def place(self, **kwargs):
+        """Return a new Place added to the storage under test."""
+        place = Place(id=str(len(self.storage.all()) + 1),
+                      created_at="2022-01-01T00:00:00.000001",
+                      updated_at="2022-01-01T00:00:00.000001", **kwargs)
+        self.storage.new(place)
+        return place
+
+    def test_new_save_reload(self):
+        """Tests that saved objects are found in a new session."""
+        place = self.place(name="Loft")
+        self.storage.save()
+        self.storage.reload()
+        loaded = self.storage.get(Place, place.id)
+        self.assertIsNot(loaded, place)
+        self.assertEqual(loaded.to_dict(), place.to_dict())
+
+    def test_all_and_count(self):
+        """Tests class filtering and counts."""
+        self.place()
+        self.place()
+        city = City(id="c1", created_at="2022-01-01T00:00:00.000001",
+                    updated_at="2022-01-01T00:00:00.000001")
+        self.storage.new(city)
+        self.assertEqual(self.storage.count(), 3)
+        self.assertEqual(self.storage.count(Place), 2)
+        self.assertEqual(list(self.storage.all("City")), ["City.c1"])
+        self.assertEqual(len(self.storage.all()), 3)
+
+    def test_touch_delete_and_find(self):
+        """Tests updates, deletions and foreign key lookups."""
+        place = self.place(city_id="c1")
+        other = self.place(city_id="c2")
+        self.storage.save()
+        place.city_id = "c2"
+        self.storage.touch(place)
+        self.assertEqual(len(self.storage.find(Place, "city_id", "c2")), 2)
+        self.storage.delete(other)
+        self.storage.save()
+        self.storage.reload()
+        self.assertEqual(list(self.storage.find(Place, "city_id", "c2")),
+                         ["Place." + place.id])
+
+    def test_rollback_without_save(self):
+        """Tests that changes not saved are lost on reload."""
+        self.place()
+        self.storage.save()
+        self.place()
+        self.storage.reload()
+        self.assertEqual(self.storage.count(Place), 1)
+
+    def test_batch(self):
+        """Tests that a batch is committed or rolled back as a whole."""
+        with self.storage.batch():
+            self.place()
+            self.storage.save()
+            self.place()
+        self.storage.reload()
+        self.assertEqual(self.storage.count(Place), 2)
+        self.storage.begin()
+        self.place()
+        self.storage.save()
+        self.storage.rollback()
+        self.assertEqual(self.storage.count(Place), 2)
+
+    def test_invalid_import_in_batch(self):
+        """Tests that a failed import inside a batch writes no row and
+        keeps the changes of the batch."""
+        text = ('{"__class__": "Place", "id": "p1", '
+                '"created_at": "2022-01-01T00:00:00.000001", '
+                '"updated_at": "2022-01-01T00:00:00.000001"}\nnope\n')
+        with self.storage.batch():
+            self.place()
+            with self.assertRaises(ValueError):
+                self.storage.import_records(io.StringIO(text))
+            self.assertTrue(self.storage.in_batch())
+        self.storage.reload()
+        self.assertEqual(self.storage.count(Place), 1)
+        self.assertIsNone(self.storage.get(Place, "p1"))
+        self.storage.begin()
+        with self.assertRaises(ValueError):
+            self.storage.import_records(io.StringIO(text))
+        self.storage.rollback()
+        self.assertEqual(self.storage.count(Place), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
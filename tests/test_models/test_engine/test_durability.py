@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+"""Unittest module for the atomic writes and the background flusher."""
+
+import unittest
+import json
+import os
+import threading
+from unittest import mock
+from models.engine.durability import atomic_write, Flusher
+from models.engine.file_storage import FileStorage
+from models import storage
+from models.place import Place
+
+
+class TestAtomicWrite(unittest.TestCase):
+
+    """Test Cases for atomic_write."""
+
+    path = "test_atomic.json"
+
+    def tearDown(self):
+        """Tears down test methods."""
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def test_replace(self):
+        """Tests that the file is replaced and no temp file is left."""
+        atomic_write(self.path, "old")
+        atomic_write(self.path, "new")
+        with open(self.path) as file:
+            self.assertEqual(file.read(), "new")
+        self.assertEqual([f for f in os.listdir(".") if f.endswith(".tmp")],
+                         [])
+
+    def test_failure_keeps_old_content(self):
+        """Tests that a failed write leaves the old file intact."""
+        atomic_write(self.path, "old")
+        with mock.patch("os.replace", side_effect=OSError):
+            with self.assertRaises(OSError):
+                atomic_write(self.path, "new")
+        with open(self.path) as file:
+            self.assertEqual(file.read(), "old")
+        self.assertEqual([f for f in os.listdir(".") if f.endswith(".tmp")],
+                         [])
+
+
+class TestFlusher(unittest.TestCase):
+
+    """Test Cases for the Flusher thread."""
+
+    def test_requests_are_coalesced(self):
+        """Tests that close requests give a single flush."""
+        done = threading.Event()
+        calls = []
+
+        def flush():
+            calls.append(1)
+            done.set()
+        flusher = Flusher(flush, 0.05)
+        flusher.start()
+        for _ in range(10):
+            flusher.request()
+        self.assertTrue(done.wait(5))
+        self.assertFalse(flusher.stop())
+        self.assertEqual(len(calls), 1)
+
+    def test_stop_reports_unserved_request(self):
+        """Tests that stop tells if a request was left."""
+        flusher = Flusher(lambda: None, 60)
+        flusher.start()
+        flusher.request()
+        self.assertTrue(flusher.stop())
+
+
+class TestStorageFlusher(unittest.TestCase):
+
+    """Test Cases for FileStorage with a background flusher."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tears down test methods."""
+        storage.stop_flusher()
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(FileStorage._FileStorage__file_path):
+            os.remove(FileStorage._FileStorage__file_path)
+
+    def test_saves_are_deferred_and_flushed_on_stop(self):
+        """Tests that save returns at once and stop writes the data."""
+        storage.start_flusher(60)
+        places = [Place() for _ in range(3)]
+        for place in places:
+            place.save()
+        self.assertFalse(os.path.isfile(FileStorage._FileStorage__file_path))
+        storage.stop_flusher()
+        with open(FileStorage._FileStorage__file_path) as file:
+            self.assertEqual(len(json.load(file)), 3)
+
+    def test_background_write(self):
+        """Tests that the thread writes the file after the interval."""
+        storage.start_flusher(0.01)
+        written = threading.Event()
+        with mock.patch("models.engine.file_storage.atomic_write",
+                        side_effect=lambda *args: written.set()):
+            Place().save()
+            self.assertTrue(written.wait(5))
+
+    def test_batch_is_not_flushed(self):
+        """Tests that the thread writes nothing of an open batch, so
+        rollback drops it."""
+        storage.start_flusher(0.01)
+        kept = Place()
+        kept.save()
+        storage.begin()
+        with open(FileStorage._FileStorage__file_path) as file:
+            self.assertEqual(list(json.load(file)), ["Place." + kept.id])
+        dropped = Place()
+        dropped.save()
+        written = threading.Event()
+        with mock.patch("models.engine.file_storage.atomic_write",
+                        side_effect=lambda *args: written.set()):
+            self.assertFalse(written.wait(0.2))
+            storage.stop_flusher()
+            self.assertFalse(written.is_set())
+        storage.rollback()
+        self.assertNotIn("Place." + dropped.id, storage.all())
+        self.assertIn("Place." + kept.id, storage.all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,8 +3,18 @@
 
 import unittest
 import os
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+from models.engine.durability import atomic_write
 from models.base_model import BaseModel
 from models.engine.file_storage import FileStorage
+from models import storage
+from models.city import City
+from models.place import Place
 
 class TestFileStorage(unittest.TestCase):
 
@@ -59,5 +69,385 @@ class TestFileStorage(unittest.TestCase):
         self.assertTrue("{}.{}".format(sub_model.__class__.__name__, sub_model.id) in storage.all())
         self.assertEqual(storage.all()["{}.{}".format(sub_model.__class__.__name__, sub_model.id)], sub_model.to_dict())
 
+
+class TestFileStorageClassIndex(unittest.TestCase):
+    """Test Cases for the per-class index of FileStorage."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(FileStorage._FileStorage__file_path):
+            os.remove(FileStorage._FileStorage__file_path)
+
+    def test_all_and_count_by_class(self):
+        """Tests that class-scoped all/count only see that class."""
+        p1 = Place()
+        p2 = Place()
+        City()
+        self.assertEqual(storage.count(), 3)
+        self.assertEqual(storage.count(Place), 2)
+        self.assertEqual(storage.count("City"), 1)
+        self.assertEqual(storage.count("Review"), 0)
+        self.assertEqual(set(storage.all("Place")),
+                         {"Place." + p1.id, "Place." + p2.id})
+        self.assertIs(storage.get(Place, p1.id), p1)
+
+    def test_delete_and_reload_keep_index(self):
+        """Tests that the index follows deletions and reloads."""
+        p1 = Place()
+        p2 = Place()
+        storage.delete(p1)
+        self.assertEqual(storage.count("Place"), 1)
+        storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual(storage.count("Place"), 0)
+        storage.reload()
+        self.assertEqual(list(storage.all(Place)), ["Place." + p2.id])
+
+    def test_versions(self):
+        """Tests that the version of a class follows its changes only."""
+        place = Place()
+        versions = storage.version(), storage.version(Place)
+        City()
+        self.assertGreater(storage.version(), versions[0])
+        self.assertEqual(storage.version(Place), versions[1])
+        for change in (lambda: setattr(place, "name", "Loft"),
+                       lambda: storage.delete(place), storage.reload):
+            version = storage.version(Place)
+            change()
+            self.assertGreater(storage.version(Place), version)
+
+
+class TestFileStorageDirty(unittest.TestCase):
+    """Test Cases for the dirty tracking of FileStorage."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(FileStorage._FileStorage__file_path):
+            os.remove(FileStorage._FileStorage__file_path)
+
+    def test_assignment_marks_dirty(self):
+        """Tests that setting an attribute marks the object dirty."""
+        place = Place()
+        storage.save()
+        self.assertEqual(FileStorage._FileStorage__pending, {})
+        place.name = "Loft"
+        self.assertEqual(FileStorage._FileStorage__pending,
+                         {"Place." + place.id: place})
+
+    def test_save_serializes_dirty_only(self):
+        """Tests that clean objects are not serialized again."""
+        places = [Place() for _ in range(5)]
+        storage.save()
+        places[0].name = "Loft"
+        with mock.patch.object(Place, "to_dict",
+                               autospec=True,
+                               side_effect=Place.to_dict) as to_dict:
+            storage.save()
+        self.assertEqual(to_dict.call_count, 1)
+        with open(FileStorage._FileStorage__file_path) as file:
+            data = json.load(file)
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data["Place." + places[0].id]["name"], "Loft")
+
+    def test_deleted_objects_leave_snapshot(self):
+        """Tests that a deleted object is dropped from the file."""
+        place = Place()
+        storage.save()
+        storage.delete(place)
+        storage.save()
+        with open(FileStorage._FileStorage__file_path) as file:
+            self.assertEqual(json.load(file), {})
+
+
+class TestFileStorageBatch(unittest.TestCase):
+    """Test Cases for the batches of FileStorage."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tears down test methods."""
+        if storage.in_batch():
+            storage.rollback()
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(FileStorage._FileStorage__file_path):
+            os.remove(FileStorage._FileStorage__file_path)
+
+    def read(self):
+        """Return the content of the JSON file."""
+        with open(FileStorage._FileStorage__file_path) as file:
+            return json.load(file)
+
+    def test_commit_writes_once(self):
+        """Tests that saves inside a batch are deferred to commit."""
+        storage.begin()
+        places = [Place() for _ in range(3)]
+        for place in places:
+            place.save()
+        self.assertEqual(self.read(), {})
+        with mock.patch.object(FileStorage,
+                               "_FileStorage__write_snapshot") as write:
+            storage.commit()
+        self.assertEqual(write.call_count, 1)
+        self.assertFalse(storage.in_batch())
+
+    def test_rollback_leaves_file_untouched(self):
+        """Tests that a rolled back batch changes nothing."""
+        place = Place()
+        storage.save()
+        before = self.read()
+        with self.assertRaises(ValueError):
+            with storage.batch():
+                place.name = "Loft"
+                place.save()
+                Place()
+                raise ValueError
+        self.assertEqual(self.read(), before)
+        self.assertEqual(storage.count(Place), 1)
+        self.assertEqual(storage.get(Place, place.id).name, "")
+
+    def test_stale_instance_is_ignored(self):
+        """Tests that a change through an instance dropped by rollback
+        leaves the current object, its indexes and the file alone."""
+        place = Place()
+        place.name = "Loft"
+        storage.save()
+        storage.begin()
+        place.name = "in-batch"
+        storage.rollback()
+        current = storage.get(Place, place.id)
+        self.assertIsNot(current, place)
+        current.name = "Studio"
+        place.name = "stale"
+        place.save()
+        self.assertEqual(self.read()["Place." + place.id]["name"], "Studio")
+        self.assertEqual(list(storage.search(Place, "studio")),
+                         ["Place." + place.id])
+        self.assertEqual(storage.search(Place, "stale"), {})
+
+    def test_nested_begin(self):
+        """Tests that batches cannot be nested."""
+        storage.begin()
+        with self.assertRaises(RuntimeError):
+            storage.begin()
+        storage.rollback()
+        with self.assertRaises(RuntimeError):
+            storage.commit()
+
+
+class TestFileStorageShards(unittest.TestCase):
+    """Test Cases for the sharded layout of FileStorage."""
+
+    path = FileStorage._FileStorage__file_path
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__shard_dir = None
+        FileStorage._FileStorage__unloaded = set()
+        FileStorage._FileStorage__objects = {}
+        for path in (self.path, self.path + ".migrated"):
+            if os.path.isfile(path):
+                os.remove(path)
+        shutil.rmtree(self.path + ".d", ignore_errors=True)
+
+    def restart(self, shards):
+        """Reload the storage as a new process in the given layout."""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__unloaded = set()
+        storage.use_shards(shards)
+        storage.reload()
+
+    def test_migration_and_lazy_loading(self):
+        """Tests that the single file is split and shards read lazily."""
+        place = Place()
+        city = City()
+        storage.save()
+        FileStorage._FileStorage__objects = {}
+        storage.use_shards()
+        storage.reload()
+        self.assertFalse(os.path.isfile(self.path))
+        self.assertTrue(os.path.isfile(self.path + ".migrated"))
+        with open(os.path.join(self.path + ".d", "Place.json")) as file:
+            self.assertEqual(list(json.load(file)), ["Place." + place.id])
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(FileStorage._FileStorage__unloaded,
+                         set(storage.classes()))
+        self.assertEqual(storage.count(City), 1)
+        self.assertNotIn("Place." + place.id,
+                         FileStorage._FileStorage__objects)
+        self.assertIn("City." + city.id, FileStorage._FileStorage__objects)
+        self.assertIs(storage.get(Place, place.id),
+                      storage.all()["Place." + place.id])
+
+    def test_only_dirty_shards_are_written(self):
+        """Tests that a save writes the shards of the changed classes."""
+        storage.use_shards()
+        storage.reload()
+        Place()
+        city = City()
+        storage.save()
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        city = storage.get(City, city.id)
+        city.name = "Lagos"
+        with mock.patch("models.engine.file_storage.atomic_write") as write:
+            storage.save()
+        self.assertEqual([call[0][0] for call in write.call_args_list],
+                         [os.path.join(self.path + ".d", "City.json")])
+        self.assertNotIn("Place", FileStorage._FileStorage__by_class)
+
+    def test_switch_back_to_single_file(self):
+        """Tests that the shards are read back in the single layout."""
+        storage.use_shards()
+        storage.reload()
+        place = Place()
+        storage.save()
+        storage.use_shards(False)
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertIsNotNone(storage.get(Place, place.id))
+
+    def test_single_file_round_trip(self):
+        """Tests that the changes saved in the single-file layout are
+        migrated back to the shards."""
+        storage.use_shards()
+        storage.reload()
+        places = [Place() for _ in range(5)]
+        city = City()
+        storage.save()
+        self.restart(False)
+        storage.delete(storage.get(City, city.id))
+        added = Place()
+        storage.save()
+        self.restart(True)
+        self.assertEqual(sorted(storage.all(Place)),
+                         sorted("Place." + place.id
+                                for place in places + [added]))
+        self.assertEqual(storage.count(City), 0)
+        self.assertFalse(os.path.isfile(self.path))
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(storage.count(Place), 6)
+
+
+class TestFileStorageShared(unittest.TestCase):
+    """Test Cases for the files shared by several processes."""
+
+    path = FileStorage._FileStorage__file_path
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+        storage.use_shared()
+
+    def tearDown(self):
+        """Tears down test methods."""
+        storage.use_shared(False)
+        storage.use_journal(False)
+        FileStorage._FileStorage__objects = {}
+        for path in (self.path, self.path + ".log", self.path + ".lock"):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def write_externally(self, change):
+        """Rewrite the file as another process would, after change() was
+        applied to its decoded content."""
+        with open(self.path) as file:
+            data = json.load(file)
+        change(data)
+        atomic_write(self.path, json.dumps(data))
+
+    def test_refresh(self):
+        """Tests that refresh applies only the external changes."""
+        kept, changed, deleted = City(), City(), City()
+        other = Place()
+        other_record = other.to_dict()
+        storage.delete(other)
+        storage.save()
+
+        def change(data):
+            data["City." + changed.id]["name"] = "Lagos"
+            del data["City." + deleted.id]
+            data["Place." + other.id] = other_record
+        self.write_externally(change)
+        self.assertEqual(storage.refresh(), 3)
+        self.assertEqual(storage.refresh(), 0)
+        self.assertIs(storage.get(City, kept.id), kept)
+        self.assertEqual(storage.get(City, changed.id).name, "Lagos")
+        self.assertIsNone(storage.get(City, deleted.id))
+        self.assertEqual(storage.count(Place), 1)
+
+    def test_save_merges(self):
+        """Tests that a save keeps the objects written by another process
+        and the local version of the objects changed on both sides."""
+        city = City()
+        storage.save()
+        other = City()
+        other_record = other.to_dict()
+        storage.delete(other)
+        storage.save()
+
+        def change(data):
+            data["City." + city.id]["name"] = "Abuja"
+            data["City." + other.id] = other_record
+        self.write_externally(change)
+        city.name = "Lagos"
+        storage.save()
+        with open(self.path) as file:
+            data = json.load(file)
+        self.assertEqual(data["City." + city.id]["name"], "Lagos")
+        self.assertIn("City." + other.id, data)
+
+    def test_journal_tail(self):
+        """Tests that refresh reads the records appended to the log."""
+        storage.use_journal(compact_min=100)
+        storage.reload()
+        city = City()
+        storage.save()
+        journal = FileStorage._FileStorage__journal
+        record = dict(city.to_dict(), name="Lagos")
+        journal.append([("set", "City." + city.id, record)])
+        with mock.patch("builtins.open", wraps=open) as opened:
+            self.assertEqual(storage.refresh(), 1)
+        self.assertEqual(storage.get(City, city.id).name, "Lagos")
+        self.assertNotIn(self.path, [call[0][0]
+                                     for call in opened.call_args_list])
+
+    def test_processes(self):
+        """Tests that concurrent processes lose no write."""
+        script = ("from models.city import City\n"
+                  "from models import storage\n"
+                  "for _ in range(20):\n"
+                  "    City()\n"
+                  "    storage.save()\n")
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.abspath(__file__)))))
+        env = dict(os.environ, HBNB_FILE_SHARED="1", PYTHONPATH=root)
+        with tempfile.TemporaryDirectory() as tmp:
+            processes = [subprocess.Popen([sys.executable, "-c", script],
+                                          cwd=tmp, env=env)
+                         for _ in range(4)]
+            for process in processes:
+                self.assertEqual(process.wait(), 0)
+            with open(os.path.join(tmp, "file.json")) as file:
+                self.assertEqual(len(json.load(file)), 80)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+"""Unittest module for the serialization formats of the storage files."""
+
+import unittest
+import io
+import json
+import os
+import shutil
+from models.engine.formats import FORMATS, detect, get_format
+from models.engine.file_storage import FileStorage
+from models import storage
+from models.city import City
+from models.place import Place
+
+ITEMS = [
+    ("Place.1", {"id": "1", "name": "Loft", "max_guest": 4,
+                 "latitude": 6.5, "amenity_ids": ["a", "b"],
+                 "__class__": "Place"}),
+    ("Place.2", {"id": "2", "max_guest": 4, "__class__": "Place"}),
+    ("Place.3", {"id": "3", "max_guest": 4, "__class__": "Place"}),
+    ("City.x", {"id": "y", "name": None, "__class__": "City"}),
+]
+
+
+def content(format, items):
+    """Return the bytes of the file holding items in format."""
+    if not format.textual:
+        return format.dump(items)
+    data = format.encode(json.dumps(dict(items)))
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+class TestFormats(unittest.TestCase):
+
+    """Test Cases for the formats."""
+
+    def test_round_trip(self):
+        """Tests that every format gives back the records in order."""
+        for name, format in FORMATS.items():
+            with self.subTest(format=name):
+                data = content(format, ITEMS)
+                self.assertIs(detect(data[:8]), format)
+                items = list(format.items(io.BytesIO(data)))
+                self.assertEqual(items, ITEMS)
+                self.assertEqual([list(record) for _, record in items],
+                                 [list(record) for _, record in ITEMS])
+
+    def test_columns_are_smaller(self):
+        """Tests that repeated values and names are written once."""
+        items = [("City.{}".format(i),
+                  {"id": str(i), "state_id": "s", "__class__": "City"})
+                 for i in range(100)]
+        self.assertLess(len(content(get_format("columns"), items)),
+                        len(content(get_format("json"), items)) / 4)
+
+    def test_unknown_format(self):
+        """Tests that an unknown name raises ValueError."""
+        with self.assertRaises(ValueError):
+            get_format("xml")
+        with self.assertRaises(ValueError):
+            storage.use_format("xml")
+
+
+class TestFileStorageFormats(unittest.TestCase):
+
+    """Test Cases for the formats of the files of FileStorage."""
+
+    path = FileStorage._FileStorage__file_path
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tears down test methods."""
+        storage.use_format()
+        FileStorage._FileStorage__shard_dir = None
+        FileStorage._FileStorage__unloaded = set()
+        FileStorage._FileStorage__objects = {}
+        for path in (self.path, self.path + ".migrated"):
+            if os.path.isfile(path):
+                os.remove(path)
+        shutil.rmtree(self.path + ".d", ignore_errors=True)
+
+    def test_reload_detects_format(self):
+        """Tests that a file is read whatever the current format."""
+        place = Place()
+        place.max_guest = 3
+        for name in FORMATS:
+            with self.subTest(format=name):
+                storage.use_format(name)
+                storage.save()
+                with open(self.path, "rb") as file:
+                    self.assertIs(detect(file.read(8)), get_format(name))
+                storage.use_format()
+                FileStorage._FileStorage__objects = {}
+                storage.reload()
+                self.assertEqual(storage.get(Place, place.id).to_dict(),
+                                 place.to_dict())
+
+    def test_shards(self):
+        """Tests that the shards are written in the format."""
+        storage.use_format("columns")
+        storage.use_shards()
+        storage.reload()
+        city = City()
+        storage.save()
+        with open(os.path.join(self.path + ".d", "City.json"), "rb") as file:
+            self.assertIs(detect(file.read(8)), get_format("columns"))
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(storage.get(City, city.id).to_dict(),
+                         city.to_dict())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,604 @@
+#!/usr/bin/python3
+"""Unittest module for the secondary indexes of the storage engine."""
+
+import unittest
+import json
+import os
+from io import StringIO
+from unittest.mock import patch
+from models.engine.indexes import (AggregateIndex, AttributeIndex, GridIndex,
+                                   Index, RangeIndex, RollupIndex, TextIndex,
+                                   bounding_box, distance_km, tokenize)
+from models.engine.db_storage import DBStorage
+from models.engine.durability import atomic_write
+from models.engine.file_storage import FileStorage
+from models import storage
+from models.city import City
+from models.place import Place
+from models.review import Review
+from models.engine.lazy import Record
+from console import HBNBCommand
+
+
+class TestIndex(unittest.TestCase):
+
+    """Test Cases for the Index base class."""
+
+    def test_incomplete_subclass(self):
+        """Tests that a subclass missing an operation cannot be created."""
+        class AddOnly(Index):
+            def add(self, key, obj):
+                pass
+        with self.assertRaises(TypeError):
+            AddOnly("City")
+        with self.assertRaises(TypeError):
+            Index("City")
+
+
+class TestAttributeIndex(unittest.TestCase):
+
+    """Test Cases for the AttributeIndex class."""
+
+    def test_add_find_remove(self):
+        """Tests the basic operations of the index."""
+        index = AttributeIndex("City", "state_id")
+        c1 = City(id="1", state_id="s1")
+        c2 = City(id="2", state_id="s1")
+        index.add("City.1", c1)
+        index.add("City.2", c2)
+        self.assertEqual(index.find("s1"), ["City.1", "City.2"])
+        index.remove("City.1")
+        self.assertEqual(index.find("s1"), ["City.2"])
+        self.assertEqual(index.find("s2"), [])
+
+    def test_update_moves_object(self):
+        """Tests that update follows a changed attribute."""
+        index = AttributeIndex("City", "state_id")
+        c1 = City(id="1", state_id="s1")
+        index.add("City.1", c1)
+        c1.state_id = "s2"
+        index.update("City.1", c1)
+        self.assertEqual(index.find("s1"), [])
+        self.assertEqual(index.find("s2"), ["City.1"])
+
+    def test_unhashable_value(self):
+        """Tests that objects with unhashable values are skipped."""
+        index = AttributeIndex("Place", "amenity_ids")
+        index.add("Place.1", Place(id="1", amenity_ids=["a"]))
+        index.remove("Place.1")
+        self.assertEqual(index.find(["a"]), [])
+
+
+class TestStorageForeignKeys(unittest.TestCase):
+
+    """Test Cases for the foreign key indexes of FileStorage."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(FileStorage._FileStorage__file_path):
+            os.remove(FileStorage._FileStorage__file_path)
+
+    def test_find_by_foreign_key(self):
+        """Tests lookups of the objects pointing to an id."""
+        place = Place()
+        place.city_id = "c1"
+        storage.touch(place)
+        review = Review()
+        review.place_id = place.id
+        storage.touch(review)
+        Review()
+        self.assertEqual(storage.find(Place, "city_id", "c1"),
+                         {"Place." + place.id: place})
+        self.assertEqual(storage.find("Review", "place_id", place.id),
+                         {"Review." + review.id: review})
+        storage.delete(review)
+        self.assertEqual(storage.find("Review", "place_id", place.id), {})
+
+    def test_console_update_reindexes(self):
+        """Tests that the update command moves the object in the index."""
+        city = City()
+        HBNBCommand().onecmd('update City {} state_id "s1"'.format(city.id))
+        self.assertEqual(list(storage.find(City, "state_id", "s1")),
+                         ["City." + city.id])
+        HBNBCommand().onecmd('update City {} state_id "s2"'.format(city.id))
+        self.assertEqual(storage.find(City, "state_id", "s1"), {})
+
+    def test_unindexed_attribute(self):
+        """Tests that find falls back to a scan of the class."""
+        city = City()
+        city.name = "Lagos"
+        self.assertEqual(list(storage.find(City, "name", "Lagos")),
+                         ["City." + city.id])
+
+
+class TestRangeIndex(unittest.TestCase):
+
+    """Test Cases for the RangeIndex class."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        self.index = RangeIndex("Place", "price_by_night")
+        for i, price in enumerate([50, 10, 30, 30, "n/a", 20.5]):
+            self.index.add("Place.{}".format(i),
+                           Place(id=str(i), price_by_night=price))
+
+    def test_range(self):
+        """Tests ranges with inclusive and exclusive bounds."""
+        self.assertEqual(self.index.range(20, 30),
+                         ["Place.5", "Place.2", "Place.3"])
+        self.assertEqual(self.index.range(20, 30, include_high=False),
+                         ["Place.5"])
+        self.assertEqual(self.index.range(30, None, include_low=False),
+                         ["Place.0", "Place.4"])
+        self.assertEqual(self.index.range(None, 10), ["Place.1"])
+
+    def test_ordered(self):
+        """Tests walking the index in both orders."""
+        self.assertEqual(self.index.ordered(),
+                         ["Place.1", "Place.5", "Place.2", "Place.3",
+                          "Place.0", "Place.4"])
+        self.assertEqual(self.index.ordered(True)[:2],
+                         ["Place.4", "Place.0"])
+
+    def test_update_and_remove(self):
+        """Tests that changed and removed objects move or leave."""
+        self.index.update("Place.0", Place(id="0", price_by_night=5))
+        self.assertEqual(self.index.range(None, 10), ["Place.0", "Place.1"])
+        self.index.remove("Place.1")
+        self.index.remove("Place.1")
+        self.assertEqual(self.index.range(None, 10), ["Place.0"])
+
+
+class TestStorageRanges(unittest.TestCase):
+
+    """Test Cases for the queries served by the range indexes."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+        for i in range(20):
+            storage.new(Place(id=str(i), city_id="c{}".format(i % 2),
+                              price_by_night=(i * 37) % 100,
+                              max_guest=i % 5,
+                              created_at="2022-01-01T00:00:00.000001",
+                              updated_at="2022-01-01T00:00:00.000001"))
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(FileStorage._FileStorage__file_path):
+            os.remove(FileStorage._FileStorage__file_path)
+
+    def expected(self, query):
+        """Return the ids of the results of query, computed by a scan."""
+        return [obj.id for obj in query.apply(
+            storage.all(Place).values())]
+
+    def test_queries_match_scan(self):
+        """Tests that indexed queries give the results of a scan; without
+        order_by the results come in any order."""
+        queries = [
+            storage.query(Place).where(("price_by_night", ">", 20),
+                                       ("price_by_night", "<=", 60)),
+            storage.query(Place).where(("price_by_night", ">=", 50))
+            .order_by("price_by_night", True).limit(3),
+            storage.query(Place).order_by("price_by_night").offset(2)
+            .limit(4),
+            storage.query(Place).where(("city_id", "=", "c1"))
+            .order_by("price_by_night").limit(3),
+            storage.query(Place).where(("max_guest", "=", 2),
+                                       ("price_by_night", "<", 80)),
+        ]
+        for query in queries:
+            found = [obj.id for obj in query]
+            if query.order is None:
+                found.sort(key=int)
+            self.assertEqual(found, self.expected(query))
+
+    def test_console_update_coerces(self):
+        """Tests that updated prices are indexed as numbers."""
+        HBNBCommand().onecmd('update Place 3 price_by_night "1000"')
+        query = storage.query(Place).where(("price_by_night", ">", 500))
+        self.assertEqual([obj.id for obj in query], ["3"])
+        self.assertEqual(storage.get(Place, "3").price_by_night, 1000)
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd('update Place 3 price_by_night cheap')
+        self.assertEqual(f.getvalue(), "** price_by_night must be int **\n")
+        self.assertEqual(storage.get(Place, "3").price_by_night, 1000)
+
+
+def place(id, latitude, longitude):
+    """Return a Place at the given position."""
+    return Place(id=id, latitude=latitude, longitude=longitude,
+                 created_at="2022-01-01T00:00:00.000001",
+                 updated_at="2022-01-01T00:00:00.000001")
+
+
+class TestGridIndex(unittest.TestCase):
+
+    """Test Cases for the GridIndex class."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        self.index = GridIndex("Place")
+        self.places = {"Place.paris": place("paris", 48.8566, 2.3522),
+                       "Place.versailles": place("versailles", 48.8049,
+                                                 2.1204),
+                       "Place.london": place("london", 51.5072, -0.1276),
+                       "Place.fiji": place("fiji", -17.7134, 178.065),
+                       "Place.samoa": place("samoa", -13.759, -172.1046)}
+        for key, obj in self.places.items():
+            self.index.add(key, obj)
+
+    def test_distance(self):
+        """Tests the great-circle distance."""
+        self.assertAlmostEqual(distance_km(48.8566, 2.3522,
+                                           51.5072, -0.1276), 343.5, 0)
+        south, west, north, east = bounding_box(0, 179.9, 50)
+        self.assertGreater(west, east)
+
+    def test_near(self):
+        """Tests the radius search, nearest first."""
+        self.assertEqual([key for _, key in self.index.near(
+            48.85, 2.35, 30)], ["Place.paris", "Place.versailles"])
+        self.assertEqual(len(self.index.near(48.85, 2.35, 400)), 3)
+        self.assertEqual(self.index.near(0, 0, 100), [])
+
+    def test_within(self):
+        """Tests the bounding box search, across the 180th meridian too."""
+        self.assertEqual(sorted(self.index.within(45, -5, 55, 5)),
+                         ["Place.london", "Place.paris", "Place.versailles"])
+        self.assertEqual(sorted(self.index.within(-20, 170, -10, -170)),
+                         ["Place.fiji", "Place.samoa"])
+
+    def test_update_and_invalid_positions(self):
+        """Tests moves, removals and positions that are not numbers."""
+        paris = self.places["Place.paris"]
+        paris.latitude = 51.5
+        paris.longitude = -0.12
+        self.index.update("Place.paris", paris)
+        self.assertEqual(len(self.index.near(51.5, -0.12, 5)), 2)
+        paris.latitude = "north"
+        self.index.update("Place.paris", paris)
+        self.assertEqual(len(self.index.near(51.5, -0.12, 5)), 1)
+        self.index.remove("Place.london")
+        self.assertEqual(self.index.near(51.5, -0.12, 5), [])
+
+
+class TestStorageGeo(unittest.TestCase):
+
+    """Test Cases for the position searches of the storage engines."""
+
+    path = "test_hbnb.db"
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+        self.places = [place("paris", 48.8566, 2.3522),
+                       place("versailles", 48.8049, 2.1204),
+                       place("london", 51.5072, -0.1276)]
+        for obj in self.places:
+            storage.new(obj)
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def test_file_storage(self):
+        """Tests near and within on FileStorage."""
+        self.assertEqual(list(storage.near(Place, 48.85, 2.35, 30)),
+                         ["Place.paris", "Place.versailles"])
+        self.assertEqual(list(storage.within("Place", 51, -1, 52, 0)),
+                         ["Place.london"])
+        self.assertEqual(storage.near(City, 48.85, 2.35, 30), {})
+
+    def test_console_update_moves_place(self):
+        """Tests that the update command moves the Place in the index."""
+        HBNBCommand().onecmd('update Place london latitude 48.86')
+        HBNBCommand().onecmd('update Place london longitude 2.34')
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd('Place.near(48.85, 2.35, 3)')
+        self.assertEqual(f.getvalue(), "{}\n{}\n".format(
+            self.places[0], self.places[2]))
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd('Place.within(48, 2, 49)')
+        self.assertEqual(f.getvalue(), "** 4 coordinates needed **\n")
+
+    def test_db_storage(self):
+        """Tests near and within on DBStorage."""
+        db = DBStorage(self.path)
+        db.reload()
+        for obj in self.places:
+            db.new(obj)
+        db.save()
+        db.reload()
+        self.assertEqual(list(db.near(Place, 48.85, 2.35, 30)),
+                         ["Place.paris", "Place.versailles"])
+        self.assertEqual(list(db.within("Place", 51, -1, 52, 0)),
+                         ["Place.london"])
+        db.close()
+
+
+class TestTextIndex(unittest.TestCase):
+
+    """Test Cases for the TextIndex class."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        self.index = TextIndex("Review", ("text",))
+        texts = ["Fast WiFi, quiet street.",
+                 "wifi wifi wifi everywhere",
+                 "No wifi and a noisy street",
+                 "Lovely garden"]
+        for i, text in enumerate(texts):
+            self.index.add("Review.{}".format(i), Review(id=str(i),
+                                                         text=text))
+
+    def test_tokenize(self):
+        """Tests the words of a text."""
+        self.assertEqual(tokenize("Fast WiFi, café!"),
+                         ["fast", "wifi", "café"])
+
+    def test_search(self):
+        """Tests AND queries and the ranking."""
+        self.assertEqual([key for _, key in self.index.search("WIFI")],
+                         ["Review.1", "Review.0", "Review.2"])
+        self.assertEqual([key for _, key in self.index.search("street wifi")],
+                         ["Review.0", "Review.2"])
+        self.assertEqual(self.index.search("wifi pool"), [])
+        self.assertEqual(self.index.search("!!"), [])
+
+    def test_update_remove(self):
+        """Tests that changed and removed documents are re-indexed."""
+        self.index.update("Review.3", Review(id="3", text="garden wifi"))
+        self.index.remove("Review.1")
+        self.assertEqual(sorted(key for _, key in self.index.search("wifi")),
+                         ["Review.0", "Review.2", "Review.3"])
+        self.assertEqual(self.index.search("lovely"), [])
+
+    def test_dump_load(self):
+        """Tests that a loaded dump answers like the original index."""
+        index = TextIndex("Review", ("text",))
+        index.load(json.loads(self.index.dump()))
+        self.assertEqual(index.search("street wifi"),
+                         self.index.search("street wifi"))
+        index.add("Review.9", Record(Review, {"text": "street wifi"}))
+        self.assertEqual(len(index.search("street wifi")), 3)
+
+
+class TestStorageSearch(unittest.TestCase):
+
+    """Test Cases for the text search of the storage engines."""
+
+    path = "test_hbnb.db"
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+        self.reviews = [Review(id=str(i), text=text,
+                               created_at="2022-01-01T00:00:00.000001",
+                               updated_at="2022-01-01T00:00:00.000001")
+                        for i, text in enumerate(["great wifi",
+                                                  "slow wifi, great view",
+                                                  "great host"])]
+        for review in self.reviews:
+            storage.new(review)
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        storage.use_journal(False)
+        for path in (FileStorage._FileStorage__file_path,
+                     FileStorage._FileStorage__file_path + ".fts",
+                     FileStorage._FileStorage__file_path + ".log",
+                     self.path):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def test_file_storage(self):
+        """Tests search through the storage and the console."""
+        self.assertEqual(list(storage.search(Review, "wifi great")),
+                         ["Review.0", "Review.1"])
+        self.assertEqual(storage.search(City, "great"), {})
+        HBNBCommand().onecmd('update Review 2 text "wifi"')
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd('Review.search("WiFi")')
+        self.assertEqual(len(f.getvalue().splitlines()), 3)
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd('search Review')
+        self.assertEqual(f.getvalue(), "** search text missing **\n")
+
+    def test_persisted(self):
+        """Tests that reload reads the saved index instead of the text."""
+        storage.save()
+        FileStorage._FileStorage__objects = {}
+        with patch.object(TextIndex, "add") as add:
+            storage.reload()
+        add.assert_not_called()
+        self.assertEqual(list(storage.search(Review, "wifi")),
+                         ["Review.0", "Review.1"])
+
+    def test_unchanged_text_is_not_rewritten(self):
+        """Tests that a save changing no text only updates the signature
+        of the saved index, which reload still reads."""
+        storage.save()
+        storage.new(City())
+        with patch("models.engine.file_storage.atomic_write",
+                   wraps=atomic_write) as write:
+            storage.save()
+        self.assertEqual([call[0][0] for call in write.call_args_list],
+                         [FileStorage._FileStorage__file_path])
+        FileStorage._FileStorage__objects = {}
+        with patch.object(TextIndex, "add") as add:
+            storage.reload()
+        add.assert_not_called()
+        storage.get(Review, "2").text = "wifi"
+        storage.save()
+        FileStorage._FileStorage__objects = {}
+        with patch.object(TextIndex, "add") as add:
+            storage.reload()
+        add.assert_not_called()
+        self.assertEqual(sorted(storage.search(Review, "wifi")),
+                         ["Review.0", "Review.1", "Review.2"])
+
+    def test_stale_file_is_ignored(self):
+        """Tests that the saved index is ignored once the file changed."""
+        storage.save()
+        with open(FileStorage._FileStorage__file_path, 'w') as file:
+            file.write("{}")
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(storage.search(Review, "wifi"), {})
+
+    def test_journal_changes(self):
+        """Tests that the changes of the log are applied on the saved
+        index."""
+        storage.save()
+        storage.use_journal(compact_min=100)
+        storage.delete(self.reviews[0])
+        self.reviews[2].text = "wifi"
+        storage.save()
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(sorted(storage.search(Review, "wifi")),
+                         ["Review.1", "Review.2"])
+
+    def test_db_storage(self):
+        """Tests search through the FTS5 table of DBStorage."""
+        db = DBStorage(self.path)
+        db.reload()
+        for review in self.reviews:
+            db.new(review)
+        db.save()
+        db.reload()
+        self.assertEqual(list(db.search(Review, "wifi great")),
+                         ["Review.0", "Review.1"])
+        db.delete(db.get(Review, "0"))
+        self.assertEqual(list(db.search("Review", "wifi")), ["Review.1"])
+        db.close()
+
+
+class TestAggregates(unittest.TestCase):
+
+    """Test Cases for the AggregateIndex and RollupIndex classes."""
+
+    def test_aggregate(self):
+        """Tests counts and sums kept through updates and removals."""
+        index = AggregateIndex("Place", "city_id", "price_by_night")
+        index.add("Place.1", Place(id="1", city_id="c1", price_by_night=10))
+        index.add("Place.2", Place(id="2", city_id="c1", price_by_night=30))
+        index.add("Place.3", Place(id="3", city_id="c1",
+                                   price_by_night="n/a"))
+        self.assertEqual(index.stats("c1"), [3, 40, 2])
+        index.update("Place.1", Place(id="1", city_id="c2",
+                                      price_by_night=5))
+        index.remove("Place.3")
+        self.assertEqual(index.groups(), {"c1": [1, 30, 1], "c2": [1, 5, 1]})
+        index.add("Place.4", Place(id="4", city_id=["c1"]))
+        self.assertEqual(index.stats(["c1"]), [0, 0, 0])
+
+    def test_rollup(self):
+        """Tests that the rollup follows the children and the parents."""
+        places = AggregateIndex("Place", "city_id", "price_by_night")
+        states = RollupIndex("City", "state_id", places)
+        places.add("Place.1", Place(id="1", city_id="c1", price_by_night=10))
+        states.add("City.c1", City(id="c1", state_id="s1"))
+        states.add("City.c2", City(id="c2", state_id="s1"))
+        places.add("Place.2", Place(id="2", city_id="c2", price_by_night=30))
+        self.assertEqual(states.stats("s1"), [2, 40, 2])
+        states.update("City.c2", City(id="c2", state_id="s2"))
+        self.assertEqual(states.groups(), {"s1": [1, 10, 1],
+                                           "s2": [1, 30, 1]})
+        places.remove("Place.1")
+        states.remove("City.c2")
+        self.assertEqual(states.groups(), {})
+
+
+class TestStorageStats(unittest.TestCase):
+
+    """Test Cases for the statistics of the storage engines."""
+
+    path = "test_hbnb.db"
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+        stamps = {"created_at": "2022-01-01T00:00:00.000001",
+                  "updated_at": "2022-01-01T00:00:00.000001"}
+        self.objects = [
+            City(id="c1", state_id="s1", **stamps),
+            City(id="c2", state_id="s1", **stamps),
+            City(id="c3", state_id="s2", **stamps),
+            Place(id="p1", city_id="c1", price_by_night=100, **stamps),
+            Place(id="p2", city_id="c2", price_by_night=50, **stamps),
+            Place(id="p3", city_id="c3", **stamps),
+            Place(id="p4", price_by_night=10, **stamps),
+            Review(id="r1", place_id="p1", **stamps),
+            Review(id="r2", place_id="p1", **stamps),
+        ]
+        for obj in self.objects:
+            storage.new(obj)
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        for path in (FileStorage._FileStorage__file_path, self.path):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def check(self, engine):
+        """Tests the statistics computed by engine."""
+        self.assertEqual(engine.stats(Review, "place_id", "p1"),
+                         {"count": 2})
+        self.assertEqual(engine.stats("Place", "city_id", "c1"),
+                         {"count": 1, "average_price_by_night": 100})
+        self.assertEqual(engine.stats(Place, "state_id"),
+                         {"s1": {"count": 2, "average_price_by_night": 75},
+                          "s2": {"count": 1, "average_price_by_night": 0}})
+        self.assertEqual(engine.stats(Place, "city_id", "c9"),
+                         {"count": 0, "average_price_by_night": None})
+        self.assertEqual(engine.stats(Place, "city_id", ""),
+                         {"count": 1, "average_price_by_night": 10})
+        self.assertEqual(engine.stats(Place, "city_id")[""],
+                         {"count": 1, "average_price_by_night": 10})
+        self.assertIsNone(engine.stats(Place, "name"))
+
+    def test_file_storage(self):
+        """Tests the aggregates maintained by FileStorage."""
+        self.check(storage)
+        HBNBCommand().onecmd('update City c2 state_id "s2"')
+        HBNBCommand().onecmd('update Place p3 price_by_night 20')
+        HBNBCommand().onecmd('destroy Review r1')
+        self.assertEqual(storage.stats(Place, "state_id", "s2"),
+                         {"count": 2, "average_price_by_night": 35})
+        self.assertEqual(storage.stats(Review, "place_id", "p1"),
+                         {"count": 1})
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd('Place.stats(state_id, s1)')
+        self.assertEqual(f.getvalue(), "{'state_id': 's1', 'count': 1, "
+                                       "'average_price_by_night': 100.0}\n")
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd('stats Place name')
+        self.assertEqual(f.getvalue(),
+                         "** no statistics of Place by name **\n")
+
+    def test_db_storage(self):
+        """Tests the statistics computed in SQL by DBStorage."""
+        db = DBStorage(self.path)
+        db.reload()
+        for obj in self.objects:
+            db.new(obj)
+        db.save()
+        self.check(db)
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+"""Unittest module for the Journal class and FileStorage journal mode."""
+
+import unittest
+import os
+import shutil
+from models.engine.journal import Journal
+from models.engine.file_storage import FileStorage
+from models import storage
+from models.place import Place
+
+
+class TestJournal(unittest.TestCase):
+
+    """Test Cases for the append-only journal."""
+
+    path = "test_journal.log"
+
+    def tearDown(self):
+        """Tears down test methods."""
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def test_append_and_replay(self):
+        """Tests that records come back in the order they were written."""
+        journal = Journal(self.path)
+        journal.append([("set", "Place.1", {"id": "1"}),
+                        ("del", "Place.1", None)])
+        self.assertEqual(journal.entries, 2)
+        self.assertEqual(list(journal.replay()),
+                         [("set", "Place.1", {"id": "1"}),
+                          ("del", "Place.1", None)])
+        self.assertEqual(Journal(self.path).entries, 2)
+
+    def test_torn_line_is_ignored(self):
+        """Tests that a partially written last record is skipped."""
+        journal = Journal(self.path)
+        journal.append([("set", "Place.1", {"id": "1"})])
+        with open(self.path, "a") as file:
+            file.write('{"op": "set", "key": "Pla')
+        self.assertEqual(len(list(journal.replay())), 1)
+
+    def test_append_after_torn_line(self):
+        """Tests that the torn line is cut before the next append."""
+        journal = Journal(self.path)
+        journal.append([("set", "Place.1", {"id": "1"})])
+        with open(self.path, "a") as file:
+            file.write('{"op": "set", "key": "Pla')
+        journal = Journal(self.path)
+        journal.append([("del", "Place.1", None)])
+        self.assertEqual(journal.entries, 2)
+        self.assertEqual(list(journal.replay()),
+                         [("set", "Place.1", {"id": "1"}),
+                          ("del", "Place.1", None)])
+
+    def test_truncate(self):
+        """Tests that truncate empties the log."""
+        journal = Journal(self.path)
+        journal.append([("del", "Place.1", None)])
+        journal.truncate()
+        self.assertEqual(journal.entries, 0)
+        self.assertEqual(list(journal.replay()), [])
+
+
+class TestFileStorageJournal(unittest.TestCase):
+
+    """Test Cases for FileStorage in journal mode."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        self.resetStorage()
+        storage.use_journal(compact_min=1000)
+
+    def tearDown(self):
+        """Tears down test methods."""
+        storage.use_journal(False)
+        self.resetStorage()
+
+    def resetStorage(self):
+        """Resets FileStorage data."""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__pending.clear()
+        for path in (FileStorage._FileStorage__file_path,
+                     FileStorage._FileStorage__file_path + ".log"):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def test_save_appends_only_changes(self):
+        """Tests that a save writes one record per changed object."""
+        p1 = Place()
+        Place()
+        storage.save()
+        p1.name = "Loft"
+        p1.save()
+        journal = FileStorage._FileStorage__journal
+        self.assertEqual(journal.entries, 3)
+        self.assertFalse(os.path.isfile(FileStorage._FileStorage__file_path))
+
+    def test_reload_replays_log(self):
+        """Tests that reload rebuilds objects from snapshot plus log."""
+        p1 = Place()
+        p2 = Place()
+        storage.save()
+        storage.compact()
+        p1.name = "Loft"
+        p1.save()
+        storage.delete(p2)
+        storage.save()
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        objects = storage.all()
+        self.assertEqual(objects["Place." + p1.id].name, "Loft")
+        self.assertNotIn("Place." + p2.id, objects)
+
+    def test_saves_after_crash(self):
+        """Tests that the saves made after a torn append are reloaded."""
+        p1 = Place()
+        storage.save()
+        with open(FileStorage._FileStorage__journal.path, "a") as file:
+            file.write('{"op": "set", "key": "Pla')
+        storage.use_journal(compact_min=1000)
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        p2 = Place()
+        storage.save()
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertIn("Place." + p1.id, storage.all())
+        self.assertIn("Place." + p2.id, storage.all())
+
+    def test_compaction_threshold(self):
+        """Tests that the log is folded once it outgrows the objects."""
+        storage.use_journal(compact_min=2)
+        Place()
+        Place()
+        storage.save()
+        self.assertEqual(FileStorage._FileStorage__journal.entries, 0)
+        self.assertTrue(os.path.isfile(FileStorage._FileStorage__file_path))
+
+    def leave_log(self):
+        """Save changes to the log and leave journal mode without folding
+        them, as a run in journal mode that exited would; return the
+        changed and the deleted Place."""
+        p1 = Place()
+        p2 = Place()
+        storage.save()
+        storage.compact()
+        p1.name = "Loft"
+        storage.delete(p2)
+        storage.save()
+        FileStorage._FileStorage__journal = None
+        FileStorage._FileStorage__objects = {}
+        return p1, p2
+
+    def test_reload_folds_log(self):
+        """Tests that a log is folded into the snapshot out of journal
+        mode, and not replayed again once journal mode is back."""
+        p1, p2 = self.leave_log()
+        log = FileStorage._FileStorage__file_path + ".log"
+        storage.reload()
+        self.assertFalse(os.path.isfile(log))
+        self.assertEqual(storage.get(Place, p1.id).name, "Loft")
+        self.assertIsNone(storage.get(Place, p2.id))
+        storage.get(Place, p1.id).name = "Flat"
+        storage.save()
+        storage.use_journal(compact_min=1000)
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(storage.get(Place, p1.id).name, "Flat")
+        self.assertIsNone(storage.get(Place, p2.id))
+
+    def test_migration_folds_log(self):
+        """Tests that a log is folded into the shards by the migration."""
+        path = FileStorage._FileStorage__file_path
+
+        def cleanup():
+            FileStorage._FileStorage__shard_dir = None
+            FileStorage._FileStorage__unloaded = set()
+            shutil.rmtree(path + ".d", ignore_errors=True)
+            if os.path.isfile(path + ".migrated"):
+                os.remove(path + ".migrated")
+        self.addCleanup(cleanup)
+        p1, p2 = self.leave_log()
+        storage.use_shards()
+        storage.reload()
+        self.assertFalse(os.path.isfile(path + ".log"))
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(storage.get(Place, p1.id).name, "Loft")
+        self.assertIsNone(storage.get(Place, p2.id))
+
+
+if __name__ == "__main__":
+    unittest.main()
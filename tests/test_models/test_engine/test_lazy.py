@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+"""Unittest module for the lazy loading helpers of the storage engine."""
+
+import unittest
+import io
+import json
+import os
+from models.engine.lazy import iter_items, LazyObjects, Record
+from models.engine.file_storage import FileStorage
+from models import storage
+from models.place import Place
+from models.city import City
+
+
+class TestIterItems(unittest.TestCase):
+
+    """Test Cases for the streaming JSON parser."""
+
+    def test_matches_json_load(self):
+        """Tests that every chunk size gives the json.load result."""
+        data = {"Place.{}".format(i): {"id": str(i),
+                                       "name": 'n"}, {' + str(i),
+                                       "price": i, "tags": ["a", {"b": 1}]}
+                for i in range(20)}
+        text = json.dumps(data)
+        for chunk_size in (1, 2, 7, 64, 1 << 16):
+            items = dict(iter_items(io.StringIO(text), chunk_size))
+            self.assertEqual(items, data)
+
+    def test_empty(self):
+        """Tests empty files and empty objects."""
+        self.assertEqual(list(iter_items(io.StringIO(""))), [])
+        self.assertEqual(list(iter_items(io.StringIO(" {} "))), [])
+
+    def test_truncated(self):
+        """Tests that a truncated file raises ValueError."""
+        with self.assertRaises(ValueError):
+            list(iter_items(io.StringIO('{"a": {"id": 1}, "b": {'), 4))
+
+
+class TestLazyObjects(unittest.TestCase):
+
+    """Test Cases for the LazyObjects mapping."""
+
+    def test_hydrate_on_access(self):
+        """Tests that objects are built only when read."""
+        objects = LazyObjects({"Place": Place})
+        objects.set_raw("Place.1", {"id": "1", "name": "Loft",
+                                    "created_at": "2022-01-01T00:00:00.000001",
+                                    "updated_at": "2022-01-01T00:00:00.000001",
+                                    "__class__": "Place"})
+        self.assertIn("Place.1", objects)
+        self.assertFalse(objects.is_hydrated("Place.1"))
+        peek = objects.peek("Place.1")
+        self.assertIsInstance(peek, Record)
+        self.assertEqual(peek.name, "Loft")
+        self.assertEqual(peek.city_id, "")
+        self.assertIsInstance(objects["Place.1"], Place)
+        self.assertTrue(objects.is_hydrated("Place.1"))
+        self.assertEqual(dict(objects.records())["Place.1"]["name"], "Loft")
+
+
+class TestStorageLazyReload(unittest.TestCase):
+
+    """Test Cases for FileStorage in lazy mode."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tears down test methods."""
+        storage.use_lazy(False)
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(FileStorage._FileStorage__file_path):
+            os.remove(FileStorage._FileStorage__file_path)
+
+    def test_lazy_reload(self):
+        """Tests that reload defers hydration until access."""
+        place = Place()
+        place.city_id = "c1"
+        city = City()
+        storage.save()
+        storage.use_lazy()
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        objects = storage.all()
+        self.assertIsInstance(objects, LazyObjects)
+        self.assertFalse(objects.is_hydrated("Place." + place.id))
+        self.assertEqual(storage.count(Place), 1)
+        self.assertEqual(storage.get(City, city.id).id, city.id)
+        self.assertTrue(objects.is_hydrated("City." + city.id))
+        self.assertFalse(objects.is_hydrated("Place." + place.id))
+        self.assertEqual(list(storage.find(Place, "city_id", "c1")),
+                         ["Place." + place.id])
+        self.assertTrue(objects.is_hydrated("Place." + place.id))
+        storage.save()
+        FileStorage._FileStorage__objects = {}
+        storage.use_lazy(False)
+        storage.reload()
+        self.assertEqual(storage.get(Place, place.id).city_id, "c1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+"""Unittest module for the readers-writer lock and the thread-safe mode."""
+
+import unittest
+import os
+import threading
+import time
+from models.engine.locks import ReadWriteLock
+from models.engine.file_storage import FileStorage
+from models import storage
+from models.city import City
+from models.place import Place
+
+
+class TestReadWriteLock(unittest.TestCase):
+
+    """Test Cases for the ReadWriteLock class."""
+
+    def test_readers_share(self):
+        """Tests that two threads read at the same time."""
+        lock = ReadWriteLock()
+        inside = threading.Barrier(2, timeout=5)
+
+        def read():
+            with lock.reading():
+                inside.wait()
+        thread = threading.Thread(target=read)
+        thread.start()
+        read()
+        thread.join()
+
+    def test_writer_excludes_readers(self):
+        """Tests that a reader waits for the writer."""
+        lock = ReadWriteLock()
+        events = []
+
+        def read():
+            with lock.reading():
+                events.append("read")
+        with lock.writing():
+            thread = threading.Thread(target=read)
+            thread.start()
+            time.sleep(0.05)
+            events.append("written")
+        thread.join()
+        self.assertEqual(events, ["written", "read"])
+
+    def test_reentrant(self):
+        """Tests that both sides may be taken again by their holder."""
+        lock = ReadWriteLock()
+        with lock.reading():
+            with lock.reading():
+                pass
+        with lock.writing():
+            with lock.writing():
+                with lock.reading():
+                    pass
+        with lock.writing():
+            pass
+
+    def test_no_upgrade(self):
+        """Tests that a reader cannot start writing."""
+        lock = ReadWriteLock()
+        with lock.reading():
+            with self.assertRaises(RuntimeError):
+                with lock.writing():
+                    pass
+        with lock.writing():
+            pass
+
+
+class TestThreadSafeStorage(unittest.TestCase):
+
+    """Test Cases for FileStorage used by several threads at once."""
+
+    path = FileStorage._FileStorage__file_path
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+        storage.use_threads()
+
+    def tearDown(self):
+        """Tears down test methods."""
+        storage.use_threads(False)
+        FileStorage._FileStorage__objects = {}
+        for path in (self.path, self.path + ".fts"):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def test_all_is_a_copy(self):
+        """Tests that all() does not return the stored dictionary."""
+        city = City()
+        objects = storage.all()
+        City()
+        self.assertEqual(list(objects), ["City." + city.id])
+
+    def keep(self):
+        """Store the 50 Places the readers check."""
+        for i in range(50):
+            storage.new(Place(id="kept{}".format(i), city_id="c",
+                              price_by_night=i + 1,
+                              created_at="2022-01-01T00:00:00",
+                              updated_at="2022-01-01T00:00:00"))
+
+    def read(self):
+        """Read the kept Places in every way."""
+        objects = storage.all()
+        self.assertGreaterEqual(len(objects), 50)
+        for obj in objects.values():
+            obj.to_dict()
+        self.assertEqual(len(storage.find(Place, "city_id", "c")), 50)
+        self.assertEqual(storage.get(Place, "kept7").price_by_night, 8)
+        query = storage.query(Place).where(("price_by_night", ">", 0),
+                                           ("price_by_night", "<=", 10))
+        self.assertEqual(len(list(query)), 10)
+        self.assertGreaterEqual(storage.count(Place), 50)
+
+    def race(self, writers):
+        """Run the writers and 5 readers for a second; return the errors
+        they raised."""
+        errors = []
+        done = threading.Event()
+
+        def run(work):
+            try:
+                while not done.is_set():
+                    work()
+            except Exception as error:
+                errors.append(error)
+        threads = [threading.Thread(target=run, args=(work,))
+                   for work in writers + [self.read] * 5]
+        for thread in threads:
+            thread.start()
+        time.sleep(1)
+        done.set()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_stress(self):
+        """Tests readers racing writers that create, change, delete and
+        save objects."""
+        self.keep()
+
+        def write():
+            places = [Place() for _ in range(20)]
+            for place in places:
+                place.price_by_night = 1000
+            storage.save()
+            for place in places:
+                storage.delete(place)
+        self.assertEqual(self.race([write] * 3), [])
+        storage.save()
+        self.assertEqual(storage.count(Place), 50)
+
+    def test_stress_reload(self):
+        """Tests readers racing writers that reload the objects and roll
+        batches back."""
+        self.keep()
+        storage.save()
+
+        def roll_back():
+            storage.begin()
+            Place()
+            storage.rollback()
+        self.assertEqual(self.race([roll_back, storage.reload]), [])
+        self.assertEqual(storage.count(Place), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
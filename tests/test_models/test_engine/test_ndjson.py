@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+"""Unittest module for the NDJSON import/export of the storage engine."""
+
+import unittest
+import io
+import json
+import os
+from models.engine.ndjson import read_objects, write_records
+from models.engine.file_storage import FileStorage
+from models import storage
+from models.city import City
+from models.place import Place
+
+
+def record(cls, id, **kwargs):
+    """Return a to_dict() record of class cls."""
+    data = {"__class__": cls, "id": id,
+            "created_at": "2022-01-01T00:00:00.000001",
+            "updated_at": "2022-01-01T00:00:00.000001"}
+    data.update(kwargs)
+    return json.dumps(data) + "\n"
+
+
+class TestNDJSON(unittest.TestCase):
+
+    """Test Cases for the NDJSON helpers."""
+
+    def test_read_objects(self):
+        """Tests that records become model instances."""
+        text = record("Place", "p1", name="Loft") + "\n" + record("City", "c1")
+        objects = list(read_objects(io.StringIO(text), storage.classes()))
+        self.assertIsInstance(objects[0], Place)
+        self.assertEqual(objects[0].name, "Loft")
+        self.assertIsInstance(objects[1], City)
+
+    def test_invalid_lines(self):
+        """Tests that invalid lines raise ValueError."""
+        for text in ("nope\n", '{"id": "1"}\n', record("Nope", "1")):
+            with self.assertRaises(ValueError):
+                list(read_objects(io.StringIO(text), storage.classes()))
+
+    def test_write_records(self):
+        """Tests that records are written one per line."""
+        file = io.StringIO()
+        self.assertEqual(write_records(file, [{"a": 1}, {"b": 2}]), 2)
+        self.assertEqual(file.getvalue(), '{"a": 1}\n{"b": 2}\n')
+
+
+class TestStorageImportExport(unittest.TestCase):
+
+    """Test Cases for FileStorage.import_records/export_records."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(FileStorage._FileStorage__file_path):
+            os.remove(FileStorage._FileStorage__file_path)
+
+    def test_round_trip(self):
+        """Tests that exported records import back to equal objects."""
+        text = "".join(record("Place", str(i), name=str(i))
+                       for i in range(10))
+        self.assertEqual(storage.import_records(io.StringIO(text)), 10)
+        self.assertEqual(storage.count(Place), 10)
+        with open(FileStorage._FileStorage__file_path) as file:
+            self.assertEqual(len(json.load(file)), 10)
+        out = io.StringIO()
+        self.assertEqual(storage.export_records(Place, out), 10)
+        self.assertEqual([json.loads(line) for line in text.splitlines()],
+                         [json.loads(line)
+                          for line in out.getvalue().splitlines()])
+
+    def test_invalid_import_is_rolled_back(self):
+        """Tests that a failed import stores nothing."""
+        text = record("Place", "1") + "nope\n"
+        with self.assertRaises(ValueError):
+            storage.import_records(io.StringIO(text))
+        self.assertEqual(storage.count(Place), 0)
+        self.assertFalse(storage.in_batch())
+
+    def test_invalid_import_in_batch(self):
+        """Tests that a failed import inside a batch stores nothing and
+        leaves the batch open."""
+        text = record("Place", "1") + "nope\n"
+        with storage.batch():
+            City()
+            with self.assertRaises(ValueError):
+                storage.import_records(io.StringIO(text))
+            self.assertEqual(storage.count(Place), 0)
+            self.assertTrue(storage.in_batch())
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(storage.count(Place), 0)
+        self.assertEqual(storage.count(City), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,289 @@
+#!/usr/bin/python3
+"""Unittest module for the queries of the storage engines."""
+
+import unittest
+import json
+import os
+from io import StringIO
+from unittest.mock import patch
+from models.engine.file_storage import FileStorage
+from models.engine.db_storage import DBStorage
+from models.engine.query import Query
+from models import storage
+from models.place import Place
+from console import HBNBCommand
+
+
+def places():
+    """Return ten Places spread over two cities."""
+    return [Place(id="p{}".format(i), city_id="c{}".format(i % 2),
+                  price_by_night=i * 20, name="n{}".format(i),
+                  created_at="2022-01-01T00:00:00.000001",
+                  updated_at="2022-01-01T00:00:00.000001")
+            for i in range(10)]
+
+
+class TestQuery(unittest.TestCase):
+
+    """Test Cases for the Query class on its own."""
+
+    def test_apply(self):
+        """Tests filtering, sorting, pagination and projection."""
+        query = Query(None, Place).where(("city_id", "=", "c1"),
+                                         ("price_by_night", "<", 150))
+        query.order_by("price_by_night", True).offset(1).limit(2)
+        query.select("id")
+        self.assertEqual(list(query.apply(places())),
+                         [{"id": "p5"}, {"id": "p3"}])
+
+    def test_limit_stops_early(self):
+        """Tests that an unordered query stops at the limit."""
+        seen = []
+
+        def candidates():
+            for place in places():
+                seen.append(place)
+                yield place
+        query = Query(None, Place).limit(2)
+        self.assertEqual(len(list(query.apply(candidates()))), 2)
+        self.assertEqual(len(seen), 2)
+
+    def test_mixed_types(self):
+        """Tests that comparisons of different types do not raise."""
+        objects = places()
+        objects[0].price_by_night = "free"
+        query = Query(None, Place).where(("price_by_night", "<", 30))
+        self.assertEqual([p.id for p in query.apply(objects)], ["p1"])
+        query = Query(None, Place).order_by("price_by_night")
+        self.assertEqual(list(query.apply(objects))[-1].id, "p0")
+
+    def test_bounds(self):
+        """Tests the narrowest range allowed by the conditions."""
+        query = Query(None, Place).where(("price_by_night", ">", 20),
+                                         ("price_by_night", ">=", 20),
+                                         ("price_by_night", "<=", 90),
+                                         ("price_by_night", "<", 80),
+                                         ("name", "<", "a"))
+        self.assertEqual(query.bounds("price_by_night"),
+                         (20, False, 80, False))
+        self.assertEqual(query.bounds("max_guest"), (None, True, None, True))
+
+    def test_unknown_operator(self):
+        """Tests that an unknown operator is rejected."""
+        with self.assertRaises(ValueError):
+            Query(None, Place).where(("name", "~", "a"))
+        with self.assertRaises(ValueError):
+            Query(None, Place).where(("name", "=", ["a"]))
+
+    def test_invalid_pagination(self):
+        """Tests that a negative or non-integer limit or offset is
+        rejected."""
+        for count in (-1, "-1", "x", None):
+            with self.assertRaises(ValueError):
+                Query(None, Place).limit(count)
+            with self.assertRaises(ValueError):
+                Query(None, Place).offset(count)
+        self.assertEqual(Query(None, Place).limit("0").offset(2).count, 0)
+
+
+class TestStorageQuery(unittest.TestCase):
+
+    """Test Cases for the queries executed by FileStorage."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+        for place in places():
+            storage.new(place)
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+        if os.path.isfile(FileStorage._FileStorage__file_path):
+            os.remove(FileStorage._FileStorage__file_path)
+
+    def test_execute(self):
+        """Tests a query starting from the city_id index."""
+        query = storage.query(Place).where(("city_id", "=", "c0"),
+                                           ("price_by_night", ">=", 40))
+        query.order_by("price_by_night").limit(2)
+        self.assertEqual([p.id for p in query], ["p2", "p4"])
+
+    def test_index_follows_updates(self):
+        """Tests that a query sees a changed foreign key."""
+        storage.get(Place, "p1").city_id = "c0"
+        query = storage.query(Place).where(("city_id", "=", "c0"))
+        self.assertIn("p1", [p.id for p in query])
+
+    def test_console(self):
+        """Tests the query syntax of the console."""
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd('Place.where(city_id="c1", '
+                                 'price_by_night<100)'
+                                 '.order_by(-price_by_night).limit(2)'
+                                 '.select(id, price_by_night)')
+        self.assertEqual(f.getvalue(),
+                         "{'id': 'p3', 'price_by_night': 60}\n"
+                         "{'id': 'p1', 'price_by_night': 20}\n")
+
+    def test_console_quoted_arguments(self):
+        """Tests that commas and parentheses may be quoted."""
+        storage.get(Place, "p2").name = "a, (b)"
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd('Place.where(name="a, (b)").select(id)')
+        self.assertEqual(f.getvalue(), "{'id': 'p2'}\n")
+
+    def test_console_errors(self):
+        """Tests the messages of invalid queries."""
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd('MyModel.where(a=1)')
+        self.assertEqual(f.getvalue(), "** class doesn't exist **\n")
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd('Place.where(name~1)')
+        self.assertEqual(f.getvalue(), "** invalid condition name~1 **\n")
+        for condition in ("price_by_night<", "price_by_night<=",
+                          "name="):
+            with patch('sys.stdout', new=StringIO()) as f:
+                HBNBCommand().onecmd(
+                    'Place.where({})'.format(condition))
+            self.assertEqual(f.getvalue(), "** invalid condition {} **\n"
+                             .format(condition))
+        for call, message in (("limit(-1)", "invalid limit -1"),
+                              ("offset(x)", "invalid offset x")):
+            with patch('sys.stdout', new=StringIO()) as f:
+                HBNBCommand().onecmd('Place.where(name="n1").' + call)
+            self.assertEqual(f.getvalue(), "** {} **\n".format(message))
+
+
+class TestConsoleAll(unittest.TestCase):
+
+    """Test Cases for the streaming and paginated all command."""
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+        self.places = places()
+        for place in self.places:
+            storage.new(place)
+
+    def tearDown(self):
+        """Tears down test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def run_command(self, line):
+        """Return the output of the console command line."""
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd(line)
+        return f.getvalue()
+
+    def test_list_output(self):
+        """Tests that all without options still prints one list."""
+        self.assertEqual(self.run_command("all Place"),
+                         str([str(p) for p in self.places]) + "\n")
+        self.assertEqual(self.run_command("all City"), "[]\n")
+
+    def test_pages(self):
+        """Tests --limit, --offset and --page."""
+        self.assertEqual(self.run_command("all Place --limit 2 --offset 3"),
+                         "{}\n{}\n".format(self.places[3], self.places[4]))
+        self.assertEqual(self.run_command("Place.all(--page 3 --limit=4)"),
+                         "{}\n{}\n".format(self.places[8], self.places[9]))
+
+    def test_ndjson(self):
+        """Tests the NDJSON output."""
+        lines = self.run_command("all --ndjson --limit 1").splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [self.places[0].to_dict()])
+
+    def test_invalid_options(self):
+        """Tests the messages of invalid options."""
+        self.assertEqual(self.run_command("all --limit x"),
+                         "** --limit needs a number **\n")
+        self.assertEqual(self.run_command("all --json"),
+                         "** unknown option --json **\n")
+
+    def test_count(self):
+        """Tests count with and without a class."""
+        self.assertEqual(self.run_command("count Place"), "10\n")
+        self.assertEqual(self.run_command("count"), "10\n")
+        self.assertEqual(self.run_command("count Foo"),
+                         "** class doesn't exist **\n")
+
+
+class TestDBStorageQuery(unittest.TestCase):
+
+    """Test Cases for the queries executed by DBStorage."""
+
+    path = "test_hbnb.db"
+
+    def setUp(self):
+        """Sets up test methods."""
+        self.storage = DBStorage(self.path)
+        self.storage.reload()
+        for place in places():
+            self.storage.new(place)
+        self.storage.save()
+
+    def tearDown(self):
+        """Tears down test methods."""
+        self.storage.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def test_execute(self):
+        """Tests that the query runs in SQL with the same results."""
+        query = self.storage.query(Place).where(("city_id", "=", "c1"),
+                                                ("price_by_night", "<", 150))
+        query.order_by("price_by_night", True).offset(1).limit(2)
+        query.select("id")
+        self.assertEqual(list(query), [{"id": "p5"}, {"id": "p3"}])
+
+    def test_class_defaults(self):
+        """Tests that attributes left at their class default match as
+        they do in FileStorage."""
+        for id in ("d1", "d2"):
+            self.storage.new(Place(id=id,
+                                   created_at="2022-01-01T00:00:00.000001",
+                                   updated_at="2022-01-01T00:00:00.000001"))
+        self.storage.save()
+        query = self.storage.query(Place).where(("price_by_night", "<", 20))
+        query.order_by("price_by_night").select("id")
+        self.assertEqual(sorted(row["id"] for row in query),
+                         ["d1", "d2", "p0"])
+        self.assertEqual(sorted(self.storage.find(Place, "user_id", "")),
+                         ["Place.d1", "Place.d2", "Place.p0", "Place.p1",
+                          "Place.p2", "Place.p3", "Place.p4", "Place.p5",
+                          "Place.p6", "Place.p7", "Place.p8", "Place.p9"])
+
+    def test_same_results_as_file_storage(self):
+        """Tests that values of different types and missing attributes
+        compare as they do on the objects of FileStorage."""
+        objects = places()
+        objects[0].price_by_night = "free"
+        self.storage.new(objects[0])
+        self.storage.save()
+        for condition in (("price_by_night", "<", "5"),
+                          ("price_by_night", "!=", "free"),
+                          ("price_by_night", "<", 30),
+                          ("nope", "!=", "x"), ("nope", "=", None),
+                          ("nope", "<", 3), ("name", "!=", None),
+                          ("user_id", "=", ""), ("max_guest", "=", 0)):
+            with self.subTest(condition=condition):
+                expected = Query(None, Place).where(condition).apply(objects)
+                self.assertEqual(
+                    sorted(p.id for p in self.storage.query(Place)
+                           .where(condition)),
+                    sorted(p.id for p in expected))
+
+    def test_invalid_value(self):
+        """Tests that a value SQL cannot compare is rejected."""
+        with self.assertRaises(ValueError):
+            self.storage.find(Place, "name", ["n1"])
+        with patch('sys.stdout', new=StringIO()) as f, \
+                patch('console.storage', self.storage):
+            HBNBCommand().onecmd('Place.where(name=["n1"])')
+        self.assertEqual(f.getvalue(), "** invalid value ['n1'] **\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+#!/usr/bin/python3
+"""Unittest module for the command server."""
+
+import unittest
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from unittest import mock
+from console import HBNBCommand
+from models.engine.durability import atomic_write
+from models.engine.file_storage import FileStorage
+from models import storage
+from server import HBNBServer, ThreadOutput, command_name, frame
+
+
+async def request(port, lines):
+    """Send lines at once to the server on port and return the list of
+    the answers."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write("".join(line + "\n" for line in lines).encode())
+    await writer.drain()
+    answers = []
+    answer = []
+    while len(answers) < len(lines):
+        line = (await reader.readline()).decode()
+        if line == ".\n":
+            answers.append("".join(answer))
+            answer = []
+        else:
+            answer.append(line[1:] if line.startswith(".") else line)
+    writer.close()
+    return answers
+
+
+class TestHelpers(unittest.TestCase):
+
+    """Test Cases for the parsing and framing helpers."""
+
+    def test_command_name(self):
+        """Tests both syntaxes of the commands."""
+        self.assertEqual(command_name("create City"), "create")
+        self.assertEqual(command_name('City.update("1", "a", 2)'), "update")
+        self.assertEqual(command_name("Place.where(a=1).limit(2)"), "where")
+        self.assertEqual(command_name(""), "")
+
+    def test_frame(self):
+        """Tests the terminator and the dot-stuffing."""
+        self.assertEqual(frame(""), ".\n")
+        self.assertEqual(frame("a\n.b\n"), "a\n..b\n.\n")
+
+
+class TestHBNBServer(unittest.TestCase):
+
+    """Test Cases for the HBNBServer class."""
+
+    path = FileStorage._FileStorage__file_path
+
+    def setUp(self):
+        """Sets up test methods."""
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tears down test methods."""
+        storage.use_threads(False)
+        FileStorage._FileStorage__objects = {}
+        for path in (self.path, self.path + ".fts"):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def serve(self, clients):
+        """Start a server, run the coroutine clients(port) and return its
+        result once the server is stopped."""
+        async def main():
+            server = HBNBServer()
+            sockets = await server.start(port=0)
+            try:
+                return await clients(sockets[0].getsockname()[1])
+            finally:
+                await server.stop()
+        return asyncio.run(main())
+
+    def test_pipeline(self):
+        """Tests that pipelined commands are answered in order and see the
+        changes sent before them."""
+        answers = self.serve(lambda port: request(port, [
+            "create City", "count City", "City.count()", "show City",
+            "begin", "create Foo", "export file.json", "import file.json"]))
+        self.assertEqual(len(answers[0].strip()), 36)
+        self.assertEqual(answers[1:], [
+            "1\n", "1\n", "** instance id missing **\n",
+            "** begin is not supported by the server **\n",
+            "** class doesn't exist **\n",
+            "** export is not supported by the server **\n",
+            "** import is not supported by the server **\n"])
+
+    def test_update(self):
+        """Tests that a client reads its own changes."""
+        async def clients(port):
+            city_id = (await request(port, ["create City"]))[0].strip()
+            return city_id, await request(port, [
+                'City.update("{}", "name", "Lagos")'.format(city_id),
+                "show City {}".format(city_id)])
+        city_id, answers = self.serve(clients)
+        self.assertEqual(answers[0], "")
+        self.assertIn("'name': 'Lagos'", answers[1])
+        with open(self.path) as file:
+            self.assertEqual(json.load(file)["City." + city_id]["name"],
+                             "Lagos")
+
+    def test_concurrent_clients(self):
+        """Tests that the changes of many clients are all saved, in fewer
+        writes than changes."""
+        async def clients(port):
+            return await asyncio.gather(*[
+                request(port, ["create Place"] * 20 + ["count Place"])
+                for _ in range(10)])
+        with mock.patch("models.engine.file_storage.atomic_write",
+                        wraps=atomic_write) as write:
+            results = self.serve(clients)
+        self.assertEqual(sum(len(answers) for answers in results), 210)
+        self.assertEqual(storage.count("Place"), 200)
+        writes = [call for call in write.call_args_list
+                  if call.args[0] == self.path]
+        self.assertLess(len(writes), 200)
+        with open(self.path) as file:
+            self.assertEqual(len(json.load(file)), 200)
+
+    def test_failed_begin(self):
+        """Tests that the writer answers and goes on when a batch cannot
+        be opened."""
+        begin = storage.begin
+        calls = []
+
+        def fail_once():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("no batch")
+            begin()
+        with mock.patch.object(storage, "begin", side_effect=fail_once):
+            answers = self.serve(lambda port: request(port, ["create City"]))
+            self.assertEqual(answers, ["** no batch **\n"])
+            answers = self.serve(lambda port: request(port, ["create City"]))
+        self.assertEqual(len(answers[0].strip()), 36)
+
+    def test_group_holds_lock(self):
+        """Tests that on a storage that is not thread-safe no command runs
+        inside the batch of the writer."""
+        server = HBNBServer()
+        server.lock = threading.RLock()
+        server.output = ThreadOutput(sys.stdout)
+        commit = storage.commit
+        free = []
+
+        def probe():
+            if server.lock.acquire(blocking=False):
+                server.lock.release()
+                free.append(True)
+
+        def checked_commit():
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+            commit()
+        with mock.patch.object(storage, "commit",
+                               side_effect=checked_commit), \
+                mock.patch("sys.stdout", server.output):
+            results = server.run_group(["create City", "count City"])
+        self.assertEqual(results[1], "1\n")
+        self.assertEqual(free, [])
+        self.assertFalse(storage.in_batch())
+
+    def test_slow_command(self):
+        """Tests that a slow command does not hold up other clients."""
+        count = HBNBCommand.do_count
+
+        def slow_count(console, arg):
+            if arg == "Place":
+                time.sleep(0.5)
+            count(console, arg)
+
+        async def clients(port):
+            slow = asyncio.ensure_future(request(port, ["count Place"]))
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            answers = await request(port, ["create City", "count City"])
+            elapsed = time.perf_counter() - start
+            return answers, elapsed, await slow
+        with mock.patch.object(HBNBCommand, "do_count", slow_count):
+            answers, elapsed, slow = self.serve(clients)
+        self.assertEqual(answers[1], "1\n")
+        self.assertLess(elapsed, 0.4)
+        self.assertEqual(slow, ["0\n"])
+
+
+if __name__ == "__main__":
+    unittest.main()